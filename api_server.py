@@ -2,10 +2,16 @@
 API server for web dashboard
 FastAPI backend for Next.js frontend
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import logging
+import threading
+import uuid
 import sys
 import os
 
@@ -13,8 +19,10 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import ArticleDatabase
-from scheduler import ContentScheduler
+from scheduler import ContentScheduler, notify_scheduler
 import config
+import export
+import metrics
 
 app = FastAPI(title="Content Search API")
 
@@ -27,9 +35,130 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize database and scheduler
+# Initialize database and scheduler; the scheduler's API clients are created
+# by the first job that needs them
 db = ArticleDatabase()
-scheduler = ContentScheduler()
+scheduler = ContentScheduler(db=db)
+
+logger = logging.getLogger(__name__)
+
+
+class JobManager:
+    """
+    Runs long scheduler tasks on worker threads so request handlers return at once
+    
+    Each job is identified by an id that GET /api/jobs/{id} reports on. Only one
+    job of a kind runs at a time: triggering a kind that is already queued or
+    running returns the existing job instead of starting another.
+    """
+    
+    MAX_FINISHED = 100
+    
+    def __init__(self, max_workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs: Dict[str, Dict] = {}
+        self._active: Dict[str, str] = {}
+        self._futures = set()
+        self._lock = threading.Lock()
+    
+    def submit(self, kind: str, func: Callable[[Callable[[Dict], None]], Optional[int]]) -> tuple:
+        """
+        Start func(progress) in the background unless a job of this kind is active
+        
+        Returns:
+            (job, created) where created is False for a de-duplicated trigger
+        """
+        with self._lock:
+            active_id = self._active.get(kind)
+            if active_id:
+                return dict(self._jobs[active_id]), False
+            
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id,
+                'kind': kind,
+                'status': 'queued',
+                'progress': {},
+                'result': None,
+                'error': None,
+                'created_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+            }
+            self._active[kind] = job_id
+            self._prune()
+            job = dict(self._jobs[job_id])
+        
+        future = self._executor.submit(self._run, job_id, func)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        return job, True
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job, progress=dict(job['progress'])) if job else None
+    
+    def shutdown(self, timeout: float = None) -> bool:
+        """
+        Cancel the queued jobs and wait up to timeout seconds for the running ones
+        
+        Returns:
+            True if no job is still running
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            futures = list(self._futures)
+        _, running = wait(futures, timeout=timeout)
+        return not running
+    
+    def _forget(self, future):
+        with self._lock:
+            self._futures.discard(future)
+    
+    def _run(self, job_id: str, func: Callable):
+        def progress(update: Dict):
+            with self._lock:
+                self._jobs[job_id]['progress'].update(update)
+        
+        self._update(job_id, status='running', started_at=datetime.now().isoformat())
+        try:
+            result = func(progress)
+            self._update(job_id, status='succeeded', result=result)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self._update(job_id, status='failed', error=str(e))
+        finally:
+            with self._lock:
+                job = self._jobs[job_id]
+                job['finished_at'] = datetime.now().isoformat()
+                if self._active.get(job['kind']) == job_id:
+                    del self._active[job['kind']]
+    
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+    
+    def _prune(self):
+        """Forget the oldest finished jobs beyond MAX_FINISHED (caller holds the lock)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job['finished_at']]
+        for job_id in finished[:max(0, len(finished) - self.MAX_FINISHED)]:
+            del self._jobs[job_id]
+
+
+jobs = JobManager()
+
+@app.on_event("shutdown")
+def close_clients():
+    """Stop background jobs and release pooled HTTP and database connections"""
+    # Closing the connections under a running search or publish job would
+    # break it mid-write, so they are left to the process exit if one overruns
+    if jobs.shutdown(timeout=config.JOB_SHUTDOWN_TIMEOUT):
+        scheduler.close()
+    else:
+        logger.warning(f"Background jobs still running after {config.JOB_SHUTDOWN_TIMEOUT:.0f}s, "
+                       f"leaving their connections open")
 
 # Pydantic models
 class Settings(BaseModel):
@@ -55,93 +184,145 @@ class ActionResponse(BaseModel):
 async def root():
     return {"message": "Content Search API", "status": "running"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Call counters and latency histograms in the Prometheus text format"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/api/stats")
 async def get_stats():
     """Get dashboard statistics"""
     try:
-        # Query database for stats
-        import sqlite3
-        conn = sqlite3.connect(config.DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        # Total articles
-        cursor.execute("SELECT COUNT(*) FROM articles")
-        total_articles = cursor.fetchone()[0]
-        
-        # Pending articles
-        cursor.execute("SELECT COUNT(*) FROM articles WHERE status = 'pending'")
-        pending_articles = cursor.fetchone()[0]
-        
-        # Published articles
-        cursor.execute("SELECT COUNT(*) FROM articles WHERE status = 'published'")
-        published_articles = cursor.fetchone()[0]
-        
-        # Average score
-        cursor.execute("SELECT AVG(ai_score) FROM articles WHERE ai_score > 0")
-        result = cursor.fetchone()
-        avg_score = result[0] if result[0] else 0
-        
-        conn.close()
+        stats = db.get_stats()
         
         return {
-            "total_articles": total_articles,
-            "pending_articles": pending_articles,
-            "published_articles": published_articles,
-            "avg_score": round(avg_score, 2)
+            "total_articles": stats['total_articles'],
+            "pending_articles": stats['by_status'].get('pending', 0),
+            "published_articles": stats['by_status'].get('published', 0),
+            "avg_score": round(stats['avg_score'], 2)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/analytics/topics")
+async def get_topic_stats(
+    status: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=config.API_MAX_PAGE_SIZE),
+):
+    """Most frequent analysis topics with their article counts and average scores"""
+    try:
+        return {"topics": db.get_topic_stats(status=status, limit=limit)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/articles")
-async def get_articles(status: Optional[str] = None, limit: Optional[int] = None):
-    """Get articles with optional filtering"""
+async def get_articles(
+    status: Optional[str] = None,
+    limit: int = Query(config.API_PAGE_SIZE, ge=1, le=config.API_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    Get a page of articles with optional filtering
+    
+    Pass next_cursor from the response as cursor to get the next page, and a
+    comma-separated list of columns as fields to choose what is returned
+    (content and analysis are left out unless asked for).
+    """
     try:
-        import sqlite3
-        conn = sqlite3.connect(config.DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        query = "SELECT * FROM articles"
-        params = []
-        
-        if status and status != 'all':
-            query += " WHERE status = ?"
-            params.append(status)
-        
-        query += " ORDER BY ai_score DESC, found_date DESC"
-        
-        if limit:
-            query += f" LIMIT {limit}"
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        
-        articles = []
-        for row in rows:
-            articles.append({
-                "id": row[0],
-                "title": row[1],
-                "url": row[2],
-                "content": row[3],
-                "source": row[4],
-                "keywords": eval(row[5]) if row[5] else [],
-                "ai_score": row[6],
-                "relevance_score": row[7],
-                "found_date": row[8],
-                "status": row[9],
-            })
-        
-        return {"articles": articles}
+        articles, next_cursor = db.list_articles(
+            status=status if status != 'all' else None,
+            fields=[f.strip() for f in fields.split(',') if f.strip()] if fields else None,
+            limit=limit,
+            cursor=cursor,
+        )
+        return {"articles": articles, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/articles/search")
+async def search_articles(
+    q: str = Query(..., min_length=1),
+    status: Optional[str] = None,
+    limit: int = Query(config.API_PAGE_SIZE, ge=1, le=config.API_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    Full-text search over article titles, content and keywords, best match first
+    
+    Every word of q must match, in any inflection. Results carry the listing
+    fields plus score, title_highlight and a content snippet, with matched
+    words wrapped in <mark></mark> (the text itself is not HTML-escaped).
+    Paged like /api/articles with next_cursor.
+    """
+    try:
+        articles, next_cursor = db.search_articles(
+            q,
+            status=status if status != 'all' else None,
+            fields=[f.strip() for f in fields.split(',') if f.strip()] if fields else None,
+            limit=limit,
+            cursor=cursor,
+        )
+        return {"articles": articles, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/articles/{article_id}")
+async def get_article(article_id: int):
+    """Get a single article with its full content"""
+    article = db.get_article(article_id)
+    if article is None:
+        raise HTTPException(status_code=404, detail="Article not found")
+    return article
+
+def export_response(table: str, format: str, since: Optional[str], gzip: bool) -> StreamingResponse:
+    """Stream an export; bad parameters are rejected before the first byte is sent"""
+    try:
+        chunks = export.export_chunks(db, table, format, since=since, compress=gzip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = export.export_filename(table, format, gzip)
+    return StreamingResponse(
+        chunks,
+        media_type='application/gzip' if gzip else export.FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/api/export/articles")
+def export_articles(
+    format: str = 'ndjson',
+    since: Optional[str] = None,
+    gzip: bool = False,
+):
+    """
+    Stream every article as NDJSON or CSV, in id order
+    
+    since is the last id already exported, or an ISO date to export the
+    articles found from then on; gzip=true compresses the stream.
+    """
+    return export_response('articles', format, since, gzip)
+
+@app.get("/api/export/publications")
+def export_publications(
+    format: str = 'ndjson',
+    since: Optional[str] = None,
+    gzip: bool = False,
+):
+    """Stream every publication as NDJSON or CSV, with since and gzip as for articles"""
+    return export_response('publications', format, since, gzip)
+
 @app.get("/api/logs")
 async def get_logs(limit: int = 10):
     """Get activity logs"""
     try:
-        import sqlite3
-        conn = sqlite3.connect(config.DATABASE_PATH)
-        cursor = conn.cursor()
+        cursor = db.get_connection().cursor()
         
         cursor.execute("""
             SELECT id, platform as action, post_id as message, published_date as timestamp, status
@@ -151,7 +332,6 @@ async def get_logs(limit: int = 10):
         """, (limit,))
         
         rows = cursor.fetchall()
-        conn.close()
         
         logs = []
         for row in rows:
@@ -250,6 +430,10 @@ async def update_settings(settings: Settings):
         with open(env_path, 'w') as f:
             f.writelines(new_lines)
         
+        # New job times take effect here and in the running scheduler process at once
+        scheduler.reload_schedule()
+        notify_scheduler()
+        
         return ActionResponse(
             success=True,
             message="Настройки обновлены"
@@ -257,29 +441,42 @@ async def update_settings(settings: Settings):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def start_job(kind: str, func: Callable, started_message: str, running_message: str) -> ActionResponse:
+    """Queue a scheduler task as a background job and describe it for the dashboard"""
+    job, created = jobs.submit(kind, func)
+    return ActionResponse(
+        success=True,
+        message=started_message if created else running_message,
+        data={"job_id": job['id'], "status": job['status'], "deduplicated": not created}
+    )
+
 @app.post("/api/search")
 async def trigger_search():
-    """Manually trigger article search"""
-    try:
-        scheduler.search_and_collect_articles()
-        return ActionResponse(
-            success=True,
-            message="Поиск статей запущен"
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """Manually trigger article search in the background"""
+    return start_job(
+        'search',
+        lambda progress: scheduler.search_and_collect_articles(progress=progress),
+        "Поиск статей запущен",
+        "Поиск статей уже выполняется"
+    )
 
 @app.post("/api/publish")
 async def trigger_publish():
-    """Manually trigger blog publication"""
-    try:
-        scheduler.publish_to_blog()
-        return ActionResponse(
-            success=True,
-            message="Публикация в блог запущена"
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """Manually trigger blog publication in the background"""
+    return start_job(
+        'publish',
+        lambda progress: scheduler.publish_to_blog(progress=progress),
+        "Публикация в блог запущена",
+        "Публикация в блог уже выполняется"
+    )
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get status, progress, result and error of a background job"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @app.post("/api/settings")
 async def trigger_settings():
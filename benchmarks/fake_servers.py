@@ -0,0 +1,433 @@
+"""
+Local stand-ins for the external APIs, for offline benchmarks
+
+    FakeGeminiServer:    generateContent / streamGenerateContent of the Gemini
+                         REST API, answering search, analysis and blog prompts
+                         with generated JSON
+    FakeWordPressServer: /wp-json/wp/v2/posts and /wp-json/wp/v2/tags
+    FakeGraphServer:     /{id}/feed, /{id}/photos, /{id}/media, /{id}/media_publish
+
+Every server listens on 127.0.0.1 on a free port, runs in a daemon thread
+and counts the requests it served. Latency, generation speed and failure
+rates are configurable so that benchmark runs can model a slow or flaky API.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+WORDS = (
+    'энергоаудит тепловизор теплопотери вентиляция герметичность воздуховод здание '
+    'утепление фасад кровля окна тепловой мост конденсат плесень котельная теплотрасса '
+    'счетчик экономия норматив ГОСТ испытание дымогенератор протечка трубопровод '
+    'холодильная камера чистое помещение пожаротушение воздухопроницаемость '
+    'рекуперация отопление тариф модернизация паспорт обследование замер'
+).split()
+
+TOPICS = [
+    'энергоаудит', 'тепловизионное обследование', 'вентиляция', 'герметичность',
+    'теплопотери', 'протечки', 'энергоэффективность', 'нормативы', 'утепление',
+    'чистые помещения', 'теплотрассы', 'холодильные камеры',
+]
+
+# What Gemini puts in source_type: a kind of source rather than a link. The
+# scheduler stores it as the article URL, so most results of a run collide on
+# articles.url and take the ON CONFLICT path
+SOURCE_TYPES = [
+    'news', 'article', 'Новостная статья', 'Аналитическая статья', 'Отраслевой журнал',
+    'Блог эксперта', 'Нормативный документ', 'Исследование', 'Кейс', 'Обзор рынка',
+]
+
+# Approximate characters per token of Russian text in Gemini replies
+CHARS_PER_TOKEN = 4
+
+
+class StandInServer:
+    """Threaded HTTP server on a free local port"""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = None):
+        """
+        Args:
+            latency: Seconds added to every response
+            error_rate: Share of requests answered with 503 (retried by the clients)
+            seed: Seed of the generated content
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self._requests_lock = threading.Lock()
+
+        handler = type(self.handler_class.__name__, (self.handler_class,), {'server_state': self})
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StandInServer':
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name=type(self).__name__, daemon=True
+        )
+        self._thread.start()
+        logger.info(f"{type(self).__name__} listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def count(self, name: str):
+        with self._requests_lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    def chance(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._random_lock:
+            return self.random.random() < rate
+
+    def words(self, count: int) -> str:
+        with self._random_lock:
+            return ' '.join(self.random.choice(WORDS) for _ in range(count))
+
+    def sample(self, population: List, count: int) -> List:
+        with self._random_lock:
+            return self.random.sample(population, count)
+
+    def score(self) -> int:
+        with self._random_lock:
+            return self.random.randint(4, 10)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_state: StandInServer
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _read_json(self) -> Dict:
+        try:
+            return json.loads(self._read_body() or b'{}')
+        except ValueError:
+            return {}
+
+    def _read_form(self) -> Dict[str, str]:
+        form = parse_qs(self._read_body().decode('utf-8'))
+        return {key: values[-1] for key, values in form.items()}
+
+    def _send_json(self, status: int, body, headers: Dict[str, str] = None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _simulate(self, name: str) -> bool:
+        """Count the request, wait out the latency; False if it was answered with a 503"""
+        state = self.server_state
+        state.count(name)
+        if state.latency:
+            time.sleep(state.latency)
+        if state.chance(state.error_rate):
+            self._send_json(503, {'error': {'code': 503, 'message': 'Service unavailable (simulated)'}})
+            return False
+        return True
+
+
+class _GeminiHandler(_Handler):
+    server_state: 'FakeGeminiServer'
+
+    def do_POST(self):
+        path = urlparse(self.path)
+        match = re.match(r'^/v1(?:beta)?/models/([^/:]+):(generateContent|streamGenerateContent)$', path.path)
+        if not match:
+            self._send_json(404, {'error': {'code': 404, 'message': f'Unknown path {path.path}'}})
+            return
+
+        body = self._read_json()
+        prompt = ''.join(
+            part.get('text', '')
+            for content in body.get('contents', [])
+            for part in content.get('parts', [])
+        )
+        state = self.server_state
+        kind, text = state.reply(prompt)
+        if not self._simulate(f"gemini.{kind}"):
+            return
+
+        if match.group(2) == 'generateContent':
+            state.generate(len(text))
+            self._send_json(200, state.candidate(text, len(prompt)))
+        else:
+            self._stream(text, len(prompt), sse=parse_qs(path.query).get('alt') == ['sse'])
+
+    def _stream(self, text: str, prompt_chars: int, sse: bool):
+        """Send the reply in chunks at the configured token rate"""
+        state = self.server_state
+        chunk_chars = state.stream_chunk_tokens * CHARS_PER_TOKEN
+        chunks = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)] or ['']
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream' if sse else 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write(data: str):
+            raw = data.encode('utf-8')
+            self.wfile.write(f"{len(raw):x}\r\n".encode() + raw + b"\r\n")
+            self.wfile.flush()
+
+        if not sse:
+            write('[')
+        for index, chunk in enumerate(chunks):
+            state.generate(len(chunk))
+            event = json.dumps(state.candidate(chunk, prompt_chars), ensure_ascii=False)
+            if sse:
+                write(f"data: {event}\r\n\r\n")
+            else:
+                write(event if index == 0 else ',' + event)
+        if not sse:
+            write(']')
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeGeminiServer(StandInServer):
+    """Answers Gemini prompts of gemini_search.py with plausible generated JSON"""
+
+    handler_class = _GeminiHandler
+
+    def __init__(self, latency: float = 0.0, tokens_per_second: float = 0.0,
+                 malformed_rate: float = 0.0, error_rate: float = 0.0,
+                 stream_chunk_tokens: int = 20, url_rate: float = 0.0, seed: int = None):
+        """
+        Args:
+            latency: Seconds before the first token
+            tokens_per_second: Generation speed (0: the whole reply at once)
+            malformed_rate: Share of replies cut off in the middle of the JSON
+            stream_chunk_tokens: Tokens per streamed chunk
+            url_rate: Share of search results whose source_type is a unique URL
+                (the rest get one of SOURCE_TYPES)
+        """
+        super().__init__(latency, error_rate, seed)
+        self.tokens_per_second = tokens_per_second
+        self.malformed_rate = malformed_rate
+        self.stream_chunk_tokens = stream_chunk_tokens
+        self.url_rate = url_rate
+
+    def generate(self, chars: int):
+        """Wait for as long as generating chars characters would take"""
+        if self.tokens_per_second:
+            time.sleep(chars / CHARS_PER_TOKEN / self.tokens_per_second)
+
+    @staticmethod
+    def candidate(text: str, prompt_chars: int) -> Dict:
+        return {
+            'candidates': [{
+                'content': {'parts': [{'text': text}], 'role': 'model'},
+                'finishReason': 'STOP',
+                'index': 0,
+            }],
+            'usageMetadata': {
+                'promptTokenCount': prompt_chars // CHARS_PER_TOKEN,
+                'candidatesTokenCount': len(text) // CHARS_PER_TOKEN,
+                'totalTokenCount': (prompt_chars + len(text)) // CHARS_PER_TOKEN,
+            },
+        }
+
+    def reply(self, prompt: str) -> Tuple[str, str]:
+        """Kind of the prompt and the reply text, possibly cut off"""
+        if '"analyses"' in prompt:
+            match = re.search(r'Проанализируй следующие (\d+) стат', prompt)
+            kind, result = 'analyze_batch', {'analyses': [
+                dict(self._analysis(), index=index) for index in range(int(match.group(1)) if match else 1)
+            ]}
+        elif '"scores"' in prompt:
+            kind, result = 'analyze', self._analysis()
+        elif '"intro"' in prompt:
+            kind, result = 'generate', self._blog_post(prompt)
+        else:
+            keyword = re.search(r'по теме: "(.*?)"', prompt)
+            count = re.search(r'Предложи (\d+)', prompt)
+            kind, result = 'search', {'articles': [
+                self._article(keyword.group(1) if keyword else '') for _ in range(int(count.group(1)) if count else 5)
+            ]}
+
+        text = '```json\n' + json.dumps(result, ensure_ascii=False, indent=2) + '\n```'
+        if self.chance(self.malformed_rate):
+            with self._random_lock:
+                text = text[:self.random.randint(len(text) // 3, len(text) - 5)]
+        return kind, text
+
+    def _article(self, keyword: str) -> Dict:
+        return {
+            'title': f"{keyword}: {self.words(6)}",
+            'description': self.words(40),
+            'relevance': self.words(12),
+            'source_type': self._source_type(),
+        }
+
+    def _source_type(self) -> str:
+        if self.chance(self.url_rate):
+            return f"https://news.example/{uuid.uuid4().hex}"
+        with self._random_lock:
+            return self.random.choice(SOURCE_TYPES)
+
+    def _analysis(self) -> Dict:
+        scores = {name: self.score() for name in ('relevance', 'quality', 'timeliness', 'business_value', 'uniqueness')}
+        scores['overall'] = round(sum(scores.values()) / len(scores), 1)
+        return {
+            'scores': scores,
+            'key_topics': self.sample(TOPICS, 3),
+            'target_audience': self.words(4),
+            'adaptation_tips': self.words(20),
+            'social_media_title': self.words(8),
+        }
+
+    def _blog_post(self, prompt: str) -> Dict:
+        title = re.search(r'Исходный заголовок: (.*)', prompt)
+        return {
+            'title': title.group(1).strip() if title else self.words(6),
+            'intro': self.words(80),
+            'body': '\n\n'.join(f"<h2>{self.words(4)}</h2>\n{self.words(150)}" for _ in range(3)),
+            'conclusion': self.words(40),
+            'meta_description': self.words(15)[:160],
+            'tags': self.sample(TOPICS + WORDS, 4),
+        }
+
+
+class _WordPressHandler(_Handler):
+    server_state: 'FakeWordPressServer'
+
+    def do_GET(self):
+        path = urlparse(self.path)
+        if path.path.rstrip('/') == '/wp-json/wp/v2/posts':
+            if not self._simulate('wp.find_post'):
+                return
+            search = parse_qs(path.query).get('search', [''])[0]
+            self._send_json(200, self.server_state.find_posts(search))
+            return
+        if path.path.rstrip('/') != '/wp-json/wp/v2/tags':
+            self._send_json(404, {'code': 'rest_no_route'})
+            return
+        if not self._simulate('wp.tags_list'):
+            return
+        query = parse_qs(path.query)
+        per_page = int(query.get('per_page', ['10'])[0])
+        page = int(query.get('page', ['1'])[0])
+        tags = self.server_state.list_tags()
+        total_pages = max(1, -(-len(tags) // per_page))
+        self._send_json(
+            200, tags[(page - 1) * per_page:page * per_page],
+            {'X-WP-Total': str(len(tags)), 'X-WP-TotalPages': str(total_pages)}
+        )
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip('/')
+        state = self.server_state
+        if path == '/wp-json/wp/v2/tags':
+            body = self._read_json()
+            if not self._simulate('wp.tags'):
+                return
+            tag_id, created = state.add_tag(body.get('name', ''))
+            if created:
+                self._send_json(201, {'id': tag_id, 'name': body.get('name', '')})
+            else:
+                self._send_json(400, {'code': 'term_exists', 'message': 'A term with the name provided already exists.',
+                                      'data': {'status': 400, 'term_id': tag_id}})
+        elif path == '/wp-json/wp/v2/posts':
+            body = self._read_json()
+            if not self._simulate('wp.create_post'):
+                return
+            self._send_json(201, {'id': state.add_post(body), 'status': body.get('status', 'draft')})
+        else:
+            self._read_body()
+            self._send_json(404, {'code': 'rest_no_route'})
+
+
+class FakeWordPressServer(StandInServer):
+    """WordPress REST API posts and tags, kept in memory"""
+
+    handler_class = _WordPressHandler
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = None):
+        super().__init__(latency, error_rate, seed)
+        self._lock = threading.Lock()
+        self.tags: Dict[str, int] = {}
+        self.posts: Dict[int, Dict] = {}
+
+    def list_tags(self) -> List[Dict]:
+        with self._lock:
+            return [{'id': tag_id, 'name': name} for name, tag_id in self.tags.items()]
+
+    def add_tag(self, name: str) -> Tuple[int, bool]:
+        """Id of the tag and whether it was created"""
+        with self._lock:
+            key = name.strip().casefold()
+            if key in self.tags:
+                return self.tags[key], False
+            self.tags[key] = len(self.tags) + 1
+            return self.tags[key], True
+
+    def add_post(self, post: Dict) -> int:
+        with self._lock:
+            post_id = len(self.posts) + 1
+            self.posts[post_id] = post
+            return post_id
+
+    def find_posts(self, search: str) -> List[Dict]:
+        """Posts whose title contains search, newest first, as context=edit returns them"""
+        with self._lock:
+            return [
+                {'id': post_id, 'title': {'raw': post.get('title', '')}, 'status': post.get('status', 'draft')}
+                for post_id, post in reversed(self.posts.items())
+                if search.casefold() in post.get('title', '').casefold()
+            ]
+
+
+class _GraphHandler(_Handler):
+    def do_POST(self):
+        match = re.match(r'^/v[\d.]+/[^/]+/(feed|photos|media|media_publish)$', urlparse(self.path).path)
+        self._read_form()
+        if not match:
+            self._send_json(404, {'error': {'message': 'Unknown path', 'type': 'GraphMethodException', 'code': 100}})
+            return
+        edge = match.group(1)
+        if not self._simulate(f"graph.{edge}"):
+            return
+        object_id = f"{int(time.time())}_{uuid.uuid4().int % 10 ** 15}"
+        self._send_json(200, {'id': object_id, 'post_id': object_id} if edge == 'photos' else {'id': object_id})
+
+
+class FakeGraphServer(StandInServer):
+    """Facebook / Instagram Graph API publishing edges"""
+
+    handler_class = _GraphHandler
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+End-to-end pipeline benchmark against local stand-in servers
+
+Runs ContentScheduler.search_and_collect_articles, publish_to_blog and the
+Facebook fan-out against the fake Gemini, WordPress and Graph API servers of
+fake_servers.py, with a fresh database in a temporary directory. The run is
+traced (see tracing.py) and the trace is reduced to:
+
+    - throughput of every stage in articles per second
+    - count / mean / p50 / p95 / p99 latency of every span, by category
+      (app, task, http, database, ...)
+    - wall-clock time spent in ArticleDatabase methods
+
+Results are written to benchmarks/results/<time>-<commit>.json so runs can
+be compared across commits:
+
+    python benchmarks/pipeline_benchmark.py --keywords 1000 --gemini-latency 0.05
+    python benchmarks/pipeline_benchmark.py --compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+import logging
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_servers import FakeGeminiServer, FakeGraphServer, FakeWordPressServer
+
+logger = logging.getLogger('benchmark')
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Spans compared by --compare, besides the stage throughputs
+KEY_SPANS = [
+    ('app', 'search_keyword'),
+    ('gemini_search', 'GeminiSearchEngine.analyze_articles'),
+    ('scheduler', 'ContentScheduler._save_articles'),
+    ('task', 'task.generate_blog_post'),
+    ('task', 'task.wp_create_post'),
+    ('task', 'task.social_fanout'),
+]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def latency_stats(durations: List[float]) -> Dict:
+    values = sorted(durations)
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 6) if values else 0.0,
+        'p50': round(percentile(values, 0.50), 6),
+        'p95': round(percentile(values, 0.95), 6),
+        'p99': round(percentile(values, 0.99), 6),
+        'max': round(values[-1], 6) if values else 0.0,
+    }
+
+
+def read_trace(path: str) -> List[Dict]:
+    """Complete events of a trace written by tracing.py"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read().rstrip().rstrip(',')
+    return [event for event in json.loads(text + ']') if event.get('ph') == 'X']
+
+
+def summarize_trace(events: List[Dict]) -> Tuple[Dict, float]:
+    """
+    Returns:
+        Latency stats in seconds by span category and name, and the wall-clock
+        seconds spent in database methods (nested calls counted once)
+    """
+    durations: Dict[Tuple[str, str], List[float]] = {}
+    db_intervals: Dict[int, List[Tuple[int, int]]] = {}
+    for event in events:
+        durations.setdefault((event['cat'], event['name']), []).append(event['dur'] / 1e6)
+        if event['cat'] == 'database':
+            db_intervals.setdefault(event['tid'], []).append((event['ts'], event['ts'] + event['dur']))
+
+    spans: Dict[str, Dict] = {}
+    for (cat, name), values in sorted(durations.items()):
+        spans.setdefault(cat, {})[name] = latency_stats(values)
+
+    db_time = 0
+    for intervals in db_intervals.values():
+        end = None
+        for start, stop in sorted(intervals):
+            if end is None or start >= end:
+                db_time += stop - start
+                end = stop
+            elif stop > end:
+                db_time += stop - end
+                end = stop
+    return spans, db_time / 1e6
+
+
+def git_revision() -> Dict:
+    def git(*args) -> str:
+        try:
+            return subprocess.run(
+                ['git', *args], cwd=ROOT, capture_output=True, text=True, timeout=30
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ''
+    return {
+        'commit': git('rev-parse', '--short', 'HEAD') or 'unknown',
+        'subject': git('log', '-1', '--format=%s'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+    }
+
+
+def configure_environment(args, workdir: str, gemini: FakeGeminiServer,
+                          wordpress: FakeWordPressServer, graph: FakeGraphServer):
+    """Point config.py at the stand-ins; must run before the repo modules are imported"""
+    # Rate limits are lifted so the benchmark measures the pipeline, not the quotas
+    unlimited = str(10 ** 9)
+    os.environ.update({
+        'GEMINI_API_KEY': 'benchmark',
+        'GEMINI_API_ENDPOINT': gemini.url,
+        'GEMINI_CACHE_MODE': 'off',
+        'GEMINI_CACHE_PATH': os.path.join(workdir, 'gemini_cache.db'),
+        'GEMINI_STREAMING': 'false',
+        'WORDPRESS_URL': wordpress.url,
+        'WORDPRESS_USERNAME': 'benchmark',
+        'WORDPRESS_PASSWORD': 'benchmark',
+        'GRAPH_API_URL': graph.url,
+        'FACEBOOK_ACCESS_TOKEN': 'benchmark',
+        'FACEBOOK_PAGE_ID': '1000',
+        'INSTAGRAM_ACCESS_TOKEN': 'benchmark',
+        'INSTAGRAM_BUSINESS_ACCOUNT_ID': '2000',
+        'DATABASE_PATH': os.path.join(workdir, 'articles.db'),
+        'MAX_ARTICLES_PER_DAY': str(args.articles),
+        'MIN_ARTICLE_SCORE': '0',
+        'ANALYSIS_BATCH_SIZE': str(args.batch_size),
+        'RATE_LIMIT_BACKOFF_BASE': '0.05',
+        'RATE_LIMIT_BACKOFF_MAX': '0.5',
+        'TASK_BACKOFF_BASE': '0',
+        'TASK_BACKOFF_MAX': '0',
+    })
+    for service in ('GEMINI', 'WORDPRESS', 'FACEBOOK', 'INSTAGRAM'):
+        os.environ[f'{service}_RPM'] = unlimited
+        os.environ[f'{service}_BURST'] = unlimited
+
+
+def make_keywords(base: List[str], count: int) -> List[str]:
+    """count distinct keywords built from the configured ones"""
+    return [
+        base[index % len(base)] + ('' if index < len(base) else f" {index // len(base)}")
+        for index in range(count)
+    ]
+
+
+def run_benchmark(args) -> Dict:
+    workdir = tempfile.mkdtemp(prefix='pipeline-benchmark-')
+    gemini = FakeGeminiServer(
+        latency=args.gemini_latency, tokens_per_second=args.gemini_tokens_per_second,
+        malformed_rate=args.malformed_rate, error_rate=args.error_rate, url_rate=args.url_rate, seed=args.seed
+    ).start()
+    wordpress = FakeWordPressServer(latency=args.wp_latency, error_rate=args.error_rate, seed=args.seed).start()
+    graph = FakeGraphServer(latency=args.graph_latency, error_rate=args.error_rate, seed=args.seed).start()
+    configure_environment(args, workdir, gemini, wordpress, graph)
+
+    import config
+    import tracing
+    from scheduler import ContentScheduler
+
+    config.KEYWORDS = make_keywords(config.KEYWORDS, args.keywords)
+    trace_path = os.path.join(workdir, 'trace.jsonl')
+    scheduler = ContentScheduler()
+    stages = {}
+
+    tracing.start(trace_path)
+    try:
+        started = time.perf_counter()
+        if args.concurrency:
+            found = scheduler.search_and_collect_articles_concurrently(args.concurrency)
+        else:
+            found = scheduler.search_and_collect_articles()
+        stages['search'] = {'seconds': time.perf_counter() - started, 'articles': found}
+        logger.info(f"Search: {found} articles in {stages['search']['seconds']:.2f}s")
+
+        started = time.perf_counter()
+        published = scheduler.publish_to_blog()
+        stages['publish_blog'] = {'seconds': time.perf_counter() - started, 'articles': published}
+        logger.info(f"Blog: {published} articles in {stages['publish_blog']['seconds']:.2f}s")
+
+        if not args.no_social:
+            # Fan-out tasks wait for the configured posting time; make them due now
+            with scheduler.db.transaction() as cursor:
+                cursor.execute(
+                    "UPDATE tasks SET next_run_at = ? WHERE task_type = 'social_fanout' AND state = 'queued'",
+                    (time.time(),)
+                )
+            started = time.perf_counter()
+            posted = scheduler.publish_to_facebook()
+            stages['publish_social'] = {'seconds': time.perf_counter() - started, 'articles': posted}
+            logger.info(f"Social: {posted} posts in {stages['publish_social']['seconds']:.2f}s")
+    finally:
+        tracing.stop()
+        scheduler.close()
+        for server in (gemini, wordpress, graph):
+            server.stop()
+
+    for stage in stages.values():
+        stage['seconds'] = round(stage['seconds'], 4)
+        stage['articles_per_second'] = round(stage['articles'] / stage['seconds'], 3) if stage['seconds'] else 0.0
+
+    spans, db_seconds = summarize_trace(read_trace(trace_path))
+    total_seconds = sum(stage['seconds'] for stage in stages.values())
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'environment': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+        },
+        'parameters': {
+            key: value for key, value in vars(args).items() if key not in ('compare', 'output')
+        },
+        'stages': stages,
+        'db_seconds': round(db_seconds, 4),
+        'db_share': round(db_seconds / total_seconds, 4) if total_seconds else 0.0,
+        'spans': spans,
+        'requests': {
+            'gemini': gemini.requests,
+            'wordpress': wordpress.requests,
+            'graph': graph.requests,
+        },
+        'workdir': workdir,
+    }
+
+
+def print_report(result: Dict):
+    print(f"\nRevision {result['revision']['commit']}{' (dirty)' if result['revision']['dirty'] else ''}")
+    for name, stage in result['stages'].items():
+        print(f"  {name:<16} {stage['articles']:>7} articles  {stage['seconds']:>9.2f}s  "
+              f"{stage['articles_per_second']:>9.2f} articles/s")
+    print(f"  database time    {result['db_seconds']:.2f}s ({result['db_share']:.1%} of the run)")
+    print(f"\n  {'span':<55} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for cat, spans in result['spans'].items():
+        for name, stats in spans.items():
+            print(f"  {cat + ' ' + name:<55} {stats['count']:>7} {stats['p50'] * 1000:>8.1f}ms "
+                  f"{stats['p95'] * 1000:>8.1f}ms {stats['p99'] * 1000:>8.1f}ms")
+
+
+def compare(base_path: str, new_path: str):
+    """Print the throughput and key span latencies of two result files side by side"""
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+
+    def change(old: float, value: float) -> str:
+        return f"{(value - old) / old:+.1%}" if old else 'n/a'
+
+    print(f"{'':<45} {base['revision']['commit']:>12} {new['revision']['commit']:>12}")
+    for name in [name for name in base['stages'] if name in new['stages']]:
+        old, value = base['stages'][name]['articles_per_second'], new['stages'][name]['articles_per_second']
+        print(f"{name + ' articles/s':<45} {old:>12.2f} {value:>12.2f} {change(old, value):>8}")
+    old, value = base['db_seconds'], new['db_seconds']
+    print(f"{'database seconds':<45} {old:>12.2f} {value:>12.2f} {change(old, value):>8}")
+    for cat, name in KEY_SPANS:
+        old = base['spans'].get(cat, {}).get(name)
+        value = new['spans'].get(cat, {}).get(name)
+        if old and value:
+            print(f"{name + ' p95 ms':<45} {old['p95'] * 1000:>12.1f} {value['p95'] * 1000:>12.1f} "
+                  f"{change(old['p95'], value['p95']):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the search and publication pipeline offline')
+    parser.add_argument('--keywords', type=int, default=100, help='Keywords to search (5 results each)')
+    parser.add_argument('--articles', type=int, default=100, help='Articles to publish')
+    parser.add_argument('--batch-size', type=int, default=5, help='ANALYSIS_BATCH_SIZE')
+    parser.add_argument('--concurrency', type=int, help='Search through the async pipeline with N requests in flight')
+    parser.add_argument('--gemini-latency', type=float, default=0.0, help='Seconds to the first token')
+    parser.add_argument('--gemini-tokens-per-second', type=float, default=0.0, help='Generation speed, 0 = instant')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Share of cut-off Gemini replies')
+    parser.add_argument('--url-rate', type=float, default=0.0,
+                        help='Share of search results with a unique URL; the rest collide on articles.url')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503')
+    parser.add_argument('--wp-latency', type=float, default=0.0, help='WordPress response time in seconds')
+    parser.add_argument('--graph-latency', type=float, default=0.0, help='Graph API response time in seconds')
+    parser.add_argument('--no-social', action='store_true', help='Skip the Facebook fan-out stage')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the generated content')
+    parser.add_argument('--output', help=f'Result file (default: {RESULTS_DIR}/<time>-<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='Compare two result files and exit')
+    parser.add_argument('--verbose', action='store_true', help='Keep the pipeline INFO logs')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    # The pipeline logs every article; keep only warnings unless asked
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    logger.setLevel(logging.INFO)
+    result = run_benchmark(args)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{result['revision']['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print_report(result)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
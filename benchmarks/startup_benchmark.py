@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Cold-start budget of the CLI modes and the API server
+
+Every scenario runs in a fresh interpreter with `python -X importtime` in an
+empty working directory (its own database, no network). The importtime log
+gives the import time and the list of imported modules, which are checked
+against the scenario's budget:
+
+    - import time (sum of the self times) must stay under budget_ms
+    - none of the forbidden modules may be imported, e.g. the system check
+      and publish-social never need google.generativeai
+
+The median of --runs runs is reported. The exit status is 1 when a budget is
+exceeded, so the script can guard startup time in CI:
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --budget-scale 2   # slow machine
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy third-party packages, only imported by the clients that use them
+GEMINI_MODULES = ['google.generativeai']
+HTTP_MODULES = ['requests', 'urllib3']
+
+SCENARIOS = [
+    {
+        'name': 'main --mode test',
+        'code': 'import main; main.main()',
+        'argv': ['main.py', '--mode', 'test'],
+        'budget_ms': 80,
+        'forbidden': ['scheduler', 'database', 'sqlite3'] + GEMINI_MODULES + HTTP_MODULES,
+    },
+    {
+        'name': 'main --mode publish-social',
+        'code': 'import main; main.main()',
+        'argv': ['main.py', '--mode', 'publish-social'],
+        'budget_ms': 150,
+        'forbidden': GEMINI_MODULES,
+    },
+    {
+        'name': 'main --mode publish-blog',
+        'code': 'import main; main.main()',
+        'argv': ['main.py', '--mode', 'publish-blog'],
+        'budget_ms': 150,
+        # Nothing to publish in an empty database, so no client is created
+        'forbidden': GEMINI_MODULES + HTTP_MODULES,
+    },
+    {
+        'name': 'import api_server',
+        'code': 'import api_server',
+        'argv': ['api_server.py'],
+        'budget_ms': 600,
+        'forbidden': GEMINI_MODULES + HTTP_MODULES,
+    },
+]
+
+
+def parse_importtime(stderr: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Returns:
+        Total import time in ms and the cumulative ms of every imported module
+    """
+    total_us = 0
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        self_us, cumulative_us, name = int(fields[0]), int(fields[1]), fields[2].strip()
+        total_us += self_us
+        modules[name] = cumulative_us / 1000
+    return total_us / 1000, modules
+
+
+def run_scenario(scenario: Dict, workdir: str) -> Dict:
+    """One cold start in a fresh interpreter"""
+    code = (
+        f"import sys; sys.path.insert(0, {ROOT!r}); sys.argv = {scenario['argv']!r}; "
+        + scenario['code']
+    )
+    env = dict(
+        os.environ,
+        DATABASE_PATH=os.path.join(workdir, 'data', 'articles.db'),
+        GEMINI_CACHE_PATH=os.path.join(workdir, 'data', 'gemini_cache.db'),
+    )
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=workdir, env=env, capture_output=True, text=True, timeout=120
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"{scenario['name']} exited with {completed.returncode}:\n{completed.stderr[-2000:]}")
+    import_ms, modules = parse_importtime(completed.stderr)
+    return {'wall_ms': wall_ms, 'import_ms': import_ms, 'modules': modules}
+
+
+def measure(scenario: Dict, runs: int) -> Dict:
+    samples = []
+    with tempfile.TemporaryDirectory(prefix='startup-') as workdir:
+        # main.py refuses to run other modes without a .env
+        open(os.path.join(workdir, '.env'), 'w').close()
+        for _ in range(runs):
+            samples.append(run_scenario(scenario, workdir))
+    modules = samples[-1]['modules']
+    slowest = sorted(
+        ((ms, name) for name, ms in modules.items() if '.' not in name),
+        reverse=True
+    )[:5]
+    return {
+        'wall_ms': statistics.median(sample['wall_ms'] for sample in samples),
+        'import_ms': statistics.median(sample['import_ms'] for sample in samples),
+        'forbidden': [name for name in scenario['forbidden'] if name in modules],
+        'slowest': slowest,
+        'modules': modules,
+    }
+
+
+def check(scenario: Dict, result: Dict, budget_scale: float) -> List[str]:
+    """Budget violations of a scenario"""
+    problems = []
+    budget_ms = scenario['budget_ms'] * budget_scale
+    if result['import_ms'] > budget_ms:
+        problems.append(f"imports took {result['import_ms']:.0f} ms, budget {budget_ms:.0f} ms")
+    for name in result['forbidden']:
+        problems.append(f"imported {name}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the cold-start time of the CLI modes and the API server')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per scenario, the median is reported')
+    parser.add_argument('--budget-scale', type=float, default=1.0, help='Multiply every time budget')
+    parser.add_argument('--scenario', action='append', help='Only run scenarios whose name contains this')
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'scenario':32} {'imports':>9} {'wall':>9}  slowest top-level imports")
+    for scenario in SCENARIOS:
+        if args.scenario and not any(part in scenario['name'] for part in args.scenario):
+            continue
+        result = measure(scenario, max(1, args.runs))
+        slowest = ', '.join(f"{name} {ms:.0f}" for ms, name in result['slowest'])
+        print(f"{scenario['name']:32} {result['import_ms']:7.0f}ms {result['wall_ms']:7.0f}ms  {slowest}")
+        for problem in check(scenario, result, args.budget_scale):
+            failed = True
+            print(f"    FAIL: {problem}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Compression of the large article text columns (content and analysis)
+
+Each article's text is only a few hundred bytes to a few KB, too short for
+plain deflate to find much to reuse. Values are therefore compressed with a
+preset dictionary (zlib's zdict) trained on stored articles: common words,
+phrases and the JSON keys of the analysis live in the dictionary instead of
+in every row.
+
+Stored format: a BLOB of one byte naming the dictionary (0 = none) followed
+by a raw deflate stream. TEXT and NULL values are read back unchanged, so
+values too short to gain anything stay as they are.
+
+Dictionaries are kept in the compression_dictionaries table and are never
+changed or deleted once rows refer to them; a retrained dictionary gets a
+new id.
+"""
+import re
+import zlib
+from collections import Counter
+from typing import Callable, Dict, Iterable, Optional, Union
+
+# deflate can only refer back 32 KiB, so a bigger dictionary is never used
+DICTIONARY_SIZE = 32 * 1024
+
+# Ids are stored in one byte, 0 meaning no dictionary
+MAX_DICTIONARY_ID = 255
+
+# Values shorter than this stay TEXT
+MIN_COMPRESS_SIZE = 64
+
+LEVEL = 6
+
+# Raw deflate: no zlib header and checksum on every row
+_WBITS = -15
+
+# Longest phrase, in words, considered for a dictionary
+_MAX_PHRASE_WORDS = 6
+_TOKEN = re.compile(r'\S+\s*')
+
+
+def train_dictionary(samples: Iterable[str], size: int = DICTIONARY_SIZE, seed: str = '') -> bytes:
+    """
+    Build a preset dictionary from sample values
+
+    Phrases of up to _MAX_PHRASE_WORDS words are scored by the bytes they
+    would save (bytes times the number of other samples containing them).
+    The best are kept, without phrases already covered by a longer one, and
+    placed last, where deflate reaches them with the shortest distances. The
+    seed text is always included (e.g. the JSON keys of a fresh database).
+    """
+    document_frequency = Counter()
+    for text in samples:
+        tokens = _TOKEN.findall(text)
+        phrases = set()
+        for start in range(len(tokens)):
+            for end in range(start + 1, min(len(tokens), start + _MAX_PHRASE_WORDS) + 1):
+                phrases.add(''.join(tokens[start:end]))
+        document_frequency.update(phrases)
+
+    scored = sorted(
+        ((count - 1) * len(phrase.encode('utf-8')), phrase)
+        for phrase, count in document_frequency.items()
+        if count > 1 and len(phrase) > 3
+    )
+
+    chosen = []
+    covered = set()
+    budget = size - len(seed.encode('utf-8'))
+    for _, phrase in reversed(scored):
+        if phrase in covered:
+            continue
+        data_size = len(phrase.encode('utf-8'))
+        if data_size > budget:
+            continue
+        chosen.append(phrase)
+        budget -= data_size
+        tokens = _TOKEN.findall(phrase)
+        for start in range(len(tokens)):
+            for end in range(start + 1, len(tokens) + 1):
+                covered.add(''.join(tokens[start:end]))
+
+    # Best phrases closest to the data
+    return (seed + ''.join(reversed(chosen))).encode('utf-8')[-size:]
+
+
+class TextCodec:
+    """Compresses and decompresses column values with the registered dictionaries"""
+
+    def __init__(self, dictionaries: Dict[int, bytes] = None,
+                 missing: Callable[[int], Optional[bytes]] = None):
+        """
+        Args:
+            dictionaries: Dictionaries by id
+            missing: Looks up a dictionary this codec doesn't know yet, e.g.
+                one trained by another process sharing the database
+        """
+        self.dictionaries: Dict[int, bytes] = {0: b''}
+        self.missing = missing
+        for dictionary_id, dictionary in (dictionaries or {}).items():
+            self.add(dictionary_id, dictionary)
+
+    def add(self, dictionary_id: int, dictionary: bytes):
+        if not 0 < dictionary_id <= MAX_DICTIONARY_ID:
+            raise ValueError(f"Dictionary id must be 1-{MAX_DICTIONARY_ID}: {dictionary_id}")
+        self.dictionaries[dictionary_id] = bytes(dictionary)
+
+    def compress(self, text: Optional[str], dictionary_id: int = 0) -> Union[str, bytes, None]:
+        """Stored form of text: a BLOB when compression pays off, otherwise the text itself"""
+        if text is None:
+            return None
+        data = text.encode('utf-8')
+        if len(data) < MIN_COMPRESS_SIZE:
+            return text
+        dictionary = self.dictionaries[dictionary_id]
+        if dictionary:
+            compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, _WBITS, zdict=dictionary)
+        else:
+            compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, _WBITS)
+        packed = bytes((dictionary_id,)) + compressor.compress(data) + compressor.flush()
+        return packed if len(packed) < len(data) else text
+
+    def decompress(self, value: Union[str, bytes, None]) -> Optional[str]:
+        """Text of a stored value; registered as the decompress_text() SQL function"""
+        if not isinstance(value, bytes):
+            return value
+        dictionary = self.dictionaries.get(value[0])
+        if dictionary is None and self.missing:
+            found = self.missing(value[0])
+            if found is not None:
+                self.add(value[0], found)
+                dictionary = self.dictionaries[value[0]]
+        if dictionary is None:
+            raise ValueError(f"Unknown compression dictionary: {value[0]}")
+        if dictionary:
+            decompressor = zlib.decompressobj(_WBITS, zdict=dictionary)
+        else:
+            decompressor = zlib.decompressobj(_WBITS)
+        return (decompressor.decompress(value[1:]) + decompressor.flush()).decode('utf-8')
@@ -9,12 +9,20 @@ load_dotenv()
 
 # Gemini API Configuration
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
+# Alternative REST endpoint, e.g. the stand-in server of benchmarks/ (default: Google)
+GEMINI_API_ENDPOINT = os.getenv('GEMINI_API_ENDPOINT', '')
 
 # WordPress Configuration
 WORDPRESS_URL = os.getenv('WORDPRESS_URL', 'https://energo-audit.by')
 WORDPRESS_USERNAME = os.getenv('WORDPRESS_USERNAME', '')
 WORDPRESS_PASSWORD = os.getenv('WORDPRESS_PASSWORD', '')
 
+WP_TAG_CACHE_TTL = int(os.getenv('WP_TAG_CACHE_TTL', 24 * 3600))  # seconds
+WP_TAG_CREATE_WORKERS = int(os.getenv('WP_TAG_CREATE_WORKERS', 4))
+
+# Facebook / Instagram Graph API
+GRAPH_API_URL = os.getenv('GRAPH_API_URL', 'https://graph.facebook.com')
+
 # Facebook Configuration
 FACEBOOK_ACCESS_TOKEN = os.getenv('FACEBOOK_ACCESS_TOKEN', '')
 FACEBOOK_PAGE_ID = os.getenv('FACEBOOK_PAGE_ID', '')
@@ -36,8 +44,80 @@ INSTAGRAM_POST_MINUTE = int(os.getenv('INSTAGRAM_POST_MINUTE', 0))
 # Other Settings
 MAX_ARTICLES_PER_DAY = int(os.getenv('MAX_ARTICLES_PER_DAY', 5))
 MIN_ARTICLE_SCORE = float(os.getenv('MIN_ARTICLE_SCORE', 7.0))
+ANALYSIS_BATCH_SIZE = int(os.getenv('ANALYSIS_BATCH_SIZE', 5))
+SEARCH_CONCURRENCY = int(os.getenv('SEARCH_CONCURRENCY', 4))
+ANALYSIS_CONCURRENCY = int(os.getenv('ANALYSIS_CONCURRENCY', 2))
+GEMINI_STREAMING = os.getenv('GEMINI_STREAMING', 'false').lower() == 'true'
+DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', 'true').lower() == 'true'
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', 0.8))  # estimated Jaccard similarity
 DATABASE_PATH = os.getenv('DATABASE_PATH', './data/articles.db')
 
+# Publication ranking: weights of the analysis scores, normalized by their sum
+RANKING_WEIGHTS = {
+    'relevance': float(os.getenv('RANK_WEIGHT_RELEVANCE', 0.3)),
+    'quality': float(os.getenv('RANK_WEIGHT_QUALITY', 0.2)),
+    'timeliness': float(os.getenv('RANK_WEIGHT_TIMELINESS', 0.1)),
+    'business_value': float(os.getenv('RANK_WEIGHT_BUSINESS_VALUE', 0.3)),
+    'uniqueness': float(os.getenv('RANK_WEIGHT_UNIQUENESS', 0.1)),
+}
+
+# Publication task queue (backoff and lease times in seconds)
+TASK_WORKERS = int(os.getenv('TASK_WORKERS', 2))
+TASK_MAX_ATTEMPTS = int(os.getenv('TASK_MAX_ATTEMPTS', 5))
+TASK_BACKOFF_BASE = float(os.getenv('TASK_BACKOFF_BASE', 30))
+TASK_BACKOFF_MAX = float(os.getenv('TASK_BACKOFF_MAX', 3600))
+TASK_LEASE_SECONDS = float(os.getenv('TASK_LEASE_SECONDS', 600))
+TASK_POLL_INTERVAL = float(os.getenv('TASK_POLL_INTERVAL', 5))
+ARTICLE_LEASE_SECONDS = float(os.getenv('ARTICLE_LEASE_SECONDS', 900))
+
+# Job scheduler (catch-up policy: skip, once, all; jitter in seconds)
+SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', 4))
+SCHEDULER_CATCH_UP = os.getenv('SCHEDULER_CATCH_UP', 'once').lower()
+SCHEDULER_JITTER = float(os.getenv('SCHEDULER_JITTER', 0))
+# Loopback UDP port on which the scheduler is told to reload job times (POST /api/settings), 0 = off
+SCHEDULER_CONTROL_PORT = int(os.getenv('SCHEDULER_CONTROL_PORT', 8765))
+
+# Dashboard API
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 200))
+# Seconds the API server waits on shutdown for running search/publish jobs
+JOB_SHUTDOWN_TIMEOUT = float(os.getenv('JOB_SHUTDOWN_TIMEOUT', 60))
+
+# SQLite connection tuning
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', 30))
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -16000))  # negative = KiB
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))
+
+# HTTP client pooling (shared keep-alive sessions for the publishers)
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 60))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 2))  # connection errors only
+
+# Outbound rate limits: (requests per minute, burst) per service
+RATE_LIMITS = {
+    'gemini': (float(os.getenv('GEMINI_RPM', 60)), int(os.getenv('GEMINI_BURST', 5))),
+    'wordpress': (float(os.getenv('WORDPRESS_RPM', 120)), int(os.getenv('WORDPRESS_BURST', 10))),
+    'facebook': (float(os.getenv('FACEBOOK_RPM', 30)), int(os.getenv('FACEBOOK_BURST', 5))),
+    'instagram': (float(os.getenv('INSTAGRAM_RPM', 30)), int(os.getenv('INSTAGRAM_BURST', 5))),
+    'default': (60.0, 5),
+}
+RATE_LIMIT_MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', 4))
+RATE_LIMIT_BACKOFF_BASE = float(os.getenv('RATE_LIMIT_BACKOFF_BASE', 1.0))
+RATE_LIMIT_BACKOFF_MAX = float(os.getenv('RATE_LIMIT_BACKOFF_MAX', 60.0))
+
+# Gemini response cache
+GEMINI_CACHE_PATH = os.getenv('GEMINI_CACHE_PATH', './data/gemini_cache.db')
+GEMINI_CACHE_MODE = os.getenv('GEMINI_CACHE_MODE', 'on')  # on, off, refresh
+GEMINI_CACHE_MAX_MB = int(os.getenv('GEMINI_CACHE_MAX_MB', 100))
+GEMINI_CACHE_TTLS = {
+    # Searches are kept short so the daily run still discovers new articles
+    'search_articles': int(os.getenv('GEMINI_CACHE_TTL_SEARCH', 12 * 3600)),
+    'analyze_article': int(os.getenv('GEMINI_CACHE_TTL_ANALYZE', 30 * 24 * 3600)),
+    'generate_blog_post': int(os.getenv('GEMINI_CACHE_TTL_GENERATE', 7 * 24 * 3600)),
+}
+
 # Keywords for search
 KEYWORDS = [
     # Расчеты и теплопотери
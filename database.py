@@ -1,22 +1,394 @@
 """
 Database module for storing and managing articles
 """
+import base64
 import sqlite3
 import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple, Callable
 import config
+import compression
+from metrics import DB_QUERIES, instrumented
+import text_search
+
+logger = logging.getLogger(__name__)
+
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+# Keep IN (...) lists well below SQLITE_MAX_VARIABLE_NUMBER
+SQL_VARIABLE_CHUNK = 500
+
+# Characters of content returned by the 'excerpt' field
+EXCERPT_LENGTH = 300
+
+# Rows per step when a migration backfills existing data
+MIGRATION_BATCH_SIZE = 500
+
+# Fields that article listings can project, mapped to their SQL expressions
+ARTICLE_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'url': 'url',
+    'content': 'content',
+    'excerpt': f'substr(decompress_text(content), 1, {EXCERPT_LENGTH})',
+    'source': 'source',
+    'keywords': 'keywords',
+    'ai_score': 'ai_score',
+    'relevance_score': 'relevance_score',
+    'quality_score': 'quality_score',
+    'timeliness_score': 'timeliness_score',
+    'business_value_score': 'business_value_score',
+    'uniqueness_score': 'uniqueness_score',
+    'found_date': 'found_date',
+    'status': 'status',
+    'analysis': 'analysis',
+}
+
+# Default projection for list views: everything except the large text columns
+LIST_FIELDS = [
+    'id', 'title', 'url', 'source', 'keywords', 'ai_score',
+    'relevance_score', 'found_date', 'status',
+]
+
+# Full-text search: bm25 weights of the title, content and keywords columns,
+# words of context in snippets, and the markers around matched words
+SEARCH_WEIGHTS = (10.0, 1.0, 5.0)
+SNIPPET_WORDS = 24
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+
+# Columns stored compressed (see compression.py), with text every one of their
+# dictionaries starts from
+ANALYSIS_DICTIONARY_SEED = json.dumps({
+    'scores': {'relevance': 8, 'quality': 7, 'timeliness': 8, 'business_value': 7, 'uniqueness': 6, 'overall': 7.2},
+    'key_topics': ['энергоаудит', 'тепловизионное обследование'],
+    'target_audience': '', 'adaptation_tips': '', 'social_media_title': '',
+}, ensure_ascii=False)
+COMPRESSED_COLUMNS = {'content': '', 'analysis': ANALYSIS_DICTIONARY_SEED}
+
+# Newest articles a dictionary is trained on; a dictionary trained on fewer
+# (e.g. on a new database) is retrained at startup once there are this many
+DICTIONARY_TRAINING_ROWS = 1000
+
+# Migrations that leave enough free pages to VACUUM right after them
+VACUUM_AFTER_MIGRATIONS = {10}
+
+# Exports: columns of each exported table, the column since= dates are compared
+# with, and rows read from the export query at a time
+EXPORT_COLUMNS = {
+    'articles': [f for f in ARTICLE_FIELDS if f != 'excerpt'],
+    'publications': ['id', 'article_id', 'platform', 'post_id', 'published_date', 'status'],
+}
+EXPORT_DATE_COLUMNS = {'articles': 'found_date', 'publications': 'published_date'}
+EXPORT_FETCH_SIZE = 500
+
+# Analysis scores and their columns; overall and relevance are also given
+# directly as ai_score and relevance_score by the caller
+SCORE_COLUMNS = {
+    'overall': 'ai_score',
+    'relevance': 'relevance_score',
+    'quality': 'quality_score',
+    'timeliness': 'timeliness_score',
+    'business_value': 'business_value_score',
+    'uniqueness': 'uniqueness_score',
+}
+
+# Longest topic kept in article_topics
+MAX_TOPIC_LENGTH = 100
+
+# Columns of the articles handed to the publication pipeline
+PUBLICATION_COLUMNS = [
+    'id', 'title', 'url', 'content', 'source', 'keywords', 'ai_score', 'relevance_score',
+    'quality_score', 'timeliness_score', 'business_value_score', 'uniqueness_score', 'analysis',
+]
+
+ARTICLE_INSERT_SQL = '''
+    INSERT INTO articles (title, url, content, source, keywords, ai_score, relevance_score, analysis,
+                          quality_score, timeliness_score, business_value_score, uniqueness_score)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(url) DO NOTHING
+'''
+
+# Keyset of the article list; NULL scores and dates sort last instead of
+# falling out of the row-value comparison (idx_articles_list_keyset)
+LIST_KEYSET = ('COALESCE(ai_score, -1)', "COALESCE(found_date, '')", 'id')
+
+
+def rank_expression(weights: Dict[str, float] = None) -> str:
+    """
+    SQL expression ranking articles for publication: the weighted mean of their scores
+
+    A score the analysis didn't give (or an article from before the score
+    columns) counts as ai_score. Without any weight the rank is ai_score.
+    """
+    weights = {name: float(weight) for name, weight in (weights or config.RANKING_WEIGHTS).items() if weight}
+    total = round(sum(weights.values()), 9)
+    if not total:
+        return 'ai_score'
+    terms = ' + '.join(
+        f"COALESCE({SCORE_COLUMNS[name]}, ai_score) * {weight!r}" for name, weight in weights.items()
+    )
+    return f"(({terms}) / {total!r})"
+
+
+def rank_index_sql(weights: Dict[str, float] = None) -> str:
+    """
+    CREATE INDEX statement of the publication ranking (idx_articles_status_rank_score)
+
+    Indexes the exact rank_expression the queries order by, so a claim reads
+    the best articles off the index instead of sorting every pending one.
+    """
+    return (
+        f"CREATE INDEX idx_articles_status_rank_score "
+        f"ON articles (status, {rank_expression(weights)} DESC, ai_score DESC, id)"
+    )
+
+
+def normalize_topic(topic) -> Optional[str]:
+    """Key of a topic in article_topics: single-spaced and lower case, None if empty"""
+    if not isinstance(topic, str):
+        return None
+    topic = ' '.join(topic.split()).lower()[:MAX_TOPIC_LENGTH]
+    return topic or None
+
+
+def article_topics(analysis: Optional[Dict]) -> List[str]:
+    """Distinct normalized key_topics of an analysis"""
+    if not isinstance(analysis, dict) or not isinstance(analysis.get('key_topics'), list):
+        return []
+    return list(dict.fromkeys(filter(None, map(normalize_topic, analysis['key_topics']))))
+
+
+def analysis_scores(analysis: Optional[Dict]) -> Dict[str, Optional[float]]:
+    """Score column values of an analysis, None where a score is missing or not a number"""
+    scores = analysis.get('scores') if isinstance(analysis, dict) else None
+    values = {}
+    for name, column in SCORE_COLUMNS.items():
+        value = scores.get(name) if isinstance(scores, dict) else None
+        try:
+            values[column] = float(value) if value is not None else None
+        except (TypeError, ValueError):
+            values[column] = None
+    return values
+
+
+def search_index_row(article_id: int, title: Optional[str], content: Optional[str],
+                     keywords: Optional[str]) -> tuple:
+    """
+    The articles_fts values (rowid, title, content, keywords) of an article
+
+    content is the plain text, keywords the stored JSON array.
+    """
+    try:
+        words = json.loads(keywords) if keywords else []
+    except ValueError:
+        words = []
+    words = [str(word) for word in words if word is not None] if isinstance(words, list) else []
+    return (
+        article_id,
+        text_search.stem_text(title),
+        text_search.stem_text(content),
+        text_search.stem_text(' '.join(words)) if words else None,
+    )
+
+
+def update_search_index(cursor: sqlite3.Cursor, rows: Iterable[tuple], remove: bool = False):
+    """
+    Add rows made with search_index_row to articles_fts, or remove them
+
+    The index is contentless, so a row is removed by repeating the values it
+    was indexed with.
+    """
+    if remove:
+        cursor.executemany(
+            "INSERT INTO articles_fts (articles_fts, rowid, title, content, keywords) "
+            "VALUES ('delete', ?, ?, ?, ?)", rows
+        )
+    else:
+        cursor.executemany(
+            'INSERT INTO articles_fts (rowid, title, content, keywords) VALUES (?, ?, ?, ?)', rows
+        )
+
+
+def encode_cursor(*values) -> str:
+    """Encode keyset pagination values as an opaque URL-safe token"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, size: int = 3) -> list:
+    """Decode a token made by encode_cursor from size values, raises ValueError if malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return values
+
 
 class ArticleDatabase:
     def __init__(self, db_path: str = None):
         self.db_path = db_path or config.DATABASE_PATH
+        # Connection pool: one long-lived connection per thread
+        self._local = threading.local()
+        self._connections = []
+        self._pool_lock = threading.Lock()
+        # Dictionary currently used to compress each of COMPRESSED_COLUMNS
+        self.codec = compression.TextCodec(missing=self._fetch_dictionary)
+        self._dictionary_ids: Dict[str, int] = {}
         self._init_database()
     
-    def _init_database(self):
-        """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection with the tuned pragmas applied"""
+        # check_same_thread is off only so that close() can release connections
+        # owned by other threads; each connection is still used by one thread
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=config.SQLITE_BUSY_TIMEOUT,
+            check_same_thread=False
+        )
+        synchronous = config.SQLITE_SYNCHRONOUS.upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            synchronous = 'NORMAL'
+        
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute(f'PRAGMA synchronous = {synchronous}')
+        conn.execute(f'PRAGMA cache_size = {int(config.SQLITE_CACHE_SIZE)}')
+        conn.execute(f'PRAGMA mmap_size = {int(config.SQLITE_MMAP_SIZE)}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        # Used by the full-text index backfill of migration 9
+        conn.create_function('stem_text', 1, text_search.stem_text, deterministic=True)
+        # Reads the compressed content and analysis columns
+        conn.create_function('decompress_text', 1, self.codec.decompress, deterministic=True)
+        return conn
+    
+    def get_connection(self) -> sqlite3.Connection:
+        """Return the calling thread's pooled connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._pool_lock:
+                self._connections.append(conn)
+        return conn
+    
+    @contextmanager
+    def transaction(self, immediate: bool = False):
+        """
+        Run a block in a single transaction on the pooled connection
+        
+        Args:
+            immediate: Take the write lock up front (BEGIN IMMEDIATE), needed
+                when the block reads state it is about to change, or runs DDL
+        """
+        conn = self.get_connection()
         cursor = conn.cursor()
+        if immediate and not conn.in_transaction:
+            cursor.execute('BEGIN IMMEDIATE')
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    
+    def close(self):
+        """Close every pooled connection"""
+        with self._pool_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+    
+    def _init_database(self):
+        """Initialize the database with required tables and apply pending migrations"""
+        with self.transaction(immediate=True) as cursor:
+            self._create_tables(cursor)
+            applied = self._migrate(cursor)
+            _ensure_rank_index(cursor)
+            self._load_dictionaries(cursor)
+        
+        if VACUUM_AFTER_MIGRATIONS.intersection(applied):
+            logger.info("Reclaiming the space freed by the migrations (VACUUM)...")
+            conn = self.get_connection()
+            conn.execute('VACUUM')
+            # VACUUM wrote the whole database to the WAL; don't leave it that size
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    
+    def _load_dictionaries(self, cursor: sqlite3.Cursor):
+        """Register the stored compression dictionaries, retraining any trained on too few articles"""
+        cursor.execute('SELECT id, column_name, dictionary, samples FROM compression_dictionaries ORDER BY id')
+        latest = {}
+        for dictionary_id, column, dictionary, samples in cursor.fetchall():
+            self.codec.add(dictionary_id, dictionary)
+            latest[column] = (dictionary_id, samples)
+        
+        for column in COMPRESSED_COLUMNS:
+            dictionary_id, samples = latest.get(column, (0, 0))
+            if samples < DICTIONARY_TRAINING_ROWS:
+                # Counted like _train_dictionary samples, or this would retrain on every start
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM (SELECT 1 FROM articles WHERE {column} IS NOT NULL LIMIT ?)',
+                    (DICTIONARY_TRAINING_ROWS,)
+                )
+                if cursor.fetchone()[0] >= DICTIONARY_TRAINING_ROWS:
+                    dictionary_id = _train_dictionary(cursor, self.codec, column, dictionary_id)
+            self._dictionary_ids[column] = dictionary_id
+    
+    def _fetch_dictionary(self, dictionary_id: int) -> Optional[bytes]:
+        """Read a dictionary added by another process, on a connection of its own"""
+        conn = sqlite3.connect(self.db_path, timeout=config.SQLITE_BUSY_TIMEOUT)
+        try:
+            row = conn.execute(
+                'SELECT dictionary FROM compression_dictionaries WHERE id = ?', (dictionary_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+    
+    def _migrate(self, cursor: sqlite3.Cursor) -> List[int]:
+        """Apply every migration newer than the recorded schema version, returns the versions applied"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+        current_version = cursor.fetchone()[0]
         
+        applied = []
+        for version, description, migration in MIGRATIONS:
+            if version <= current_version:
+                continue
+            logger.info(f"Applying database migration {version}: {description}")
+            migration(cursor)
+            cursor.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+            applied.append(version)
+        return applied
+    
+    def get_schema_version(self) -> int:
+        """Return the latest applied migration version"""
+        row = self.get_connection().execute(
+            'SELECT COALESCE(MAX(version), 0) FROM schema_version'
+        ).fetchone()
+        return row[0]
+    
+    def _create_tables(self, cursor: sqlite3.Cursor):
+        """Create the base tables if they do not exist yet"""
         # Articles table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS articles (
@@ -56,120 +428,1326 @@ class ArticleDatabase:
                 results_count INTEGER
             )
         ''')
-        
-        conn.commit()
-        conn.close()
     
     def add_article(self, article: Dict) -> int:
         """Add a new article to the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        return self.add_articles([article])[0]
+    
+    @instrumented(DB_QUERIES)
+    def add_articles(self, articles: Iterable[Dict]) -> List[int]:
+        """
+        Add several articles in a single transaction
         
-        try:
-            cursor.execute('''
-                INSERT INTO articles (title, url, content, source, keywords, ai_score, relevance_score, analysis)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                article.get('title'),
-                article.get('url'),
-                article.get('content'),
-                article.get('source'),
-                json.dumps(article.get('keywords', [])),
-                article.get('ai_score'),
-                article.get('relevance_score'),
-                json.dumps(article.get('analysis', {}))
-            ))
-            conn.commit()
-            article_id = cursor.lastrowid
-            return article_id
-        except sqlite3.IntegrityError:
-            # Article already exists
-            return -1
-        finally:
-            conn.close()
+        Returns:
+            One entry per input article: the new article ID, or -1 if an
+            article with the same URL already exists
+        """
+        articles = list(articles)
+        if not articles:
+            return []
+        
+        # The write lock is taken before the existence check: otherwise another
+        # process could insert one of the URLs in between, and its id would be
+        # reported as ours instead of -1
+        with self.transaction(immediate=True) as cursor:
+            # URLs that are already stored are reported as duplicates
+            urls = [a.get('url') for a in articles if a.get('url') is not None]
+            existing = self._existing_urls(cursor, urls)
+            
+            results = []
+            seen = set(existing)
+            batch = []
+            without_url = []
+            for index, article in enumerate(articles):
+                url = article.get('url')
+                if url is None:
+                    # Rows without URL can't be matched back by URL, they are inserted one by one
+                    without_url.append(index)
+                    results.append(None)
+                elif url in seen:
+                    results.append(-1)
+                else:
+                    seen.add(url)
+                    batch.append(self._article_row(article))
+                    results.append(None)
+            
+            if batch:
+                cursor.executemany(ARTICLE_INSERT_SQL, batch)
+                inserted = dict(
+                    (url, article_id)
+                    for article_id, url in self._ids_by_url(cursor, [row[1] for row in batch])
+                )
+                for index, article in enumerate(articles):
+                    if results[index] is None and index not in without_url:
+                        results[index] = inserted.get(article.get('url'), -1)
+            
+            for index in without_url:
+                cursor.execute(ARTICLE_INSERT_SQL, self._article_row(articles[index]))
+                results[index] = cursor.lastrowid
+            
+            cursor.executemany(
+                'INSERT OR IGNORE INTO article_topics (topic, article_id) VALUES (?, ?)',
+                [(topic, article_id)
+                 for article, article_id in zip(articles, results) if article_id > 0
+                 for topic in article_topics(article.get('analysis'))]
+            )
+            update_search_index(cursor, [
+                search_index_row(article_id, article.get('title'), article.get('content'),
+                                 json.dumps(article.get('keywords', [])))
+                for article, article_id in zip(articles, results) if article_id > 0
+            ])
+        
+        return results
+    
+    def _article_row(self, article: Dict) -> tuple:
+        """Convert an article dict to the column tuple used by ARTICLE_INSERT_SQL"""
+        scores = analysis_scores(article.get('analysis'))
+        return (
+            article.get('title'),
+            article.get('url'),
+            self.codec.compress(article.get('content'), self._dictionary_ids['content']),
+            article.get('source'),
+            json.dumps(article.get('keywords', [])),
+            article.get('ai_score'),
+            article.get('relevance_score'),
+            self.codec.compress(
+                json.dumps(article.get('analysis', {}), ensure_ascii=False),
+                self._dictionary_ids['analysis']
+            ),
+            scores['quality_score'],
+            scores['timeliness_score'],
+            scores['business_value_score'],
+            scores['uniqueness_score'],
+        )
+    
+    def _existing_urls(self, cursor: sqlite3.Cursor, urls: List[str]) -> set:
+        """Return the subset of urls that are already stored"""
+        return {url for _, url in self._ids_by_url(cursor, urls)}
+    
+    def _ids_by_url(self, cursor: sqlite3.Cursor, urls: List[str]) -> List[tuple]:
+        """Look up (id, url) pairs for the given URLs in chunks"""
+        pairs = []
+        for start in range(0, len(urls), SQL_VARIABLE_CHUNK):
+            chunk = urls[start:start + SQL_VARIABLE_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f'SELECT id, url FROM articles WHERE url IN ({placeholders})', chunk)
+            pairs.extend(cursor.fetchall())
+        return pairs
     
+    @instrumented(DB_QUERIES)
     def get_pending_articles(self, limit: int = None) -> List[Dict]:
-        """Get articles pending for publication"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """
+        Get articles pending for publication, best first
         
-        query = '''
-            SELECT id, title, url, content, source, keywords, ai_score, relevance_score, analysis
+        Articles are ordered by rank_score, the weighted mean of their analysis
+        scores (config.RANKING_WEIGHTS, see rank_expression), which
+        idx_articles_status_rank_score indexes (+ai_score keeps the planner
+        from sorting an ai_score range instead).
+        """
+        query = f'''
+            SELECT {', '.join(PUBLICATION_COLUMNS)}, {rank_expression()} AS rank_score
             FROM articles
-            WHERE status = 'pending' AND ai_score >= ?
-            ORDER BY ai_score DESC, relevance_score DESC
+            WHERE status = 'pending' AND +ai_score >= ?
+            ORDER BY rank_score DESC, ai_score DESC, id
         '''
+        params = [config.MIN_ARTICLE_SCORE]
         
         if limit:
-            query += f' LIMIT {limit}'
+            query += ' LIMIT ?'
+            params.append(int(limit))
         
-        cursor.execute(query, (config.MIN_ARTICLE_SCORE,))
-        rows = cursor.fetchall()
-        conn.close()
+        rows = self.get_connection().execute(query, params).fetchall()
+        return [self._decode_article(dict(zip(PUBLICATION_COLUMNS + ['rank_score'], row))) for row in rows]
+    
+    @instrumented(DB_QUERIES)
+    def claim_pending_articles(self, worker_id: str, n: int, lease_seconds: float = None) -> List[Dict]:
+        """
+        Atomically take up to n of the best pending articles for publication
         
-        articles = []
-        for row in rows:
-            articles.append({
-                'id': row[0],
-                'title': row[1],
-                'url': row[2],
-                'content': row[3],
-                'source': row[4],
-                'keywords': json.loads(row[5]) if row[5] else [],
-                'ai_score': row[6],
-                'relevance_score': row[7],
-                'analysis': json.loads(row[8]) if row[8] else {}
-            })
+        Claimed articles get status 'queued' and a lease held by worker_id, so
+        concurrent workers never receive the same article. An article whose
+        lease expired while it has no unfinished tasks (its worker crashed
+        before queueing them) is claimable again.
+        
+        Returns:
+            The claimed articles, best first, shaped like get_pending_articles
+        """
+        now = time.time()
+        lease_seconds = lease_seconds or config.ARTICLE_LEASE_SECONDS
+        rank = rank_expression()
+        
+        with self.transaction(immediate=True) as cursor:
+            cursor.execute(f'''
+                UPDATE articles
+                SET status = 'queued', claimed_by = ?, claim_expires = ?
+                WHERE id IN (
+                    -- Each branch reads its best n off idx_articles_status_rank_score
+                    -- (+ai_score keeps the score range from being picked instead);
+                    -- only those 2n rows get sorted
+                    SELECT id FROM (
+                        SELECT * FROM (
+                            SELECT id, ai_score, {rank} AS rank_score FROM articles
+                            WHERE status = 'pending' AND +ai_score >= ?
+                            ORDER BY rank_score DESC, ai_score DESC, id
+                            LIMIT ?
+                        )
+                        UNION ALL
+                        SELECT * FROM (
+                            SELECT id, ai_score, {rank} AS rank_score FROM articles
+                            WHERE status = 'queued' AND claim_expires < ? AND +ai_score >= ?
+                              AND NOT EXISTS (
+                                  SELECT 1 FROM tasks
+                                  WHERE tasks.article_id = articles.id
+                                    AND tasks.state IN ('queued', 'running')
+                              )
+                            ORDER BY rank_score DESC, ai_score DESC, id
+                            LIMIT ?
+                        )
+                    )
+                    ORDER BY rank_score DESC, ai_score DESC, id
+                    LIMIT ?
+                )
+                RETURNING {', '.join(PUBLICATION_COLUMNS)}, {rank}
+            ''', (worker_id, now + lease_seconds, config.MIN_ARTICLE_SCORE, int(n),
+                  now, config.MIN_ARTICLE_SCORE, int(n), int(n)))
+            rows = cursor.fetchall()
         
+        articles = [self._decode_article(dict(zip(PUBLICATION_COLUMNS + ['rank_score'], row))) for row in rows]
+        # RETURNING gives no ordering guarantee
+        articles.sort(key=lambda a: (-(a['rank_score'] or 0), -(a['ai_score'] or 0), a['id']))
         return articles
     
+    @instrumented(DB_QUERIES)
+    def heartbeat_articles(self, worker_id: str, article_ids: List[int], lease_seconds: float = None) -> int:
+        """
+        Extend the leases of articles claimed by worker_id
+        
+        An article that was published meanwhile keeps its claim columns, so
+        it is still counted.
+        
+        Returns:
+            Number of articles renewed; an article missing from the count was
+            reclaimed by another worker after its lease ran out
+        """
+        if not article_ids:
+            return 0
+        placeholders = ', '.join('?' * len(article_ids))
+        with self.transaction() as cursor:
+            cursor.execute(f'''
+                UPDATE articles SET claim_expires = ?
+                WHERE claimed_by = ? AND id IN ({placeholders})
+            ''', [time.time() + (lease_seconds or config.ARTICLE_LEASE_SECONDS), worker_id] + list(article_ids))
+            return cursor.rowcount
+    
+    @instrumented(DB_QUERIES)
     def update_article_status(self, article_id: int, status: str):
         """Update article status"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('UPDATE articles SET status = ? WHERE id = ?', (status, article_id))
-        conn.commit()
-        conn.close()
+        with self.transaction() as cursor:
+            cursor.execute('UPDATE articles SET status = ? WHERE id = ?', (status, article_id))
     
     def add_publication(self, article_id: int, platform: str, post_id: str, status: str = 'success'):
         """Record a publication"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO publications (article_id, platform, post_id, status)
-            VALUES (?, ?, ?, ?)
-        ''', (article_id, platform, post_id, status))
-        conn.commit()
-        conn.close()
+        self.add_publications([{
+            'article_id': article_id,
+            'platform': platform,
+            'post_id': post_id,
+            'status': status
+        }])
+    
+    @instrumented(DB_QUERIES)
+    def add_publications(self, publications: Iterable[Dict]) -> int:
+        """Record several publications in a single transaction, returns rows written"""
+        rows = [
+            (p['article_id'], p['platform'], p.get('post_id'), p.get('status', 'success'))
+            for p in publications
+        ]
+        if not rows:
+            return 0
+        
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO publications (article_id, platform, post_id, status)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+        return len(rows)
     
     def add_search_history(self, keyword: str, results_count: int):
         """Record a search operation"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO search_history (keyword, results_count)
-            VALUES (?, ?)
-        ''', (keyword, results_count))
-        conn.commit()
-        conn.close()
+        self.add_search_history_many([(keyword, results_count)])
+    
+    @instrumented(DB_QUERIES)
+    def add_search_history_many(self, entries: Iterable[Tuple[str, int]]) -> int:
+        """Record several (keyword, results_count) searches in a single transaction"""
+        rows = [(keyword, results_count) for keyword, results_count in entries]
+        if not rows:
+            return 0
+        
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO search_history (keyword, results_count)
+                VALUES (?, ?)
+            ''', rows)
+        return len(rows)
+    
+    @instrumented(DB_QUERIES)
+    def merge_article_keywords(self, article_id: int, keywords: List[str]):
+        """Add keywords to an existing article (used when a near-duplicate is merged into it)"""
+        with self.transaction(immediate=True) as cursor:
+            cursor.execute('SELECT title, content, keywords FROM articles WHERE id = ?', (article_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return
+            title, content, stored = row
+            current = json.loads(stored) if stored else []
+            merged = current + [k for k in keywords if k not in current]
+            if merged != current:
+                cursor.execute(
+                    'UPDATE articles SET keywords = ? WHERE id = ?', (json.dumps(merged), article_id)
+                )
+                content = self.codec.decompress(content)
+                update_search_index(cursor, [search_index_row(article_id, title, content, stored)], remove=True)
+                update_search_index(cursor, [search_index_row(article_id, title, content, json.dumps(merged))])
+    
+    @instrumented(DB_QUERIES)
+    def rebuild_search_index(self) -> int:
+        """
+        Re-index every article in articles_fts
+        
+        The index is kept in sync by the methods of this class; run this after
+        changing articles through anything else (the sqlite3 shell, scripts).
+        
+        Returns:
+            Number of articles indexed
+        """
+        indexed = 0
+        last_id = 0
+        with self.transaction(immediate=True) as cursor:
+            cursor.execute("INSERT INTO articles_fts (articles_fts) VALUES ('delete-all')")
+            while True:
+                cursor.execute(
+                    'SELECT id, title, content, keywords FROM articles WHERE id > ? ORDER BY id LIMIT ?',
+                    (last_id, MIGRATION_BATCH_SIZE)
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    return indexed
+                update_search_index(cursor, [
+                    search_index_row(article_id, title, self.codec.decompress(content), keywords)
+                    for article_id, title, content, keywords in rows
+                ])
+                indexed += len(rows)
+                last_id = rows[-1][0]
     
+    @instrumented(DB_QUERIES)
+    def find_signature_candidates(self, buckets: List[int]) -> List[Tuple[int, bytes]]:
+        """Return (article_id, signature) of stored articles sharing any LSH bucket"""
+        if not buckets:
+            return []
+        placeholders = ', '.join('?' * len(buckets))
+        return self.get_connection().execute(f'''
+            SELECT article_id, signature FROM article_signatures
+            WHERE article_id IN (
+                SELECT article_id FROM article_lsh_buckets WHERE bucket IN ({placeholders})
+            )
+        ''', buckets).fetchall()
+    
+    @instrumented(DB_QUERIES)
+    def add_article_signatures(self, rows: Iterable[Tuple[int, bytes, List[int]]]):
+        """Store (article_id, signature, lsh_buckets) for near-duplicate detection"""
+        rows = list(rows)
+        if not rows:
+            return
+        
+        with self.transaction() as cursor:
+            cursor.executemany(
+                'INSERT OR REPLACE INTO article_signatures (article_id, signature) VALUES (?, ?)',
+                [(article_id, signature) for article_id, signature, _ in rows]
+            )
+            cursor.executemany(
+                'INSERT OR IGNORE INTO article_lsh_buckets (bucket, article_id) VALUES (?, ?)',
+                [(bucket, article_id) for article_id, _, buckets in rows for bucket in buckets]
+            )
+    
+    @instrumented(DB_QUERIES)
+    def get_tag_ids(self, name_keys: Iterable[str]) -> Dict[str, int]:
+        """Look up cached WordPress term IDs by normalized tag name"""
+        name_keys = list(name_keys)
+        cursor = self.get_connection().cursor()
+        tag_ids = {}
+        for start in range(0, len(name_keys), SQL_VARIABLE_CHUNK):
+            chunk = name_keys[start:start + SQL_VARIABLE_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(
+                f'SELECT name_key, term_id FROM wp_tags WHERE name_key IN ({placeholders})', chunk
+            )
+            tag_ids.update(cursor.fetchall())
+        return tag_ids
+    
+    @instrumented(DB_QUERIES)
+    def save_tags(self, tags: Iterable[Tuple[str, int, str]]) -> int:
+        """Store (name_key, term_id, name) WordPress tags in the tag cache"""
+        rows = list(tags)
+        if not rows:
+            return 0
+        
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO wp_tags (name_key, term_id, name)
+                VALUES (?, ?, ?)
+                ON CONFLICT(name_key) DO UPDATE SET
+                    term_id = excluded.term_id,
+                    name = excluded.name,
+                    updated_date = CURRENT_TIMESTAMP
+            ''', rows)
+        return len(rows)
+    
+    def get_sync_time(self, key: str) -> Optional[float]:
+        """Return when a cached data set was last refreshed (Unix time), if ever"""
+        row = self.get_connection().execute(
+            'SELECT synced_at FROM sync_state WHERE key = ?', (key,)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def set_sync_time(self, key: str, synced_at: float):
+        """Record when a cached data set was refreshed"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO sync_state (key, synced_at) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET synced_at = excluded.synced_at
+            ''', (key, synced_at))
+    
+    @instrumented(DB_QUERIES)
+    def enqueue_tasks(self, tasks: Iterable[Dict], article_status: str = None) -> List[int]:
+        """
+        Queue tasks (see task_queue.new_task), skipping any whose dedupe_key is
+        held by an unfinished task
+        
+        Args:
+            tasks: Task dicts with task_type, payload, article_id, dedupe_key, run_at
+            article_status: If set, the articles of the queued tasks get this
+                status in the same transaction
+        
+        Returns:
+            IDs of the queued tasks, -1 for tasks skipped as duplicates
+        """
+        tasks = list(tasks)
+        if not tasks:
+            return []
+        
+        with self.transaction() as cursor:
+            task_ids = self._insert_tasks(cursor, tasks)
+            if article_status:
+                cursor.executemany(
+                    'UPDATE articles SET status = ? WHERE id = ?',
+                    [
+                        (article_status, task['article_id'])
+                        for task, task_id in zip(tasks, task_ids)
+                        if task_id > 0 and task.get('article_id')
+                    ]
+                )
+        return task_ids
+    
+    def _insert_tasks(self, cursor: sqlite3.Cursor, tasks: List[Dict]) -> List[int]:
+        now = time.time()
+        task_ids = []
+        for task in tasks:
+            cursor.execute('''
+                INSERT INTO tasks (task_type, payload, article_id, dedupe_key, max_attempts,
+                                   next_run_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(dedupe_key) WHERE state IN ('queued', 'running') DO NOTHING
+                RETURNING id
+            ''', (
+                task['task_type'],
+                json.dumps(task.get('payload') or {}, ensure_ascii=False),
+                task.get('article_id'),
+                task.get('dedupe_key'),
+                task.get('max_attempts') or config.TASK_MAX_ATTEMPTS,
+                task.get('run_at') or now,
+                now,
+                now,
+            ))
+            row = cursor.fetchone()
+            task_ids.append(row[0] if row else -1)
+        return task_ids
+    
+    @instrumented(DB_QUERIES)
+    def claim_task(self, worker_id: str, task_types: List[str] = None,
+                   lease_seconds: float = None) -> Optional[Dict]:
+        """
+        Atomically take the next due task, or one whose worker's lease ran out
+        
+        Returns:
+            The task (payload decoded, attempts already counting this run) or
+            None. article_owner is the worker id holding the claim of the
+            task's queued article, which may belong to another process.
+        """
+        now = time.time()
+        lease_seconds = lease_seconds or config.TASK_LEASE_SECONDS
+        params = [worker_id, now + lease_seconds, now, now, now]
+        type_filter = ''
+        if task_types:
+            type_filter = f"AND task_type IN ({', '.join('?' * len(task_types))})"
+            params.extend(task_types)
+        
+        with self.transaction(immediate=True) as cursor:
+            cursor.execute(f'''
+                UPDATE tasks
+                SET state = 'running', attempts = attempts + 1,
+                    locked_by = ?, locked_until = ?, updated_at = ?
+                WHERE id = (
+                    SELECT id FROM tasks
+                    WHERE ((state = 'queued' AND next_run_at <= ?)
+                           OR (state = 'running' AND locked_until < ?))
+                    {type_filter}
+                    ORDER BY next_run_at, id
+                    LIMIT 1
+                )
+                RETURNING id, task_type, payload, article_id, attempts, max_attempts
+            ''', params)
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            owner = cursor.execute(
+                "SELECT claimed_by FROM articles WHERE id = ? AND status = 'queued'", (row[3],)
+            ).fetchone() if row[3] else None
+        
+        return {
+            'id': row[0],
+            'task_type': row[1],
+            'payload': json.loads(row[2]),
+            'article_id': row[3],
+            'attempts': row[4],
+            'max_attempts': row[5],
+            'article_owner': owner[0] if owner else None,
+        }
+    
+    @instrumented(DB_QUERIES)
+    def complete_task(self, task_id: int, worker_id: str, follow_ups: Iterable[Dict] = ()) -> bool:
+        """
+        Mark a claimed task done and queue its follow-up tasks in one transaction
+        
+        Returns:
+            False if the worker's lease was lost (the task was reclaimed)
+        """
+        with self.transaction(immediate=True) as cursor:
+            cursor.execute('''
+                UPDATE tasks
+                SET state = 'done', locked_by = NULL, locked_until = NULL,
+                    last_error = NULL, updated_at = ?
+                WHERE id = ? AND locked_by = ?
+            ''', (time.time(), task_id, worker_id))
+            if cursor.rowcount == 0:
+                return False
+            self._insert_tasks(cursor, list(follow_ups))
+        return True
+    
+    @instrumented(DB_QUERIES)
+    def extend_task_lease(self, task_id: int, worker_id: str, lease_seconds: float = None) -> bool:
+        """Heartbeat for a running task, returns False if the worker no longer holds it"""
+        with self.transaction() as cursor:
+            cursor.execute(
+                'UPDATE tasks SET locked_until = ? WHERE id = ? AND locked_by = ? AND state = \'running\'',
+                (time.time() + (lease_seconds or config.TASK_LEASE_SECONDS), task_id, worker_id)
+            )
+            return cursor.rowcount > 0
+    
+    @instrumented(DB_QUERIES)
+    def fail_task(self, task_id: int, worker_id: str, error: str, retry_at: float = None):
+        """Requeue a claimed task to run at retry_at, or mark it failed if retry_at is None"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE tasks
+                SET state = ?, next_run_at = COALESCE(?, next_run_at), last_error = ?,
+                    locked_by = NULL, locked_until = NULL, updated_at = ?
+                WHERE id = ? AND locked_by = ?
+            ''', ('queued' if retry_at else 'failed', retry_at, error, time.time(), task_id, worker_id))
+    
+    @instrumented(DB_QUERIES)
+    def record_job_run(self, job_name: str, scheduled_at: float, started_at: float,
+                       finished_at: float, status: str, error: str = None):
+        """Record a scheduled job run (see timer_scheduler.py)"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO job_runs (job_name, scheduled_at, started_at, finished_at, status, error)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (job_name, scheduled_at, started_at, finished_at, status, error))
+    
+    @instrumented(DB_QUERIES)
+    def get_last_job_run(self, job_name: str) -> Optional[float]:
+        """Scheduled time (Unix) of the latest recorded run of a job, if any"""
+        row = self.get_connection().execute(
+            'SELECT MAX(scheduled_at) FROM job_runs WHERE job_name = ?', (job_name,)
+        ).fetchone()
+        return row[0]
+    
+    @instrumented(DB_QUERIES)
+    def list_articles(self, status: str = None, fields: List[str] = None,
+                      limit: int = 50, cursor: str = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Page through articles ordered by score, newest first among equal scores
+        
+        Uses keyset pagination on (ai_score, found_date, id), see LIST_KEYSET:
+        the cursor encodes the last row of the previous page, so every page is
+        an index range scan no matter how deep it is. Articles without a score
+        or date come last.
+        
+        Args:
+            status: Only return articles with this status
+            fields: Columns to return (see ARTICLE_FIELDS), defaults to LIST_FIELDS
+            limit: Page size
+            cursor: next_cursor from the previous page
+        
+        Returns:
+            (articles, next_cursor) where next_cursor is None on the last page
+        """
+        fields = list(fields or LIST_FIELDS)
+        unknown = [f for f in fields if f not in ARTICLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        
+        columns = list(dict.fromkeys(fields + ['id']))
+        # The keyset values are always read to build the next cursor
+        query = (
+            f"SELECT {', '.join(ARTICLE_FIELDS[f] for f in columns)}, {', '.join(LIST_KEYSET[:2])} "
+            f"FROM articles"
+        )
+        conditions = []
+        params = []
+        
+        if status:
+            conditions.append('status = ?')
+            params.append(status)
+        
+        if cursor:
+            score, found_date, article_id = decode_cursor(cursor)
+            # The bound on the first key lets SQLite seek the expression index,
+            # which it doesn't do for the row value alone
+            conditions.append(f"{LIST_KEYSET[0]} <= ? AND ({', '.join(LIST_KEYSET)}) < (?, ?, ?)")
+            params.extend([score, score, found_date, article_id])
+        
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += f" ORDER BY {', '.join(f'{key} DESC' for key in LIST_KEYSET)} LIMIT ?"
+        params.append(limit + 1)
+        
+        rows = self.get_connection().execute(query, params).fetchall()
+        
+        articles = [self._decode_article(dict(zip(columns, row))) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last[-2], last[-1], articles[-1]['id'])
+        
+        return [{f: article[f] for f in fields} for article in articles], next_cursor
+    
+    @instrumented(DB_QUERIES)
+    def search_articles(self, query: str, status: str = None, fields: List[str] = None,
+                        limit: int = 50, cursor: str = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Full-text search over article titles, content and keywords, best match first
+        
+        Matches are ranked by bm25 (see SEARCH_WEIGHTS) and paged with a
+        cursor on (rank, id). Each result carries 'title_highlight' and a
+        'snippet' of the content around the matched words, both with the
+        words wrapped in HIGHLIGHT_OPEN / HIGHLIGHT_CLOSE.
+        
+        Args:
+            query: Words to look for, all of which must match (any inflection)
+            status: Only return articles with this status
+            fields: Columns to return (see ARTICLE_FIELDS), defaults to LIST_FIELDS
+            limit: Page size
+            cursor: next_cursor from the previous page
+        
+        Returns:
+            (articles, next_cursor) where next_cursor is None on the last page
+        """
+        stems = text_search.query_stems(query)
+        if not stems:
+            raise ValueError("Search query has no words")
+        fields = list(fields or LIST_FIELDS)
+        unknown = [f for f in fields if f not in ARTICLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        
+        conditions = ['articles_fts MATCH ?']
+        params: list = [text_search.build_match_query(stems)]
+        if status:
+            conditions.append('(SELECT status FROM articles WHERE id = articles_fts.rowid) = ?')
+            params.append(status)
+        if cursor:
+            conditions.append('(rank, rowid) > (?, ?)')
+            params.extend(decode_cursor(cursor, size=2))
+        params.append(limit + 1)
+        
+        conn = self.get_connection()
+        hits = conn.execute(f"""
+            SELECT rowid, rank FROM articles_fts
+            WHERE {' AND '.join(conditions)}
+            ORDER BY rank, rowid
+            LIMIT ?
+        """, params).fetchall()
+        
+        next_cursor = None
+        if len(hits) > limit:
+            last_id, last_rank = hits[limit - 1]
+            next_cursor = encode_cursor(last_rank, last_id)
+        hits = hits[:limit]
+        if not hits:
+            return [], None
+        
+        # The index holds stems only; highlights come from the stored text
+        columns = list(dict.fromkeys(fields + ['id', 'title', 'content']))
+        rows = {}
+        for offset in range(0, len(hits), SQL_VARIABLE_CHUNK):
+            ids = [article_id for article_id, _ in hits[offset:offset + SQL_VARIABLE_CHUNK]]
+            for row in conn.execute(
+                f"SELECT {', '.join(ARTICLE_FIELDS[f] for f in columns)} FROM articles "
+                f"WHERE id IN ({', '.join('?' * len(ids))})", ids
+            ):
+                article = self._decode_article(dict(zip(columns, row)))
+                rows[article['id']] = article
+        
+        articles = []
+        for article_id, rank in hits:
+            article = rows.get(article_id)
+            if article is None:
+                continue
+            result = {f: article[f] for f in fields}
+            result['score'] = -rank
+            result['title_highlight'] = text_search.highlight(
+                article['title'], stems, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE
+            )
+            result['snippet'] = text_search.snippet(
+                article['content'], stems, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, SNIPPET_WORDS
+            )
+            articles.append(result)
+        return articles, next_cursor
+    
+    @instrumented(DB_QUERIES)
+    def get_article(self, article_id: int) -> Optional[Dict]:
+        """Get a single article with all fields"""
+        columns = [f for f in ARTICLE_FIELDS if f != 'excerpt']
+        row = self.get_connection().execute(
+            f"SELECT {', '.join(ARTICLE_FIELDS[f] for f in columns)} FROM articles WHERE id = ?",
+            (article_id,)
+        ).fetchone()
+        return self._decode_article(dict(zip(columns, row))) if row else None
+    
+    def _decode_article(self, article: Dict) -> Dict:
+        """Decompress and decode the stored columns of an article row"""
+        if 'content' in article:
+            article['content'] = self.codec.decompress(article['content'])
+        if 'keywords' in article:
+            article['keywords'] = json.loads(article['keywords']) if article['keywords'] else []
+        if 'analysis' in article:
+            analysis = self.codec.decompress(article['analysis'])
+            article['analysis'] = json.loads(analysis) if analysis else {}
+        return article
+    
+    @instrumented(DB_QUERIES)
+    def get_stats(self) -> Dict:
+        """
+        Dashboard counters, read from the trigger-maintained article_stats table
+        
+        Returns:
+            Dict with total, per-status counts and the average positive ai_score
+        """
+        rows = self.get_connection().execute(
+            'SELECT status, article_count, score_sum, score_count FROM article_stats'
+        ).fetchall()
+        
+        by_status = {status: count for status, count, _, _ in rows}
+        score_sum = sum(row[2] for row in rows)
+        score_count = sum(row[3] for row in rows)
+        
+        return {
+            'total_articles': sum(by_status.values()),
+            'by_status': by_status,
+            'avg_score': score_sum / score_count if score_count else 0,
+        }
+    
+    @instrumented(DB_QUERIES)
+    def get_topic_stats(self, status: str = None, limit: int = 20) -> List[Dict]:
+        """
+        Per-topic analytics over the key_topics of the analyses, most frequent first
+        
+        Args:
+            status: Only articles with this status
+            limit: Number of topics
+        
+        Returns:
+            One dict per topic: article count, published count and the average
+            of every score (None where no article has that score)
+        """
+        if int(limit) < 1:
+            raise ValueError(f"limit must be positive: {limit}")
+        averages = ', '.join(f'AVG(a.{column}) AS avg_{column}' for column in SCORE_COLUMNS.values())
+        query = f'''
+            SELECT t.topic, COUNT(*) AS article_count,
+                   SUM(a.status = 'published') AS published_count, {averages}
+            FROM article_topics t
+            JOIN articles a ON a.id = t.article_id
+        '''
+        params = []
+        if status:
+            query += ' WHERE a.status = ?'
+            params.append(status)
+        query += ' GROUP BY t.topic ORDER BY article_count DESC, t.topic LIMIT ?'
+        params.append(int(limit))
+        
+        cursor = self.get_connection().execute(query, params)
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    def export_rows(self, table: str, since_id: int = None, since_date: str = None) -> Iterator[Dict]:
+        """
+        Iterate over every row of articles or publications in id order
+        
+        Rows come from one query on a dedicated connection, EXPORT_FETCH_SIZE at
+        a time, so memory use does not grow with the table and the export is a
+        consistent snapshot while the scheduler keeps writing. The iterator may
+        be advanced from different threads (StreamingResponse does), which the
+        per-thread pooled connections don't allow. Closing it closes the connection.
+        
+        Args:
+            table: 'articles' or 'publications'
+            since_id: Only rows with a greater id, for incremental exports
+            since_date: Only rows found / published at or after this
+                'YYYY-MM-DD HH:MM:SS' time (scans the table)
+        """
+        if table not in EXPORT_COLUMNS:
+            raise ValueError(f"Unknown export table: {table}")
+        
+        columns = EXPORT_COLUMNS[table]
+        query = f"SELECT {', '.join(columns)} FROM {table}"
+        conditions = []
+        params = []
+        if since_id is not None:
+            conditions.append('id > ?')
+            params.append(since_id)
+        if since_date is not None:
+            conditions.append(f'{EXPORT_DATE_COLUMNS[table]} >= ?')
+            params.append(since_date)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY id'
+        return self._iter_export(table, columns, query, params)
+    
+    def _iter_export(self, table: str, columns: List[str], query: str, params: list) -> Iterator[Dict]:
+        conn = self._connect()
+        # A single sequential pass: mapping the file would only grow the process by the table size
+        conn.execute('PRAGMA mmap_size = 0')
+        try:
+            rows = conn.execute(query, params)
+            while True:
+                batch = rows.fetchmany(EXPORT_FETCH_SIZE)
+                if not batch:
+                    break
+                for row in batch:
+                    record = dict(zip(columns, row))
+                    yield self._decode_article(record) if table == 'articles' else record
+        finally:
+            conn.close()
+    
+    @instrumented(DB_QUERIES)
     def get_article_by_url(self, url: str) -> Optional[Dict]:
         """Get article by URL"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM articles WHERE url = ?', (url,))
-        row = cursor.fetchone()
-        conn.close()
+        row = self.get_connection().execute(
+            'SELECT * FROM articles WHERE url = ?', (url,)
+        ).fetchone()
         
         if row:
             return {
                 'id': row[0],
                 'title': row[1],
                 'url': row[2],
-                'content': row[3],
+                'content': self.codec.decompress(row[3]),
                 'source': row[4],
                 'keywords': json.loads(row[5]) if row[5] else [],
                 'ai_score': row[6],
                 'relevance_score': row[7]
             }
         return None
+
+
+# Schema migrations
+#
+# Each migration runs once, in order, inside the startup transaction and is
+# recorded in schema_version. Never edit a migration that has shipped; add a
+# new one instead.
+
+def _migration_001_article_indexes(cursor: sqlite3.Cursor):
+    """Indexes for the pending-article ranking and the dashboard article list"""
+    # get_pending_articles: WHERE status = ? AND ai_score >= ? ORDER BY ai_score, relevance_score
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_articles_status_rank
+        ON articles (status, ai_score DESC, relevance_score DESC)
+    ''')
+    # /api/articles with a status filter: ORDER BY ai_score, found_date
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_articles_status_score_found
+        ON articles (status, ai_score DESC, found_date DESC)
+    ''')
+    # /api/articles without a filter
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_articles_score_found
+        ON articles (ai_score DESC, found_date DESC)
+    ''')
+
+
+def _migration_002_publication_indexes(cursor: sqlite3.Cursor):
+    """Indexes for the activity log and per-article publication lookups"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_publications_published_date
+        ON publications (published_date)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_publications_article_platform
+        ON publications (article_id, platform)
+    ''')
+
+
+def _migration_003_wordpress_tag_cache(cursor: sqlite3.Cursor):
+    """Local cache of WordPress tag IDs, plus refresh times for cached data sets"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS wp_tags (
+            name_key TEXT PRIMARY KEY,
+            term_id INTEGER NOT NULL,
+            name TEXT,
+            updated_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            synced_at REAL
+        )
+    ''')
+
+
+def _migration_004_near_duplicate_index(cursor: sqlite3.Cursor):
+    """MinHash signatures and LSH buckets for near-duplicate detection, backfilled"""
+    from dedup import compute_signature, signature_to_bytes, band_buckets
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS article_signatures (
+            article_id INTEGER PRIMARY KEY,
+            signature BLOB NOT NULL,
+            FOREIGN KEY (article_id) REFERENCES articles (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS article_lsh_buckets (
+            bucket INTEGER NOT NULL,
+            article_id INTEGER NOT NULL,
+            PRIMARY KEY (bucket, article_id)
+        ) WITHOUT ROWID
+    ''')
+    
+    last_id = 0
+    while True:
+        cursor.execute(
+            'SELECT id, title, content FROM articles WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, MIGRATION_BATCH_SIZE)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for article_id, title, content in rows:
+            signature = compute_signature(title or '', content or '')
+            cursor.execute(
+                'INSERT OR REPLACE INTO article_signatures (article_id, signature) VALUES (?, ?)',
+                (article_id, signature_to_bytes(signature))
+            )
+            cursor.executemany(
+                'INSERT OR IGNORE INTO article_lsh_buckets (bucket, article_id) VALUES (?, ?)',
+                [(bucket, article_id) for bucket in band_buckets(signature)]
+            )
+        last_id = rows[-1][0]
+
+
+def _migration_005_article_stats(cursor: sqlite3.Cursor):
+    """Per-status article counters for the dashboard, kept current by triggers, backfilled"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS article_stats (
+            status TEXT PRIMARY KEY,
+            article_count INTEGER NOT NULL DEFAULT 0,
+            score_sum REAL NOT NULL DEFAULT 0,
+            score_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    # Only positive scores count towards the average, as /api/stats always did
+    add_row = '''
+        INSERT INTO article_stats (status, article_count, score_sum, score_count)
+        VALUES (
+            COALESCE(NEW.status, ''), 1,
+            CASE WHEN NEW.ai_score > 0 THEN NEW.ai_score ELSE 0 END,
+            CASE WHEN NEW.ai_score > 0 THEN 1 ELSE 0 END
+        )
+        ON CONFLICT (status) DO UPDATE SET
+            article_count = article_count + 1,
+            score_sum = score_sum + excluded.score_sum,
+            score_count = score_count + excluded.score_count;
+    '''
+    remove_row = '''
+        UPDATE article_stats SET
+            article_count = article_count - 1,
+            score_sum = score_sum - CASE WHEN OLD.ai_score > 0 THEN OLD.ai_score ELSE 0 END,
+            score_count = score_count - CASE WHEN OLD.ai_score > 0 THEN 1 ELSE 0 END
+        WHERE status = COALESCE(OLD.status, '');
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_article_stats_insert
+        AFTER INSERT ON articles
+        BEGIN {add_row} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_article_stats_update
+        AFTER UPDATE OF status, ai_score ON articles
+        BEGIN {remove_row} {add_row} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_article_stats_delete
+        AFTER DELETE ON articles
+        BEGIN {remove_row} END
+    ''')
+    
+    cursor.execute('DELETE FROM article_stats')
+    cursor.execute('''
+        INSERT INTO article_stats (status, article_count, score_sum, score_count)
+        SELECT COALESCE(status, ''), COUNT(*),
+               COALESCE(SUM(CASE WHEN ai_score > 0 THEN ai_score END), 0),
+               COUNT(CASE WHEN ai_score > 0 THEN 1 END)
+        FROM articles
+        GROUP BY COALESCE(status, '')
+    ''')
+
+
+def _migration_006_task_queue(cursor: sqlite3.Cursor):
+    """Durable queue for publication tasks (see task_queue.py)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_type TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            article_id INTEGER,
+            state TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            next_run_at REAL NOT NULL,
+            dedupe_key TEXT,
+            last_error TEXT,
+            locked_by TEXT,
+            locked_until REAL,
+            created_at REAL,
+            updated_at REAL,
+            FOREIGN KEY (article_id) REFERENCES articles (id)
+        )
+    ''')
+    # A dedupe_key only blocks new tasks while a task holding it is unfinished
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_active_dedupe_key
+        ON tasks (dedupe_key) WHERE state IN ('queued', 'running')
+    ''')
+    # claim_task: due queued tasks and expired leases, oldest first
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tasks_state_next_run
+        ON tasks (state, next_run_at)
+    ''')
+
+
+def _migration_007_article_claims(cursor: sqlite3.Cursor):
+    """Lease columns for claim_pending_articles"""
+    cursor.execute('ALTER TABLE articles ADD COLUMN claimed_by TEXT')
+    cursor.execute('ALTER TABLE articles ADD COLUMN claim_expires REAL')
+    # Articles queued before leases existed can be reclaimed if their tasks are gone
+    cursor.execute("UPDATE articles SET claim_expires = 0 WHERE status = 'queued'")
+    # Reclaim check: unfinished tasks of an article
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tasks_article_state
+        ON tasks (article_id, state)
+    ''')
+
+
+def _migration_008_job_runs(cursor: sqlite3.Cursor):
+    """History of scheduled job runs, used to catch up runs missed while stopped"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_name TEXT NOT NULL,
+            scheduled_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            status TEXT,
+            error TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_job_runs_name_scheduled
+        ON job_runs (job_name, scheduled_at)
+    ''')
+
+
+def _fts_indexed_values(row: str, compressed: bool) -> str:
+    """The articles_fts values (rowid, title, content, keywords) of an articles row, as SQL"""
+    # keywords are a JSON array (with escaped Cyrillic); index the words
+    keywords = (
+        f"(SELECT group_concat(value, ' ') FROM json_each("
+        f"CASE WHEN json_valid({row}.keywords) THEN {row}.keywords ELSE '[]' END))"
+    )
+    content = f"decompress_text({row}.content)" if compressed else f"{row}.content"
+    return f"{row}.id, stem_text({row}.title), stem_text({content}), stem_text({keywords})"
+
+
+def _create_fts_triggers(cursor: sqlite3.Cursor, compressed: bool):
+    """
+    Triggers keeping articles_fts in sync with articles
+    
+    The index is contentless, so deletes repeat the indexed values.
+    compressed: content is stored compressed (since migration 10)
+    """
+    index_row = (
+        "INSERT INTO articles_fts (rowid, title, content, keywords) "
+        f"VALUES ({_fts_indexed_values('NEW', compressed)});"
+    )
+    unindex_row = (
+        "INSERT INTO articles_fts (articles_fts, rowid, title, content, keywords) "
+        f"VALUES ('delete', {_fts_indexed_values('OLD', compressed)});"
+    )
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_articles_fts_insert
+        AFTER INSERT ON articles
+        BEGIN {index_row} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_articles_fts_update
+        AFTER UPDATE OF title, content, keywords ON articles
+        BEGIN {unindex_row} {index_row} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_articles_fts_delete
+        AFTER DELETE ON articles
+        BEGIN {unindex_row} END
+    ''')
+
+
+def _migration_009_article_search(cursor: sqlite3.Cursor):
+    """Full-text index of stemmed article titles, content and keywords, kept in sync by triggers, backfilled"""
+    # Contentless: the index keeps only stems (see text_search.py) and search
+    # results read the text from articles
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+            title, content, keywords,
+            content='',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    cursor.execute(
+        "INSERT INTO articles_fts (articles_fts, rank) VALUES ('rank', ?)",
+        (f"bm25({', '.join(str(weight) for weight in SEARCH_WEIGHTS)})",)
+    )
+    
+    _create_fts_triggers(cursor, compressed=False)
+    
+    cursor.execute(f"INSERT INTO articles_fts (rowid, title, content, keywords) "
+                   f"SELECT {_fts_indexed_values('articles', compressed=False)} FROM articles")
+
+
+def _compact_json(text: Optional[str]) -> Optional[str]:
+    """JSON text without the \\u escapes of json.dumps' default, which triple the size of Cyrillic"""
+    try:
+        return json.dumps(json.loads(text), ensure_ascii=False) if text else text
+    except ValueError:
+        return text
+
+
+def _train_dictionary(cursor: sqlite3.Cursor, codec: compression.TextCodec, column: str,
+                      current: int = 0) -> int:
+    """
+    Train a dictionary for a compressed column on the newest articles, store and register it
+    
+    Returns:
+        The new dictionary's id, or current if the result is the same
+        dictionary or every dictionary id is taken
+    """
+    cursor.execute(
+        f'SELECT {column} FROM articles WHERE {column} IS NOT NULL ORDER BY id DESC LIMIT ?',
+        (DICTIONARY_TRAINING_ROWS,)
+    )
+    samples = [codec.decompress(value) for value, in cursor.fetchall()]
+    if column == 'analysis':
+        samples = [_compact_json(sample) for sample in samples]
+    dictionary = compression.train_dictionary(samples, seed=COMPRESSED_COLUMNS[column])
+    if current and codec.dictionaries.get(current) == dictionary:
+        cursor.execute('UPDATE compression_dictionaries SET samples = ? WHERE id = ?', (len(samples), current))
+        return current
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM compression_dictionaries')
+    if cursor.fetchone()[0] >= compression.MAX_DICTIONARY_ID:
+        logger.warning(f"No compression dictionary id left, articles.{column} keeps dictionary {current}")
+        return current
+    cursor.execute(
+        'INSERT INTO compression_dictionaries (column_name, dictionary, samples) VALUES (?, ?, ?)',
+        (column, dictionary, len(samples))
+    )
+    codec.add(cursor.lastrowid, dictionary)
+    logger.info(f"Trained compression dictionary {cursor.lastrowid} for articles.{column}")
+    return cursor.lastrowid
+
+
+def _migration_010_compressed_text(cursor: sqlite3.Cursor):
+    """Compress article content and analysis with trained dictionaries, in batches"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS compression_dictionaries (
+            id INTEGER PRIMARY KEY,
+            column_name TEXT NOT NULL,
+            dictionary BLOB NOT NULL,
+            samples INTEGER NOT NULL,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # The full-text index triggers now read the text through decompress_text();
+    # rewriting the rows below leaves the indexed text unchanged, so they are
+    # recreated only afterwards
+    for trigger in ('trg_articles_fts_insert', 'trg_articles_fts_update', 'trg_articles_fts_delete'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    
+    codec = compression.TextCodec()
+    dictionary_ids = {column: _train_dictionary(cursor, codec, column) for column in COMPRESSED_COLUMNS}
+    
+    last_id = 0
+    while True:
+        cursor.execute(
+            'SELECT id, content, analysis FROM articles WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, MIGRATION_BATCH_SIZE)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany('UPDATE articles SET content = ?, analysis = ? WHERE id = ?', [
+            (codec.compress(content, dictionary_ids['content']),
+             codec.compress(_compact_json(analysis), dictionary_ids['analysis']),
+             article_id)
+            for article_id, content, analysis in rows
+        ])
+        last_id = rows[-1][0]
+    
+    _create_fts_triggers(cursor, compressed=True)
+
+
+def _migration_011_article_scores(cursor: sqlite3.Cursor):
+    """Score columns and a topics table filled from the analysis JSON, backfilled in batches"""
+    for column in ('quality_score', 'timeliness_score', 'business_value_score', 'uniqueness_score'):
+        cursor.execute(f'ALTER TABLE articles ADD COLUMN {column} REAL')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS article_topics (
+            topic TEXT NOT NULL,
+            article_id INTEGER NOT NULL,
+            PRIMARY KEY (topic, article_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_article_topics_article ON article_topics (article_id)')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_article_topics_delete
+        AFTER DELETE ON articles
+        BEGIN DELETE FROM article_topics WHERE article_id = OLD.id; END
+    ''')
+    
+    # The analyses were compressed by migration 10, possibly in this same run,
+    # before the database loaded its dictionaries
+    cursor.execute('SELECT id, dictionary FROM compression_dictionaries')
+    codec = compression.TextCodec(dict(cursor.fetchall()))
+    
+    last_id = 0
+    while True:
+        cursor.execute(
+            'SELECT id, analysis FROM articles WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, MIGRATION_BATCH_SIZE)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        scores = []
+        topics = []
+        for article_id, analysis in rows:
+            try:
+                analysis = json.loads(codec.decompress(analysis) or '{}')
+            except ValueError:
+                analysis = {}
+            values = analysis_scores(analysis)
+            scores.append((
+                values['quality_score'], values['timeliness_score'],
+                values['business_value_score'], values['uniqueness_score'], article_id,
+            ))
+            topics.extend((topic, article_id) for topic in article_topics(analysis))
+        cursor.executemany('''
+            UPDATE articles
+            SET quality_score = ?, timeliness_score = ?, business_value_score = ?, uniqueness_score = ?
+            WHERE id = ?
+        ''', scores)
+        cursor.executemany('INSERT OR IGNORE INTO article_topics (topic, article_id) VALUES (?, ?)', topics)
+        last_id = rows[-1][0]
+
+
+def _migration_012_list_keyset_indexes(cursor: sqlite3.Cursor):
+    """Indexes on the NULL-safe keyset of the article list (LIST_KEYSET)"""
+    cursor.execute('DROP INDEX IF EXISTS idx_articles_score_found')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_articles_list_keyset
+        ON articles (COALESCE(ai_score, -1) DESC, COALESCE(found_date, '') DESC, id DESC)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_articles_status_list_keyset
+        ON articles (status, COALESCE(ai_score, -1) DESC, COALESCE(found_date, '') DESC, id DESC)
+    ''')
+
+
+def _migration_013_rank_index(cursor: sqlite3.Cursor):
+    """Drop the ai_score ranking index, superseded by the rank_score index (_ensure_rank_index)"""
+    cursor.execute('DROP INDEX IF EXISTS idx_articles_status_rank')
+
+
+def _ensure_rank_index(cursor: sqlite3.Cursor):
+    """Rebuild the rank_score index when config.RANKING_WEIGHTS changed since it was built"""
+    sql = rank_index_sql()
+    cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = 'idx_articles_status_rank_score'"
+    )
+    row = cursor.fetchone()
+    if row and row[0] == sql:
+        return
+    logger.info("Building the publication ranking index for the current RANKING_WEIGHTS...")
+    cursor.execute('DROP INDEX IF EXISTS idx_articles_status_rank_score')
+    cursor.execute(sql)
+
+
+def _migration_014_search_index_in_python(cursor: sqlite3.Cursor):
+    """
+    Drop the full-text index triggers: they call stem_text() and
+    decompress_text(), which only ArticleDatabase connections define, so any
+    other writer of articles failed. The index is now updated by
+    ArticleDatabase itself (update_search_index).
+    """
+    for trigger in ('trg_articles_fts_insert', 'trg_articles_fts_update', 'trg_articles_fts_delete'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, 'article ranking indexes', _migration_001_article_indexes),
+    (2, 'publication indexes', _migration_002_publication_indexes),
+    (3, 'wordpress tag cache', _migration_003_wordpress_tag_cache),
+    (4, 'near-duplicate index', _migration_004_near_duplicate_index),
+    (5, 'article stats counters', _migration_005_article_stats),
+    (6, 'task queue', _migration_006_task_queue),
+    (7, 'article claim leases', _migration_007_article_claims),
+    (8, 'job run history', _migration_008_job_runs),
+    (9, 'article full-text search', _migration_009_article_search),
+    (10, 'compressed article text', _migration_010_compressed_text),
+    (11, 'article score columns and topics', _migration_011_article_scores),
+    (12, 'article list keyset indexes', _migration_012_list_keyset_indexes),
+    (13, 'publication rank index', _migration_013_rank_index),
+    (14, 'full-text index maintained by the application', _migration_014_search_index_in_python),
+]
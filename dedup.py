@@ -0,0 +1,193 @@
+"""
+Near-duplicate detection for search results using MinHash + LSH
+
+Gemini suggests heavily overlapping articles for related keywords. Each
+candidate's normalized title and description are reduced to a MinHash
+signature; signatures are split into LSH bands whose hashes are stored next
+to the articles table, so likely near-copies are found with an indexed
+lookup instead of comparing against every stored article.
+"""
+import hashlib
+import re
+import threading
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import config
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 4
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed permutation parameters so signatures stay comparable across runs
+_PERMUTATIONS = [
+    (
+        int.from_bytes(hashlib.blake2b(f'a{i}'.encode(), digest_size=8).digest(), 'big') % (_MERSENNE_PRIME - 1) + 1,
+        int.from_bytes(hashlib.blake2b(f'b{i}'.encode(), digest_size=8).digest(), 'big') % _MERSENNE_PRIME,
+    )
+    for i in range(NUM_PERM)
+]
+
+Signature = Tuple[int, ...]
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, fold ё to е and strip punctuation so trivial edits don't matter"""
+    text = (text or '').lower().replace('ё', 'е')
+    return ' '.join(re.findall(r'\w+', text))
+
+
+def compute_signature(title: str, description: str) -> Signature:
+    """MinHash signature over character shingles of the normalized title and description"""
+    text = normalize_text(f'{title} {description}')
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = [zlib.crc32(shingle.encode('utf-8')) & _MAX_HASH for shingle in shingles]
+
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def signature_to_bytes(signature: Signature) -> bytes:
+    return array('Q', signature).tobytes()
+
+
+def signature_from_bytes(data: bytes) -> Signature:
+    values = array('Q')
+    values.frombytes(data)
+    return tuple(values)
+
+
+def band_buckets(signature: Signature) -> List[int]:
+    """Hash each LSH band (band number included) to a signed 63-bit bucket id"""
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(repr((band, rows)).encode(), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'big') >> 1)
+    return buckets
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    """
+    LSH index over stored articles plus the candidates accepted during this run
+
+    Candidates accepted by deduplicate() are kept in memory for the rest of
+    the run, so concurrent keywords can't both let the same near-copy through.
+    Keywords of near-copies found before the candidate is stored are collected
+    and merged into its article by register().
+    """
+
+    def __init__(self, db, threshold: float = None):
+        self.db = db
+        self.threshold = threshold if threshold is not None else config.DEDUP_THRESHOLD
+        # bucket -> accepted candidates: {'signature', 'keywords', 'article_id'}
+        self._pending: Dict[int, List[Dict]] = {}
+        self._by_signature: Dict[Signature, Dict] = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Forget the in-memory candidates of the previous run"""
+        with self._lock:
+            self._pending.clear()
+            self._by_signature.clear()
+
+    def deduplicate(self, keyword: str, articles: List[Dict]) -> List[Tuple[Dict, Signature]]:
+        """
+        Drop candidates that are near-copies of stored or already accepted articles
+
+        Near-copies are merged: the keyword is added to the stored article's
+        keywords, or, for a candidate accepted earlier in this run, once
+        register() stores it.
+
+        Returns:
+            The remaining candidates with their signatures
+        """
+        kept = []
+        merged = set()
+
+        with self._lock:
+            for article in articles:
+                signature = compute_signature(article.get('title', ''), article.get('description', ''))
+                buckets = band_buckets(signature)
+
+                article_id = self._find_stored(signature, buckets)
+                if article_id is not None:
+                    merged.add(article_id)
+                    continue
+
+                entry = self._find_pending(signature, buckets)
+                if entry is not None:
+                    if entry['article_id'] is not None:
+                        merged.add(entry['article_id'])
+                    elif keyword not in entry['keywords']:
+                        entry['keywords'].append(keyword)
+                    continue
+
+                entry = {'signature': signature, 'keywords': [keyword], 'article_id': None}
+                for bucket in buckets:
+                    self._pending.setdefault(bucket, []).append(entry)
+                self._by_signature[signature] = entry
+                kept.append((article, signature))
+
+        for article_id in merged:
+            self.db.merge_article_keywords(article_id, [keyword])
+
+        dropped = len(articles) - len(kept)
+        if dropped:
+            logger.info(f"Skipped {dropped} near-duplicate results for keyword: {keyword}")
+        return kept
+
+    def register(self, entries: Iterable[Tuple[int, Signature]]):
+        """Persist signatures of newly stored articles and merge their near-copies' keywords"""
+        entries = list(entries)
+        rows = [
+            (article_id, signature_to_bytes(signature), band_buckets(signature))
+            for article_id, signature in entries
+        ]
+        self.db.add_article_signatures(rows)
+
+        # From here on, deduplicate() merges further near-copies into the stored article
+        late_keywords = []
+        with self._lock:
+            for article_id, signature in entries:
+                entry = self._by_signature.get(signature)
+                if entry is None:
+                    continue
+                entry['article_id'] = article_id
+                if len(entry['keywords']) > 1:
+                    late_keywords.append((article_id, list(entry['keywords'])))
+
+        for article_id, keywords in late_keywords:
+            self.db.merge_article_keywords(article_id, keywords)
+
+    def _find_stored(self, signature: Signature, buckets: List[int]) -> Optional[int]:
+        best_id, best_score = None, self.threshold
+        for article_id, data in self.db.find_signature_candidates(buckets):
+            score = similarity(signature, signature_from_bytes(data))
+            if score >= best_score:
+                best_id, best_score = article_id, score
+        return best_id
+
+    def _find_pending(self, signature: Signature, buckets: List[int]) -> Optional[Dict]:
+        for bucket in buckets:
+            for entry in self._pending.get(bucket, ()):
+                if similarity(signature, entry['signature']) >= self.threshold:
+                    return entry
+        return None
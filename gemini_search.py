@@ -2,29 +2,266 @@
 Gemini API integration for searching and analyzing articles
 """
 import google.generativeai as genai
-from typing import List, Dict
-import json
+from typing import AsyncIterator, Iterator, List, Dict, Optional, Tuple
 import config
 import logging
+from json_stream import IncrementalJSONParser
+from response_cache import ResponseCache, CACHE_MODES
+from metrics import GEMINI_CACHE
+from rate_limiter import call_with_backoff, call_with_backoff_async
+from tracing import traced
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MODEL_NAME = 'gemini-pro'
+
+# Bump a method's version whenever its prompt or output format changes
+# in a way that should invalidate cached responses
+PROMPT_VERSIONS = {
+    'search_articles': 1,
+    'analyze_article': 1,
+    'generate_blog_post': 1,
+}
+
+# Top-level arrays whose elements are recovered one by one, so a malformed
+# tail doesn't discard the elements that came before it
+ARRAY_KEYS = {
+    'search_articles': 'articles',
+    'analyze_articles': 'analyses',
+}
+
+# Metrics operation label of each request kind
+METRIC_OPERATIONS = {
+    'search_articles': 'gemini.search',
+    'analyze_article': 'gemini.analyze',
+    'analyze_articles': 'gemini.analyze',
+    'generate_blog_post': 'gemini.generate',
+}
+
+ANALYSIS_RUBRIC = """
+        Оцени статью по следующим критериям (от 1 до 10):
+        1. Релевантность для аудитории (энергоаудит, тепловизия, вентиляция)
+        2. Качество контента и информативность
+        3. Актуальность информации
+        4. Потенциал для привлечения клиентов
+        5. Уникальность и ценность информации
+        
+        Также определи:
+        - Ключевые темы статьи
+        - Целевая аудитория
+        - Рекомендации по адаптации для блога
+        - Предложения для заголовка в соц.сетях
+""".strip('\n')
+
+ANALYSIS_SCHEMA = """
+        {
+            "scores": {
+                "relevance": 0-10,
+                "quality": 0-10,
+                "timeliness": 0-10,
+                "business_value": 0-10,
+                "uniqueness": 0-10,
+                "overall": 0-10
+            },
+            "key_topics": ["тема1", "тема2"],
+            "target_audience": "...",
+            "adaptation_tips": "...",
+            "social_media_title": "..."
+        }
+""".strip('\n')
+
 class GeminiSearchEngine:
-    def __init__(self):
+    def __init__(self, cache_mode: str = None):
+        """
+        Args:
+            cache_mode: 'on' to use the response cache, 'off' to bypass it,
+                'refresh' to skip cached reads but store fresh responses.
+                Defaults to config.GEMINI_CACHE_MODE
+        """
         if not config.GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY not set in configuration")
         
-        genai.configure(api_key=config.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-pro')
+        if config.GEMINI_API_ENDPOINT:
+            # Only the REST transport can talk to a plain-HTTP endpoint
+            genai.configure(api_key=config.GEMINI_API_KEY, transport='rest',
+                            client_options={'api_endpoint': config.GEMINI_API_ENDPOINT})
+        else:
+            genai.configure(api_key=config.GEMINI_API_KEY)
+        self.model_name = MODEL_NAME
+        self.model = genai.GenerativeModel(self.model_name)
+        
+        self.cache_mode = cache_mode or config.GEMINI_CACHE_MODE
+        if self.cache_mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {self.cache_mode}")
+        self.cache = ResponseCache() if self.cache_mode != 'off' else None
+    
+    def close(self):
+        """Close the response cache"""
+        if self.cache:
+            self.cache.close()
     
+    def _generate_json(self, method: str, prompt: str, use_cache: bool = True) -> Optional[Dict]:
+        """
+        Send a prompt to the model and parse the JSON object in its reply,
+        going through the response cache
+        
+        Returns:
+            Parsed JSON, or None if the request failed or had no JSON
+        """
+        if use_cache:
+            cached = self._cache_lookup(method, prompt)
+            if cached is not None:
+                logger.debug(f"Cache hit for {method}")
+                return cached
+        
+        response = call_with_backoff(
+            'gemini', self.model.generate_content, prompt, operation=METRIC_OPERATIONS[method]
+        )
+        return self._parse_reply(method, prompt, response.text, use_cache)
+    
+    async def _generate_json_async(self, method: str, prompt: str, use_cache: bool = True) -> Optional[Dict]:
+        """Async counterpart of _generate_json using the async Gemini client"""
+        if use_cache:
+            cached = self._cache_lookup(method, prompt)
+            if cached is not None:
+                logger.debug(f"Cache hit for {method}")
+                return cached
+        
+        response = await call_with_backoff_async(
+            'gemini', self.model.generate_content_async, prompt, operation=METRIC_OPERATIONS[method]
+        )
+        return self._parse_reply(method, prompt, response.text, use_cache)
+    
+    def _cache_lookup(self, method: str, prompt: str) -> Optional[Dict]:
+        """Return the cached reply for a prompt, honouring the cache mode"""
+        if not self.cache or self.cache_mode != 'on':
+            return None
+        key = ResponseCache.make_key(method, self.model_name, PROMPT_VERSIONS[method], prompt)
+        cached = self.cache.get(key, method)
+        GEMINI_CACHE.inc(method=method, result='miss' if cached is None else 'hit')
+        return cached
+    
+    def _cache_store(self, method: str, prompt: str, result: Dict):
+        """Store a parsed reply in the cache"""
+        if not self.cache:
+            return
+        key = ResponseCache.make_key(method, self.model_name, PROMPT_VERSIONS[method], prompt)
+        self.cache.set(key, method, result)
+    
+    def _parse_reply(self, method: str, prompt: str, text: str, use_cache: bool) -> Optional[Dict]:
+        """Extract the JSON object from a reply; only fully parsed replies are cached"""
+        parser = IncrementalJSONParser(ARRAY_KEYS.get(method))
+        parser.feed(text)
+        
+        if parser.complete and use_cache:
+            self._cache_store(method, prompt, parser.root)
+        elif not parser.complete and parser.items:
+            logger.warning(f"Malformed {method} reply, kept {len(parser.items)} complete items")
+        
+        return parser.result()
+    
+    @traced()
     def search_articles(self, keyword: str, num_results: int = 10) -> List[Dict]:
         """
         Search for articles using Gemini API
         Note: Gemini doesn't have direct web search, so we ask it to generate
         search queries and provide guidance on finding relevant content
         """
-        prompt = f"""
+        prompt = self._search_prompt(keyword, num_results)
+        
+        try:
+            result = self._generate_json('search_articles', prompt)
+            
+            if result is not None:
+                return result.get('articles', [])
+            else:
+                logger.warning(f"No JSON found in response for keyword: {keyword}")
+                return []
+                
+        except Exception as e:
+            logger.error(f"Error searching with Gemini: {e}")
+            return []
+    
+    @traced()
+    async def search_articles_async(self, keyword: str, num_results: int = 10) -> List[Dict]:
+        """Async counterpart of search_articles"""
+        prompt = self._search_prompt(keyword, num_results)
+        
+        try:
+            result = await self._generate_json_async('search_articles', prompt)
+            
+            if result is not None:
+                return result.get('articles', [])
+            else:
+                logger.warning(f"No JSON found in response for keyword: {keyword}")
+                return []
+                
+        except Exception as e:
+            logger.error(f"Error searching with Gemini: {e}")
+            return []
+    
+    def search_articles_stream(self, keyword: str, num_results: int = 10) -> Iterator[Dict]:
+        """
+        Stream search results: each article is yielded as soon as its JSON
+        object is complete, while the rest of the reply is still being generated
+        """
+        prompt = self._search_prompt(keyword, num_results)
+        
+        cached = self._cache_lookup('search_articles', prompt)
+        if cached is not None:
+            yield from cached.get('articles', [])
+            return
+        
+        parser = IncrementalJSONParser('articles')
+        try:
+            # Latency here is time to first chunk
+            response = call_with_backoff(
+                'gemini', self.model.generate_content, prompt, stream=True, operation='gemini.search_stream'
+            )
+            for chunk in response:
+                yield from parser.feed(chunk.text)
+        except Exception as e:
+            logger.error(f"Error searching with Gemini: {e}")
+        
+        self._finish_stream(keyword, prompt, parser)
+    
+    async def search_articles_stream_async(self, keyword: str, num_results: int = 10) -> AsyncIterator[Dict]:
+        """Async counterpart of search_articles_stream"""
+        prompt = self._search_prompt(keyword, num_results)
+        
+        cached = self._cache_lookup('search_articles', prompt)
+        if cached is not None:
+            for article in cached.get('articles', []):
+                yield article
+            return
+        
+        parser = IncrementalJSONParser('articles')
+        try:
+            response = await call_with_backoff_async(
+                'gemini', self.model.generate_content_async, prompt, stream=True,
+                operation='gemini.search_stream'
+            )
+            async for chunk in response:
+                for article in parser.feed(chunk.text):
+                    yield article
+        except Exception as e:
+            logger.error(f"Error searching with Gemini: {e}")
+        
+        self._finish_stream(keyword, prompt, parser)
+    
+    def _finish_stream(self, keyword: str, prompt: str, parser: IncrementalJSONParser):
+        """Cache a fully parsed streamed search reply, or report what was salvaged"""
+        if parser.complete:
+            self._cache_store('search_articles', prompt, parser.root)
+        elif parser.items:
+            logger.warning(f"Malformed search reply for keyword: {keyword}, kept {len(parser.items)} articles")
+        else:
+            logger.warning(f"No JSON found in response for keyword: {keyword}")
+    
+    def _search_prompt(self, keyword: str, num_results: int) -> str:
+        """Build the article search prompt"""
+        return f"""
         Я ищу статьи и новости по теме: "{keyword}"
         
         Контекст: Компания занимается энергоаудитом, тепловизионным обследованием зданий,
@@ -51,89 +288,230 @@ class GeminiSearchEngine:
             ]
         }}
         """
+    
+    @traced()
+    def analyze_article(self, article: Dict) -> Dict:
+        """
+        Analyze an article using Gemini to determine its quality and relevance
+        Returns scores and analysis
+        """
+        prompt = self._analysis_prompt(article)
         
         try:
-            response = self.model.generate_content(prompt)
-            # Extract JSON from response
-            text = response.text
+            analysis = self._generate_json('analyze_article', prompt)
             
-            # Try to find JSON in the response
-            start_idx = text.find('{')
-            end_idx = text.rfind('}') + 1
+            if analysis is not None:
+                return analysis
+            else:
+                logger.warning("No JSON found in analysis response")
+                return self._default_analysis()
+                
+        except Exception as e:
+            logger.error(f"Error analyzing article: {e}")
+            return self._default_analysis()
+    
+    @traced()
+    async def analyze_article_async(self, article: Dict) -> Dict:
+        """Async counterpart of analyze_article"""
+        prompt = self._analysis_prompt(article)
+        
+        try:
+            analysis = await self._generate_json_async('analyze_article', prompt)
             
-            if start_idx != -1 and end_idx > start_idx:
-                json_str = text[start_idx:end_idx]
-                result = json.loads(json_str)
-                return result.get('articles', [])
+            if analysis is not None:
+                return analysis
             else:
-                logger.warning(f"No JSON found in response for keyword: {keyword}")
-                return []
+                logger.warning("No JSON found in analysis response")
+                return self._default_analysis()
                 
         except Exception as e:
-            logger.error(f"Error searching with Gemini: {e}")
-            return []
+            logger.error(f"Error analyzing article: {e}")
+            return self._default_analysis()
     
-    def analyze_article(self, article: Dict) -> Dict:
-        """
-        Analyze an article using Gemini to determine its quality and relevance
-        Returns scores and analysis
-        """
-        prompt = f"""
+    def _analysis_prompt(self, article: Dict) -> str:
+        """Build the single-article analysis prompt"""
+        return f"""
         Проанализируй следующую статью для новостного блога компании по энергоаудиту:
         
-        Заголовок: {article.get('title', '')}
-        Описание: {article.get('description', '')}
-        Контент: {article.get('content', '')[:1000]}
-        
-        Оцени статью по следующим критериям (от 1 до 10):
-        1. Релевантность для аудитории (энергоаудит, тепловизия, вентиляция)
-        2. Качество контента и информативность
-        3. Актуальность информации
-        4. Потенциал для привлечения клиентов
-        5. Уникальность и ценность информации
+{self._article_block(article)}
         
-        Также определи:
-        - Ключевые темы статьи
-        - Целевая аудитория
-        - Рекомендации по адаптации для блога
-        - Предложения для заголовка в соц.сетях
+{ANALYSIS_RUBRIC}
         
         Верни ответ в формате JSON:
-        {{
-            "scores": {{
-                "relevance": 0-10,
-                "quality": 0-10,
-                "timeliness": 0-10,
-                "business_value": 0-10,
-                "uniqueness": 0-10,
-                "overall": 0-10
-            }},
-            "key_topics": ["тема1", "тема2"],
-            "target_audience": "...",
-            "adaptation_tips": "...",
-            "social_media_title": "..."
-        }}
+{ANALYSIS_SCHEMA}
+        """
+    
+    def _article_block(self, article: Dict) -> str:
+        """Format the article fields that go into analysis prompts"""
+        return f"""        Заголовок: {article.get('title', '')}
+        Описание: {article.get('description', '')}
+        Контент: {(article.get('content') or '')[:1000]}"""
+    
+    @traced()
+    def analyze_articles(self, articles: List[Dict], batch_size: int = None) -> List[Dict]:
         """
+        Analyze several articles, packing up to batch_size of them into one request
         
-        try:
-            response = self.model.generate_content(prompt)
-            text = response.text
+        The scoring rubric is sent once per batch and the model returns a JSON
+        array matched back to the inputs by index. If a batch reply can't be
+        parsed, only the articles of that batch are re-analyzed one by one.
+        
+        Returns:
+            One analysis per input article, in input order
+        """
+        batch_size = batch_size or config.ANALYSIS_BATCH_SIZE
+        analyses, pending = self._cached_analyses(articles)
+        
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
             
-            # Extract JSON from response
-            start_idx = text.find('{')
-            end_idx = text.rfind('}') + 1
+            if len(batch) == 1:
+                analyses[batch[0]] = self.analyze_article(articles[batch[0]])
+                continue
             
-            if start_idx != -1 and end_idx > start_idx:
-                json_str = text[start_idx:end_idx]
-                analysis = json.loads(json_str)
-                return analysis
+            results = self._analyze_batch([articles[i] for i in batch])
+            
+            for position, index in enumerate(batch):
+                analysis = results.get(position)
+                if analysis is None:
+                    analysis = self.analyze_article(articles[index])
+                else:
+                    self._cache_store('analyze_article', self._analysis_prompt(articles[index]), analysis)
+                analyses[index] = analysis
+        
+        return analyses
+    
+    @traced()
+    async def analyze_articles_async(self, articles: List[Dict], batch_size: int = None) -> List[Dict]:
+        """Async counterpart of analyze_articles"""
+        batch_size = batch_size or config.ANALYSIS_BATCH_SIZE
+        analyses, pending = self._cached_analyses(articles)
+        
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            
+            if len(batch) == 1:
+                analyses[batch[0]] = await self.analyze_article_async(articles[batch[0]])
+                continue
+            
+            results = await self._analyze_batch_async([articles[i] for i in batch])
+            
+            for position, index in enumerate(batch):
+                analysis = results.get(position)
+                if analysis is None:
+                    analysis = await self.analyze_article_async(articles[index])
+                else:
+                    self._cache_store('analyze_article', self._analysis_prompt(articles[index]), analysis)
+                analyses[index] = analysis
+        
+        return analyses
+    
+    def _cached_analyses(self, articles: List[Dict]) -> Tuple[List[Optional[Dict]], List[int]]:
+        """
+        Fill in analyses already in the cache (from single or batched requests)
+        
+        Returns:
+            The analyses list with None for cache misses, and the indexes of the misses
+        """
+        analyses: List[Optional[Dict]] = [None] * len(articles)
+        pending = []
+        for index, article in enumerate(articles):
+            cached = self._cache_lookup('analyze_article', self._analysis_prompt(article))
+            if cached is not None:
+                analyses[index] = cached
             else:
-                logger.warning("No JSON found in analysis response")
-                return self._default_analysis()
-                
+                pending.append(index)
+        return analyses, pending
+    
+    @traced()
+    def _analyze_batch(self, articles: List[Dict]) -> Dict[int, Dict]:
+        """
+        Analyze a batch of articles in a single request
+        
+        Returns:
+            Mapping of batch position to analysis; positions missing from the
+            reply or with a malformed analysis are left out
+        """
+        try:
+            result = self._generate_json(
+                'analyze_articles', self._batch_analysis_prompt(articles), use_cache=False
+            )
         except Exception as e:
-            logger.error(f"Error analyzing article: {e}")
-            return self._default_analysis()
+            logger.error(f"Error analyzing batch of {len(articles)} articles: {e}")
+            return {}
+        
+        return self._parse_batch_analyses(result, len(articles))
+    
+    @traced()
+    async def _analyze_batch_async(self, articles: List[Dict]) -> Dict[int, Dict]:
+        """Async counterpart of _analyze_batch"""
+        try:
+            result = await self._generate_json_async(
+                'analyze_articles', self._batch_analysis_prompt(articles), use_cache=False
+            )
+        except Exception as e:
+            logger.error(f"Error analyzing batch of {len(articles)} articles: {e}")
+            return {}
+        
+        return self._parse_batch_analyses(result, len(articles))
+    
+    def _batch_analysis_prompt(self, articles: List[Dict]) -> str:
+        """Build the prompt that analyzes several articles at once"""
+        article_blocks = '\n\n'.join(
+            f"        Статья [{i}]:\n{self._article_block(article)}"
+            for i, article in enumerate(articles)
+        )
+        
+        return f"""
+        Проанализируй следующие {len(articles)} статей для новостного блога компании по энергоаудиту.
+        Каждую статью оценивай независимо от остальных.
+        
+{article_blocks}
+        
+{ANALYSIS_RUBRIC}
+        
+        Верни ответ в формате JSON: массив "analyses" с одним объектом на каждую статью,
+        в поле "index" укажи номер статьи в квадратных скобках:
+        {{
+            "analyses": [
+                {{
+                    "index": 0,
+                    ...поля анализа...
+                }}
+            ]
+        }}
+        
+        Формат анализа одной статьи:
+{ANALYSIS_SCHEMA}
+        """
+    
+    def _parse_batch_analyses(self, result: Optional[Dict], count: int) -> Dict[int, Dict]:
+        """Match the analyses of a batch reply back to batch positions"""
+        if result is None or not isinstance(result.get('analyses'), list):
+            logger.warning("Batch analysis reply could not be parsed, falling back to single analysis")
+            return {}
+        
+        analyses = {}
+        for item in result['analyses']:
+            if not isinstance(item, dict):
+                continue
+            index = item.pop('index', None)
+            if isinstance(index, int) and 0 <= index < count and self._is_valid_analysis(item):
+                analyses[index] = item
+        
+        if len(analyses) < count:
+            logger.warning(f"Batch analysis returned {len(analyses)} of {count} analyses")
+        
+        return analyses
+    
+    def _is_valid_analysis(self, analysis: Dict) -> bool:
+        """Check that an analysis has the scores the scheduler relies on"""
+        scores = analysis.get('scores')
+        return (
+            isinstance(scores, dict)
+            and isinstance(scores.get('overall'), (int, float))
+            and isinstance(scores.get('relevance'), (int, float))
+        )
     
     def _default_analysis(self) -> Dict:
         """Return default analysis structure"""
@@ -152,6 +530,7 @@ class GeminiSearchEngine:
             "social_media_title": ""
         }
     
+    @traced()
     def generate_blog_post(self, article: Dict) -> Dict:
         """
         Generate a blog post based on the article using Gemini
@@ -184,15 +563,9 @@ class GeminiSearchEngine:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            text = response.text
-            
-            start_idx = text.find('{')
-            end_idx = text.rfind('}') + 1
+            blog_post = self._generate_json('generate_blog_post', prompt)
             
-            if start_idx != -1 and end_idx > start_idx:
-                json_str = text[start_idx:end_idx]
-                blog_post = json.loads(json_str)
+            if blog_post is not None:
                 return blog_post
             else:
                 logger.warning("No JSON found in blog post generation")
@@ -0,0 +1,39 @@
+"""
+Pooled HTTP sessions shared by the publishers
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import config
+
+
+class PooledSession(requests.Session):
+    """requests.Session with keep-alive connection pooling and a default timeout"""
+
+    def __init__(self, pool_size: int = None, timeout: tuple = None, max_retries: int = None):
+        super().__init__()
+        pool_size = pool_size or config.HTTP_POOL_SIZE
+        self.timeout = timeout or (config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+
+        # Only connection failures are retried here; 429/5xx responses are
+        # retried by rate_limiter.call_with_backoff
+        retries = Retry(
+            total=config.HTTP_MAX_RETRIES if max_retries is None else max_retries,
+            connect=config.HTTP_MAX_RETRIES if max_retries is None else max_retries,
+            read=0,
+            status=0,
+            backoff_factor=0.5,
+            allowed_methods=None,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retries
+        )
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
@@ -0,0 +1,146 @@
+"""
+Incremental extraction of JSON from streamed model output
+
+Gemini replies wrap the JSON object in prose and code fences, and the reply
+may arrive in chunks. IncrementalJSONParser scans the text once, tracking
+strings, escapes and bracket depth, so it:
+    - finds the first complete top-level object even when prose after it
+      contains braces
+    - yields each element of a chosen top-level array (e.g. "articles") as
+      soon as that element's closing brace arrives
+    - keeps the elements that were complete when the tail of a reply is
+      malformed or truncated
+"""
+import json
+from typing import Dict, List, Optional
+
+
+class IncrementalJSONParser:
+    def __init__(self, array_key: Optional[str] = None):
+        """
+        Args:
+            array_key: Key of the top-level array whose object elements are
+                yielded by feed() as they complete
+        """
+        self.array_key = array_key
+        self.items: List[Dict] = []
+        self.root: Optional[Dict] = None
+
+        self._buffer = ''
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._root_start = 0
+        self._expect_key = False
+        self._last_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+
+    @property
+    def complete(self) -> bool:
+        """True once a full top-level object has been parsed"""
+        return self.root is not None
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Consume the next piece of text, returns array elements completed by it"""
+        if self.complete or not chunk:
+            return []
+
+        self._buffer += chunk
+        completed = []
+        buffer = self._buffer
+        stack = self._stack
+
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(stack) == 1 and self._expect_key:
+                        self._last_key = buffer[self._string_start + 1:i]
+                        self._expect_key = False
+                continue
+
+            if not stack:
+                # Prose before (or between attempts at) the root object
+                if char == '{':
+                    stack.append('{')
+                    self._root_start = i
+                    self._expect_key = True
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ',' and len(stack) == 1:
+                self._expect_key = True
+            elif char in '{[':
+                if (char == '[' and len(stack) == 1 and self.array_key is not None
+                        and self._last_key == self.array_key):
+                    self._array_depth = 2
+                if char == '{' and self._array_depth is not None and len(stack) == self._array_depth:
+                    self._item_start = i
+                stack.append(char)
+            elif char in '}]':
+                stack.pop()
+                depth = len(stack)
+
+                if char == '}' and self._item_start is not None and depth == self._array_depth:
+                    item = self._loads(buffer[self._item_start:i + 1])
+                    if isinstance(item, dict):
+                        self.items.append(item)
+                        completed.append(item)
+                    self._item_start = None
+                elif char == ']' and depth == 1:
+                    self._array_depth = None
+
+                if depth == 0:
+                    root = self._loads(buffer[self._root_start:i + 1])
+                    if isinstance(root, dict):
+                        self.root = root
+                        self._pos = i + 1
+                        return completed
+                    # Not valid JSON (e.g. braces in prose): keep looking
+                    self._reset_root()
+
+        self._pos = len(buffer)
+        return completed
+
+    def result(self) -> Optional[Dict]:
+        """
+        The parsed top-level object, or, if it never completed, an object
+        holding the array elements that did
+        """
+        if self.root is not None:
+            return self.root
+        if self.array_key is not None and self.items:
+            return {self.array_key: list(self.items)}
+        return None
+
+    def _reset_root(self):
+        self._stack.clear()
+        self._expect_key = False
+        self._last_key = None
+        self._array_depth = None
+        self._item_start = None
+
+    @staticmethod
+    def _loads(text: str):
+        try:
+            return json.loads(text)
+        except ValueError:
+            return None
+
+
+def extract_json(text: str, array_key: Optional[str] = None) -> Optional[Dict]:
+    """Extract the JSON object from a complete model reply"""
+    parser = IncrementalJSONParser(array_key)
+    parser.feed(text)
+    return parser.result()
@@ -5,9 +5,11 @@ Main entry point for the content search and publishing system
 import argparse
 import sys
 import os
+from datetime import datetime
 from pathlib import Path
 import logging
-from scheduler import ContentScheduler
+import metrics
+import tracing
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,6 +23,34 @@ def ensure_directories():
     for dir_name in directories:
         Path(dir_name).mkdir(exist_ok=True)
 
+def run_export(args):
+    """Stream a table to a file or stdout, in constant memory"""
+    import export
+    from database import ArticleDatabase
+    
+    db = ArticleDatabase()
+    try:
+        try:
+            chunks = export.export_chunks(db, args.table, args.format, since=args.since, compress=args.gzip)
+        except ValueError as e:
+            logger.error(f"Cannot export: {e}")
+            sys.exit(2)
+        if args.output == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+        
+        output = args.output or os.path.join('data', export.export_filename(args.table, args.format, args.gzip))
+        size = 0
+        with open(output, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        logger.info(f"Exported {args.table} to {output} ({size} bytes)")
+    finally:
+        db.close()
+
 def main():
     parser = argparse.ArgumentParser(
         description='Content Search and Publishing System for energo-audit.by'
@@ -28,7 +58,7 @@ def main():
     
     parser.add_argument(
         '--mode',
-        choices=['scheduler', 'search', 'publish-blog', 'publish-social', 'test'],
+        choices=['scheduler', 'worker', 'search', 'publish-blog', 'publish-social', 'export', 'test'],
         default='scheduler',
         help='Operation mode'
     )
@@ -39,8 +69,68 @@ def main():
         help='Test search with a specific keyword'
     )
     
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        help='Run the search through the async pipeline with up to N concurrent Gemini searches'
+    )
+    
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the Gemini response cache'
+    )
+    cache_group.add_argument(
+        '--refresh-cache',
+        action='store_true',
+        help='Ignore cached Gemini responses and store fresh ones'
+    )
+    
+    export_group = parser.add_argument_group('export mode')
+    export_group.add_argument(
+        '--table',
+        choices=['articles', 'publications'],
+        default='articles',
+        help='Table to export'
+    )
+    export_group.add_argument(
+        '--format',
+        choices=['ndjson', 'csv'],
+        default='ndjson',
+        help='Export format'
+    )
+    export_group.add_argument(
+        '--since',
+        help='Only export rows after this id, or found / published from this ISO date on'
+    )
+    export_group.add_argument(
+        '--gzip',
+        action='store_true',
+        help='Compress the export'
+    )
+    export_group.add_argument(
+        '--output',
+        help='Export file, "-" for stdout (default: data/<table>-<time>.<format>)'
+    )
+    
+    parser.add_argument(
+        '--trace',
+        nargs='?',
+        const=f"logs/trace-{datetime.now():%Y%m%d-%H%M%S}.jsonl",
+        metavar='PATH',
+        help='Write a Chrome trace-event file of the run (default: logs/trace-<time>.jsonl), '
+             'open it in chrome://tracing or ui.perfetto.dev'
+    )
+    
     args = parser.parse_args()
     
+    cache_mode = None
+    if args.no_cache:
+        cache_mode = 'off'
+    elif args.refresh_cache:
+        cache_mode = 'refresh'
+    
     # Ensure directories exist
     ensure_directories()
     
@@ -49,57 +139,82 @@ def main():
         logger.warning("No .env file found. Using .env.example as template.")
         logger.warning("Please copy .env.example to .env and configure your API keys.")
         
-        if args.mode != 'test':
+        if args.mode not in ('test', 'export'):
             logger.error("Cannot run without proper configuration. Exiting.")
             sys.exit(1)
     
-    # Initialize scheduler
-    scheduler = ContentScheduler()
-    
-    if args.mode == 'scheduler':
-        # Run full scheduler
-        logger.info("Starting scheduler mode...")
-        scheduler.run()
-    
-    elif args.mode == 'search':
-        # Run search only
-        logger.info("Running article search...")
-        scheduler.search_and_collect_articles()
-        logger.info("Search completed.")
+    if args.trace:
+        tracing.start(args.trace)
     
-    elif args.mode == 'publish-blog':
-        # Run blog publication only
-        logger.info("Running blog publication...")
-        scheduler.publish_to_blog()
-        logger.info("Blog publication completed.")
+    # Initialize scheduler; the system check and exports don't need it
+    scheduler = None
+    if args.mode not in ('test', 'export'):
+        from scheduler import ContentScheduler
+        scheduler = ContentScheduler(gemini_cache_mode=cache_mode)
     
-    elif args.mode == 'publish-social':
-        # Run social media publication only
-        logger.info("Running social media publication...")
-        scheduler.publish_to_facebook()
-        scheduler.publish_to_instagram()
-        logger.info("Social media publication completed.")
-    
-    elif args.mode == 'test':
-        # Test mode
-        logger.info("Running in test mode...")
+    try:
+        if args.mode == 'scheduler':
+            # Run full scheduler
+            logger.info("Starting scheduler mode...")
+            scheduler.run()
         
-        if args.test_keyword:
-            from gemini_search import GeminiSearchEngine
-            gemini = GeminiSearchEngine()
-            
-            logger.info(f"Testing search for keyword: {args.test_keyword}")
-            results = gemini.search_articles(args.test_keyword, num_results=3)
+        elif args.mode == 'worker':
+            # Drain the publication task queue next to a scheduler process
+            logger.info("Starting task worker mode...")
+            scheduler.run_workers()
+        
+        elif args.mode == 'search':
+            # Run search only
+            logger.info("Running article search...")
+            if args.concurrency:
+                scheduler.search_and_collect_articles_concurrently(args.concurrency)
+            else:
+                scheduler.search_and_collect_articles()
+            logger.info("Search completed.")
+        
+        elif args.mode == 'publish-blog':
+            # Run blog publication only
+            logger.info("Running blog publication...")
+            scheduler.publish_to_blog()
+            logger.info("Blog publication completed.")
+        
+        elif args.mode == 'publish-social':
+            # Run social media publication only
+            logger.info("Running social media publication...")
+            scheduler.publish_to_facebook()
+            scheduler.publish_to_instagram()
+            logger.info("Social media publication completed.")
+        
+        elif args.mode == 'export':
+            run_export(args)
+        
+        elif args.mode == 'test':
+            # Test mode
+            logger.info("Running in test mode...")
             
-            logger.info(f"Found {len(results)} results:")
-            for i, article in enumerate(results, 1):
-                logger.info(f"\n{i}. {article.get('title', 'No title')}")
-                logger.info(f"   Description: {article.get('description', 'No description')[:100]}...")
-        else:
-            logger.info("System check:")
-            logger.info(f"  - Database: {os.path.exists('data/articles.db')}")
-            logger.info(f"  - Config loaded: Yes")
-            logger.info("Run with --test-keyword to test search functionality")
+            if args.test_keyword:
+                from gemini_search import GeminiSearchEngine
+                gemini = GeminiSearchEngine(cache_mode=cache_mode)
+                
+                logger.info(f"Testing search for keyword: {args.test_keyword}")
+                results = gemini.search_articles(args.test_keyword, num_results=3)
+                
+                logger.info(f"Found {len(results)} results:")
+                for i, article in enumerate(results, 1):
+                    logger.info(f"\n{i}. {article.get('title', 'No title')}")
+                    logger.info(f"   Description: {article.get('description', 'No description')[:100]}...")
+            else:
+                logger.info("System check:")
+                logger.info(f"  - Database: {os.path.exists('data/articles.db')}")
+                logger.info(f"  - Config loaded: Yes")
+                logger.info("Run with --test-keyword to test search functionality")
+    finally:
+        if scheduler:
+            scheduler.close()
+        logger.info(f"Call metrics:\n{metrics.summary()}")
+        if args.trace:
+            tracing.stop()
+            logger.info(f"Trace written to {args.trace}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,231 @@
+"""
+In-process metrics in the Prometheus text format
+
+Counters and latency histograms for every external call (Gemini, WordPress,
+Graph API) and for the ArticleDatabase methods. api_server.py serves them at
+/metrics; CLI runs log a summary when they finish.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import tracing
+
+# Seconds; external calls take from ~50 ms (cached tags) to minutes (long generations)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Dict = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in sorted(self.values().items()):
+            lines.append(f'{self.name}{self._format_labels(key)} {value:g}')
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def values(self) -> Dict[Tuple[str, ...], List[float]]:
+        with self._lock:
+            return {key: list(series) for key, series in self._values.items()}
+
+    def quantile(self, series: List[float], q: float) -> float:
+        """Estimate a quantile from bucket counts (upper bound of the bucket holding it)"""
+        count = series[-2]
+        if not count:
+            return 0.0
+        rank = q * count
+        for index, bound in enumerate(self.buckets):
+            if series[index] >= rank:
+                return bound
+        return float('inf')
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, series in sorted(self.values().items()):
+            for index, bound in enumerate(self.buckets):
+                lines.append(f'{self.name}_bucket{self._format_labels(key, {"le": f"{bound:g}"})} {series[index]}')
+            lines.append(f'{self.name}_bucket{self._format_labels(key, {"le": "+Inf"})} {series[-2]}')
+            lines.append(f'{self.name}_count{self._format_labels(key)} {series[-2]}')
+            lines.append(f'{self.name}_sum{self._format_labels(key)} {series[-1]:.6f}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+EXTERNAL_CALLS = Histogram(
+    'content_external_call_duration_seconds',
+    'Latency of calls to external APIs, including rate-limit waits and retries',
+    ['operation', 'status']
+)
+EXTERNAL_RETRIES = Counter(
+    'content_external_call_retries_total',
+    'Retried external calls by service and response status',
+    ['service', 'status']
+)
+DB_QUERIES = Histogram(
+    'content_db_query_duration_seconds',
+    'Latency of ArticleDatabase methods',
+    ['method', 'status']
+)
+GEMINI_CACHE = Counter(
+    'content_gemini_cache_requests_total',
+    'Gemini response cache lookups',
+    ['method', 'result']
+)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Timing:
+    """Handed out by timed(); set .status to report e.g. an HTTP status code"""
+
+    def __init__(self):
+        self.status: Optional[str] = None
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels) -> Iterator[_Timing]:
+    """Observe the duration of a block; status is 'ok', 'error' or whatever the block sets"""
+    timing = _Timing()
+    start = time.perf_counter()
+    try:
+        yield timing
+    except BaseException:
+        timing.status = timing.status or 'error'
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, status=timing.status or 'ok', **labels)
+
+
+def instrumented(histogram: Histogram, **labels) -> Callable:
+    """
+    Decorator form of timed(); for DB_QUERIES the method label defaults to the function name
+
+    Calls are also recorded as trace spans when tracing is on.
+    """
+    def decorator(func: Callable) -> Callable:
+        func_labels = dict(labels)
+        if 'method' in histogram.labelnames:
+            func_labels.setdefault('method', func.__name__)
+        span_name, span_cat = func.__qualname__, func.__module__
+
+        if tracing.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracing.span(span_name, span_cat), timed(histogram, **func_labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracing.span(span_name, span_cat), timed(histogram, **func_labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def summary() -> str:
+    """Human-readable table of every histogram series, for the end of CLI runs"""
+    lines = []
+    for metric in REGISTRY.metrics():
+        if not isinstance(metric, Histogram):
+            continue
+        for key, series in sorted(metric.values().items()):
+            count = series[-2]
+            if not count:
+                continue
+            labels = ' '.join(f'{name}={value}' for name, value in zip(metric.labelnames, key))
+            lines.append(
+                f"{labels:<55} count={count:<6} avg={series[-1] / count:.3f}s "
+                f"p50<={metric.quantile(series, 0.5):g}s p95<={metric.quantile(series, 0.95):g}s"
+            )
+    return '\n'.join(lines) if lines else 'No calls recorded'
@@ -0,0 +1,224 @@
+"""
+Shared rate limiting for outbound API calls
+
+Every external service (Gemini, WordPress, Facebook, Instagram) gets one
+token bucket per process, configured in config.RATE_LIMITS. Calls made
+through call_with_backoff wait for a token, and are retried with jittered
+exponential backoff on 429 and 5xx responses, honouring Retry-After. Passing
+operation= records the call's total latency in metrics.EXTERNAL_CALLS.
+
+A 5xx or a timeout doesn't tell whether the server acted on the request, so
+calls that create something (a post, a published media item) pass
+retry_statuses=NOT_PROCESSED_STATUSES and leave any further retry to a caller
+that can check for the result first.
+"""
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional, Set
+import logging
+import config
+from metrics import EXTERNAL_CALLS, EXTERNAL_RETRIES
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Responses meaning the request was refused before it was acted on
+NOT_PROCESSED_STATUSES = {429}
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at rate_per_minute, holding up to burst tokens"""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token and return how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens may go negative: each caller reserves its own slot in the future
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a request may be sent"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold back every caller for the given time, e.g. after a 429 with Retry-After"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(service: str) -> TokenBucket:
+    """Return the process-wide bucket for a service"""
+    with _buckets_lock:
+        bucket = _buckets.get(service)
+        if bucket is None:
+            rate_per_minute, burst = config.RATE_LIMITS.get(service, config.RATE_LIMITS['default'])
+            bucket = TokenBucket(rate_per_minute, burst)
+            _buckets[service] = bucket
+        return bucket
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given as seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _retry_delay(attempt: int, retry_after: Optional[float]) -> float:
+    """Full-jitter exponential backoff, never shorter than Retry-After"""
+    backoff = min(config.RATE_LIMIT_BACKOFF_MAX, config.RATE_LIMIT_BACKOFF_BASE * (2 ** attempt))
+    delay = random.uniform(0, backoff)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _retry_info(result: Any = None, error: Exception = None):
+    """
+    Inspect an HTTP response or a client exception
+
+    Returns:
+        (status, retry_after) where status is None if the call can't be classified
+    """
+    if error is not None:
+        # google.api_core errors carry the HTTP status in .code, requests errors
+        # carry the response
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None) or getattr(error, 'code', None)
+    else:
+        response = result
+        status = getattr(result, 'status_code', None)
+
+    headers = getattr(response, 'headers', None) or {}
+    retry_after = _parse_retry_after(headers.get('Retry-After'))
+    return (status if isinstance(status, int) else None), retry_after
+
+
+def _should_retry(service: str, attempt: int, status: Optional[int], retry_after: Optional[float],
+                  retry_statuses: Set[int] = RETRY_STATUSES) -> Optional[float]:
+    """Return the delay before the next attempt, or None if the call should not be retried"""
+    if status not in retry_statuses or attempt >= config.RATE_LIMIT_MAX_RETRIES:
+        return None
+
+    EXTERNAL_RETRIES.inc(service=service, status=status)
+    delay = _retry_delay(attempt, retry_after)
+    if status == 429:
+        # Over quota: hold back every caller of this service, not just this one
+        get_bucket(service).pause(delay)
+    logger.warning(f"{service} returned {status}, retrying in {delay:.1f}s (attempt {attempt + 1})")
+    return delay
+
+
+def call_with_backoff(service: str, func: Callable, *args, operation: str = None,
+                      retry_statuses: Set[int] = RETRY_STATUSES, **kwargs) -> Any:
+    """
+    Call func under the service's rate limit, retrying on 429/5xx
+
+    func may return a requests-style response (retried on its status_code) or
+    raise an exception carrying the status (retried, then re-raised).
+
+    Args:
+        operation: Metrics label for the call, e.g. 'wp.create_post'
+        retry_statuses: Statuses that are retried; NOT_PROCESSED_STATUSES for
+            calls that are not idempotent
+    """
+    bucket = get_bucket(service)
+    attempt = 0
+    call_span = span(operation or service, 'http', service=service)
+    with call_span:
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            while True:
+                bucket.acquire()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    code, retry_after = _retry_info(error=e)
+                    status = str(code) if code else 'error'
+                    delay = _should_retry(service, attempt, code, retry_after, retry_statuses)
+                    if delay is None:
+                        raise
+                else:
+                    code, retry_after = _retry_info(result=result)
+                    status = str(code) if code else 'ok'
+                    delay = _should_retry(service, attempt, code, retry_after, retry_statuses)
+                    if delay is None:
+                        return result
+                time.sleep(delay)
+                attempt += 1
+        finally:
+            call_span.set(status=status, attempts=attempt + 1)
+            if operation:
+                EXTERNAL_CALLS.observe(time.perf_counter() - start, operation=operation, status=status)
+
+
+async def call_with_backoff_async(service: str, func: Callable, *args, operation: str = None,
+                                  retry_statuses: Set[int] = RETRY_STATUSES, **kwargs) -> Any:
+    """Async counterpart of call_with_backoff for coroutine functions"""
+    bucket = get_bucket(service)
+    attempt = 0
+    call_span = span(operation or service, 'http', service=service)
+    with call_span:
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            while True:
+                await bucket.acquire_async()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    code, retry_after = _retry_info(error=e)
+                    status = str(code) if code else 'error'
+                    delay = _should_retry(service, attempt, code, retry_after, retry_statuses)
+                    if delay is None:
+                        raise
+                else:
+                    code, retry_after = _retry_info(result=result)
+                    status = str(code) if code else 'ok'
+                    delay = _should_retry(service, attempt, code, retry_after, retry_statuses)
+                    if delay is None:
+                        return result
+                await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            call_span.set(status=status, attempts=attempt + 1)
+            if operation:
+                EXTERNAL_CALLS.observe(time.perf_counter() - start, operation=operation, status=status)
@@ -0,0 +1,166 @@
+"""
+On-disk response cache for Gemini API calls
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+import logging
+import config
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ('on', 'off', 'refresh')
+
+
+class ResponseCache:
+    """
+    Content-addressed cache stored in a separate SQLite file
+
+    Entries are keyed by a hash of the method, model name, prompt template
+    version and the full prompt. Each method has its own TTL, and the least
+    recently used entries are evicted once the cache grows past max_bytes.
+    The total size is kept in cache_stats by triggers, so it stays right when
+    several processes share the file and set() never sums the whole table.
+    """
+
+    def __init__(self, path: str = None, max_bytes: int = None, ttls: Dict[str, int] = None):
+        self.path = path or config.GEMINI_CACHE_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else config.GEMINI_CACHE_MAX_MB * 1024 * 1024
+        self.ttls = ttls if ttls is not None else config.GEMINI_CACHE_TTLS
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        # Losing the last few entries on a crash is fine for a cache
+        self._conn.execute('PRAGMA synchronous = OFF')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                method TEXT,
+                value TEXT,
+                size INTEGER,
+                created_at REAL,
+                accessed_at REAL
+            )
+        ''')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed ON cache_entries (accessed_at)'
+        )
+        self._conn.commit()
+        self._create_size_counter()
+
+    def _create_size_counter(self):
+        """One-row total of the entry sizes, kept current by triggers and backfilled once"""
+        with self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    total_size INTEGER NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_cache_entries_insert
+                AFTER INSERT ON cache_entries
+                BEGIN UPDATE cache_stats SET total_size = total_size + NEW.size; END
+            ''')
+            self._conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_cache_entries_update
+                AFTER UPDATE OF size ON cache_entries
+                BEGIN UPDATE cache_stats SET total_size = total_size - OLD.size + NEW.size; END
+            ''')
+            self._conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_cache_entries_delete
+                AFTER DELETE ON cache_entries
+                BEGIN UPDATE cache_stats SET total_size = total_size - OLD.size; END
+            ''')
+            if self._conn.execute('SELECT 1 FROM cache_stats').fetchone() is None:
+                # New file, or a cache from before the counter
+                self._conn.execute('''
+                    INSERT INTO cache_stats (id, total_size)
+                    SELECT 1, COALESCE(SUM(size), 0) FROM cache_entries
+                ''')
+
+    @staticmethod
+    def make_key(method: str, model_name: str, prompt_version: int, prompt: str) -> str:
+        """Build the cache key for a model request"""
+        material = json.dumps(
+            [method, model_name, prompt_version, prompt],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, method: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or older than the method's TTL"""
+        ttl = self.ttls.get(method, 0)
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, created_at FROM cache_entries WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            if now - row[1] > ttl:
+                self._conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute(
+                'UPDATE cache_entries SET accessed_at = ? WHERE key = ?', (now, key)
+            )
+            self._conn.commit()
+
+        return json.loads(row[0])
+
+    def set(self, key: str, method: str, value: Any):
+        """Store a value and evict least recently used entries if over the size limit"""
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+
+        with self._lock:
+            # An upsert, not INSERT OR REPLACE: the delete of a replaced row
+            # would not fire the size trigger
+            self._conn.execute('''
+                INSERT INTO cache_entries (key, method, value, size, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    method = excluded.method, value = excluded.value, size = excluded.size,
+                    created_at = excluded.created_at, accessed_at = excluded.accessed_at
+            ''', (key, method, payload, len(payload.encode('utf-8')), now, now))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits max_bytes"""
+        total = self._conn.execute('SELECT total_size FROM cache_stats').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        stale_keys = []
+        for key, size in self._conn.execute(
+            'SELECT key, size FROM cache_entries ORDER BY accessed_at'
+        ):
+            stale_keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+
+        self._conn.executemany('DELETE FROM cache_entries WHERE key = ?', stale_keys)
+        logger.info(f"Evicted {len(stale_keys)} entries from the response cache")
+
+    def clear(self):
+        """Remove all cached entries"""
+        with self._lock:
+            self._conn.execute('DELETE FROM cache_entries')
+            self._conn.commit()
+
+    def close(self):
+        """Close the cache database"""
+        with self._lock:
+            self._conn.close()
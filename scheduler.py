@@ -1,16 +1,18 @@
 """
 Scheduler module for automated daily tasks
 """
-import schedule
+import os
+import socket
+import threading
 import time
 import logging
-from datetime import datetime
-from typing import Callable
+from typing import Callable, Dict, List, Optional, Tuple
 import config
 from database import ArticleDatabase
-from gemini_search import GeminiSearchEngine
-from wordpress_publisher import WordPressPublisher
-from social_media_publisher import SocialMediaManager
+from dedup import NearDuplicateIndex
+from task_queue import TaskQueue, new_task
+from timer_scheduler import TimerScheduler, next_daily_time
+from tracing import span, traced
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,146 +20,353 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Task types run by the blog publication job
+BLOG_TASKS = ['generate_blog_post', 'wp_create_post']
+
+# Daily jobs and the settings holding their time of day
+JOB_TIMES = {
+    'search': ('SEARCH_HOUR', 'SEARCH_MINUTE'),
+    'publish_blog': ('BLOG_POST_HOUR', 'BLOG_POST_MINUTE'),
+    'publish_facebook': ('FACEBOOK_POST_HOUR', 'FACEBOOK_POST_MINUTE'),
+    'publish_instagram': ('INSTAGRAM_POST_HOUR', 'INSTAGRAM_POST_MINUTE'),
+}
+
+# Written by POST /api/settings
+ENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+
+# Datagram sent to the scheduler's control port to reload the job times
+RELOAD_MESSAGE = b'reload-schedule'
+
+
+def notify_scheduler():
+    """
+    Ask a running scheduler process to reload its job times from .env
+
+    A datagram to config.SCHEDULER_CONTROL_PORT on the loopback interface;
+    nothing happens if no scheduler is listening.
+    """
+    if not config.SCHEDULER_CONTROL_PORT:
+        return
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.sendto(RELOAD_MESSAGE, ('127.0.0.1', config.SCHEDULER_CONTROL_PORT))
+
+
 class ContentScheduler:
-    def __init__(self):
-        self.db = ArticleDatabase()
-        self.gemini = GeminiSearchEngine()
-        self.wp_publisher = WordPressPublisher()
-        self.social_media = SocialMediaManager()
-        
-    def search_and_collect_articles(self):
-        """Daily task: Search for articles and store in database"""
+    """
+    Runs the daily jobs and the publication tasks
+    
+    The Gemini, WordPress and social media clients are created on first use,
+    together with the import of their modules (google.generativeai, requests),
+    so modes and API workers that never call a service don't pay for it.
+    """
+    
+    def __init__(self, db: ArticleDatabase = None, gemini_cache_mode: str = None):
+        self.db = db or ArticleDatabase()
+        self.gemini_cache_mode = gemini_cache_mode
+        self._clients: Dict[str, object] = {}
+        self._clients_lock = threading.Lock()
+        self.dedup = NearDuplicateIndex(self.db) if config.DEDUP_ENABLED else None
+        self.tasks = TaskQueue(self.db)
+        self._register_tasks()
+        self.timer = None
+        self._control: Optional[threading.Thread] = None
+        self._control_stop = threading.Event()
+        
+    def close(self):
+        """Stop task workers, release HTTP connection pools, the response cache and database connections"""
+        if self._control:
+            # Wake the control thread so it closes its socket
+            self._control_stop.set()
+            notify_scheduler()
+            self._control.join(1)
+        if self.timer:
+            self.timer.stop(wait=False)
+        self.tasks.stop_workers()
+        with self._clients_lock:
+            clients, self._clients = self._clients, {}
+        for client in clients.values():
+            client.close()
+        self.db.close()
+    
+    def _client(self, name: str, factory: Callable[[], object]):
+        """The named client, created by factory on first use"""
+        client = self._clients.get(name)
+        if client is None:
+            with self._clients_lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = factory()
+        return client
+    
+    @property
+    def gemini(self):
+        def create():
+            from gemini_search import GeminiSearchEngine
+            return GeminiSearchEngine(cache_mode=self.gemini_cache_mode)
+        return self._client('gemini', create)
+    
+    @property
+    def wp_publisher(self):
+        def create():
+            from wordpress_publisher import WordPressPublisher
+            return WordPressPublisher(db=self.db)
+        return self._client('wp_publisher', create)
+    
+    @property
+    def social_media(self):
+        def create():
+            from social_media_publisher import SocialMediaManager
+            return SocialMediaManager()
+        return self._client('social_media', create)
+    
+    @traced()
+    def search_and_collect_articles(self, progress: Callable[[Dict], None] = None) -> int:
+        """
+        Daily task: Search for articles and store in database
+        
+        Args:
+            progress: Called with counters after each keyword
+        
+        Returns:
+            Number of new articles stored
+        """
         logger.info("Starting daily article search...")
         
         total_found = 0
+        search_history = []
+        if self.dedup:
+            self.dedup.reset()
+        if progress:
+            progress({'keywords_total': len(config.KEYWORDS), 'keywords_done': 0, 'articles_found': 0})
         
-        for keyword in config.KEYWORDS:
+        for index, keyword in enumerate(config.KEYWORDS, 1):
             logger.info(f"Searching for keyword: {keyword}")
             
             try:
-                articles = self.gemini.search_articles(keyword, num_results=5)
-                
-                for article in articles:
-                    # Analyze article
-                    analysis = self.gemini.analyze_article(article)
+                with span('search_keyword', keyword=keyword) as keyword_span:
+                    articles = self.gemini.search_articles(keyword, num_results=5)
                     
-                    # Prepare article data
-                    article_data = {
-                        'title': article.get('title', ''),
-                        'url': article.get('source_type', ''),
-                        'content': article.get('description', ''),
-                        'source': 'Gemini Search',
-                        'keywords': [keyword],
-                        'ai_score': analysis['scores']['overall'],
-                        'relevance_score': analysis['scores']['relevance'],
-                        'analysis': analysis
-                    }
+                    # Skip near-copies of known articles before paying for analysis
+                    candidates, signatures = self._deduplicate(keyword, articles)
+                    keyword_span.set(results=len(articles), candidates=len(candidates))
                     
-                    # Save to database
-                    article_id = self.db.add_article(article_data)
+                    # Analyze the keyword's results in batched requests
+                    analyses = self.gemini.analyze_articles(
+                        candidates, batch_size=config.ANALYSIS_BATCH_SIZE
+                    )
                     
-                    if article_id > 0:
-                        total_found += 1
-                        logger.info(f"Added article: {article_data['title']} (Score: {article_data['ai_score']})")
-                    elif article_id == -1:
-                        logger.info(f"Article already exists: {article_data['title']}")
-                
-                # Record search history
-                self.db.add_search_history(keyword, len(articles))
-                
-                # Small delay to avoid rate limiting
-                time.sleep(2)
+                    # Buffer the keyword's results and write them in one transaction
+                    batch = []
+                    for article, analysis in zip(candidates, analyses):
+                        batch.append(self._article_record(article, keyword, analysis))
+                    
+                    added = self._save_articles(batch, signatures)
+                    keyword_span.set(added=added)
+                    total_found += added
+                    search_history.append((keyword, len(articles)))
                 
             except Exception as e:
                 logger.error(f"Error searching for keyword '{keyword}': {e}")
-                continue
+            
+            if progress:
+                progress({'keywords_done': index, 'articles_found': total_found})
+        
+        # Record search history
+        self.db.add_search_history_many(search_history)
         
         logger.info(f"Daily search completed. Found {total_found} new articles.")
+        return total_found
+    
+    @traced()
+    def search_and_collect_articles_concurrently(self, concurrency: int = None) -> int:
+        """Run the article search through the async pipeline with bounded parallelism"""
+        import asyncio
+        from search_pipeline import AsyncSearchPipeline
+        
+        pipeline = AsyncSearchPipeline(self, concurrency or config.SEARCH_CONCURRENCY)
+        if self.dedup:
+            self.dedup.reset()
+        logger.info(f"Starting concurrent article search (concurrency: {pipeline.concurrency} searches, "
+                    f"{pipeline.analysis_concurrency} analyses)...")
+        total_found = asyncio.run(pipeline.run(config.KEYWORDS))
+        logger.info(f"Concurrent search completed. Found {total_found} new articles.")
+        return total_found
+    
+    def _article_record(self, article: Dict, keyword: str, analysis: Dict) -> Dict:
+        """Prepare a search result and its analysis for the database"""
+        return {
+            'title': article.get('title', ''),
+            'url': article.get('source_type', ''),
+            'content': article.get('description', ''),
+            'source': 'Gemini Search',
+            'keywords': [keyword],
+            'ai_score': analysis['scores']['overall'],
+            'relevance_score': analysis['scores']['relevance'],
+            'analysis': analysis
+        }
+    
+    def _deduplicate(self, keyword: str, articles: List[Dict]) -> Tuple[List[Dict], Optional[List]]:
+        """
+        Drop near-duplicate search results
+        
+        Returns:
+            The remaining articles and their signatures (None if detection is off)
+        """
+        if not self.dedup:
+            return articles, None
+        kept = self.dedup.deduplicate(keyword, articles)
+        return [article for article, _ in kept], [signature for _, signature in kept]
+    
+    @traced()
+    def _save_articles(self, batch: List[Dict], signatures: Optional[List] = None) -> int:
+        """Flush a batch of analyzed articles to the database, returns the number added"""
+        added = 0
+        new_signatures = []
+        article_ids = self.db.add_articles(batch)
+        
+        for index, (article_data, article_id) in enumerate(zip(batch, article_ids)):
+            if article_id > 0:
+                added += 1
+                if signatures:
+                    new_signatures.append((article_id, signatures[index]))
+                logger.info(f"Added article: {article_data['title']} (Score: {article_data['ai_score']})")
+            else:
+                logger.info(f"Article already exists: {article_data['title']}")
+        
+        if new_signatures:
+            self.dedup.register(new_signatures)
+        return added
+    
+    def _register_tasks(self):
+        """Register the publication stages with the task queue"""
+        self.tasks.register('generate_blog_post', self._task_generate_blog_post, self._task_publication_failed)
+        self.tasks.register('wp_create_post', self._task_wp_create_post, self._task_publication_failed)
+        self.tasks.register('social_fanout', self._task_social_fanout)
     
-    def publish_to_blog(self):
-        """Daily task: Publish best articles to WordPress blog"""
+    @traced()
+    def publish_to_blog(self, progress: Callable[[Dict], None] = None) -> int:
+        """
+        Daily task: Publish best articles to WordPress blog
+        
+        The top pending articles are claimed for publication (status 'queued')
+        and their generate/upload tasks are run, together with any earlier
+        tasks whose retry is due. Failed steps are retried by the task queue.
+        
+        Args:
+            progress: Called with counters after each task
+        
+        Returns:
+            Number of articles published
+        """
         logger.info("Starting blog publication task...")
         
-        # Get top articles
-        articles = self.db.get_pending_articles(limit=config.MAX_ARTICLES_PER_DAY)
+        # Claim top articles; concurrent schedulers never get the same ones
+        articles = self.db.claim_pending_articles(self.tasks.worker_id, config.MAX_ARTICLES_PER_DAY)
+        
+        self.tasks.enqueue([
+            new_task('generate_blog_post', {}, article_id=article['id'],
+                     dedupe_key=f"generate_blog_post:{article['id']}")
+            for article in articles
+        ])
         
         if not articles:
-            logger.info("No articles to publish today.")
-            return
+            logger.info("No new articles to publish today.")
         
-        published_count = 0
+        counters = {'articles_queued': len(articles), 'tasks_done': 0, 'published': 0}
+        if progress:
+            progress(dict(counters))
         
-        for article in articles:
-            try:
-                # Generate blog post
-                blog_post = self.gemini.generate_blog_post(article)
-                
-                # Format content
-                content_html = self.wp_publisher.format_blog_post(blog_post)
-                
-                # Prepare WordPress post
-                post_data = {
-                    'title': blog_post['title'],
-                    'content': content_html,
-                    'excerpt': blog_post['meta_description'],
-                    'status': 'draft',  # Change to 'publish' for auto-publish
-                    'tags': blog_post.get('tags', [])
-                }
-                
-                # Publish to WordPress
-                post_id = self.wp_publisher.create_post(post_data)
-                
-                if post_id:
-                    # Update article status
-                    self.db.update_article_status(article['id'], 'published')
-                    
-                    # Record publication
-                    self.db.add_publication(article['id'], 'wordpress', post_id)
-                    
-                    published_count += 1
-                    logger.info(f"Published to blog: {blog_post['title']}")
-                    
-                    # Store blog URL for social media
-                    article['blog_url'] = f"{config.WORDPRESS_URL}/?p={post_id}"
-                else:
-                    logger.error(f"Failed to publish article: {article['title']}")
-                
-                time.sleep(5)  # Delay between posts
-                
-            except Exception as e:
-                logger.error(f"Error publishing article {article['id']}: {e}")
-                continue
+        while True:
+            task = self.tasks.run_once(task_types=BLOG_TASKS)
+            if task is None:
+                break
+            counters['tasks_done'] += 1
+            if task['succeeded'] and task['task_type'] == 'wp_create_post':
+                counters['published'] += 1
+            if progress:
+                progress(dict(counters))
+        
+        logger.info(f"Blog publication completed. Published {counters['published']} articles.")
+        return counters['published']
+    
+    @traced()
+    def _task_generate_blog_post(self, task: Dict) -> List[Dict]:
+        """Stage 1: generate the blog post; its text travels in the upload task's payload"""
+        article = self.db.get_article(task['article_id'])
+        if article is None:
+            raise ValueError(f"Article {task['article_id']} not found")
         
-        logger.info(f"Blog publication completed. Published {published_count} articles.")
+        # Generate blog post
+        blog_post = self.gemini.generate_blog_post(article)
+        
+        # Prepare WordPress post
+        post_data = {
+            'title': blog_post['title'],
+            'content': self.wp_publisher.format_blog_post(blog_post),
+            'excerpt': blog_post['meta_description'],
+            'status': 'draft',  # Change to 'publish' for auto-publish
+            'tags': blog_post.get('tags', [])
+        }
+        return [new_task('wp_create_post', {'post_data': post_data}, article_id=article['id'],
+                         dedupe_key=f"wp_create_post:{article['id']}")]
+    
+    @traced()
+    def _task_wp_create_post(self, task: Dict) -> List[Dict]:
+        """Stage 2: upload the generated post to WordPress"""
+        post_data = task['payload']['post_data']
+        if self.tasks.claim_lost(task):
+            # The scheduler that reclaimed the article publishes it
+            logger.warning(f"Skipping upload of article {task['article_id']}, it was reclaimed")
+            return []
+        # An earlier attempt may have created the post before failing
+        post_id = self.wp_publisher.create_post(post_data, check_existing=task['attempts'] > 1)
+        if not post_id:
+            raise RuntimeError(f"WordPress did not create the post: {post_data['title']}")
+        
+        self.db.update_article_status(task['article_id'], 'published')
+        self.db.add_publication(task['article_id'], 'wordpress', post_id)
+        logger.info(f"Published to blog: {post_data['title']}")
+        
+        # Social posts go out at the configured Facebook time
+        article = {'title': post_data['title'], 'description': post_data['excerpt']}
+        blog_url = f"{config.WORDPRESS_URL}/?p={post_id}"
+        return [new_task(
+            'social_fanout', {'article': article, 'blog_url': blog_url},
+            article_id=task['article_id'], dedupe_key=f"social_fanout:{task['article_id']}",
+            run_at=next_daily_time(config.FACEBOOK_POST_HOUR, config.FACEBOOK_POST_MINUTE)
+        )]
     
-    def publish_to_facebook(self):
-        """Daily task: Publish to Facebook"""
+    @traced()
+    def _task_social_fanout(self, task: Dict):
+        """Stage 3: announce the published blog post on Facebook"""
+        article = task['payload']['article']
+        blog_url = task['payload']['blog_url']
+        
+        fb_post_id = self.social_media.facebook.create_post(
+            self.social_media.facebook.format_post_message(article, blog_url),
+            blog_url
+        )
+        if not fb_post_id:
+            raise RuntimeError(f"Facebook did not create the post: {article['title']}")
+        
+        self.db.add_publication(task['article_id'], 'facebook', fb_post_id)
+        logger.info(f"Published to Facebook: {article['title']}")
+    
+    def _task_publication_failed(self, task: Dict, error: str):
+        """Return an article whose publication gave up to the pending pool"""
+        self.db.update_article_status(task['article_id'], 'pending')
+    
+    @traced()
+    def publish_to_facebook(self) -> int:
+        """Daily task: Run the social fan-out tasks that are due"""
         logger.info("Starting Facebook publication task...")
         
-        # Get recently published articles
-        articles = self.db.get_pending_articles(limit=1)
+        completed = self.tasks.run_pending(task_types=['social_fanout'])
+        published_count = completed.get('social_fanout', 0)
         
-        if not articles:
+        if not published_count:
             logger.info("No articles to publish to Facebook.")
-            return
-        
-        for article in articles:
-            try:
-                # Get blog URL if published
-                blog_url = article.get('blog_url', config.WORDPRESS_URL)
-                
-                # Publish to Facebook
-                fb_post_id = self.social_media.facebook.create_post(
-                    self.social_media.facebook.format_post_message(article, blog_url),
-                    blog_url
-                )
-                
-                if fb_post_id:
-                    self.db.add_publication(article['id'], 'facebook', fb_post_id)
-                    logger.info(f"Published to Facebook: {article['title']}")
-                
-            except Exception as e:
-                logger.error(f"Error publishing to Facebook: {e}")
+        return published_count
     
     def publish_to_instagram(self):
         """Daily task: Publish to Instagram"""
@@ -167,27 +376,36 @@ class ContentScheduler:
         logger.info("Instagram publication requires images - implement image generation or selection")
         # Implement image handling logic here
     
+    def run_workers(self):
+        """Only run publication tasks, alongside a scheduler process sharing the database"""
+        self.tasks.start_workers()
+        logger.info(f"Task workers started ({config.TASK_WORKERS}). Press Ctrl+C to stop.")
+        
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            logger.info("Task workers stopped by user.")
+    
     def setup_schedule(self):
         """Setup all scheduled tasks"""
+        self.timer = TimerScheduler(self.db)
+        
         # Daily article search
-        schedule.every().day.at(f"{config.SEARCH_HOUR:02d}:{config.SEARCH_MINUTE:02d}").do(
-            self.search_and_collect_articles
-        )
+        self.timer.add_daily('search', self.search_and_collect_articles,
+                             config.SEARCH_HOUR, config.SEARCH_MINUTE)
         
         # Daily blog publication
-        schedule.every().day.at(f"{config.BLOG_POST_HOUR:02d}:{config.BLOG_POST_MINUTE:02d}").do(
-            self.publish_to_blog
-        )
+        self.timer.add_daily('publish_blog', self.publish_to_blog,
+                             config.BLOG_POST_HOUR, config.BLOG_POST_MINUTE)
         
         # Daily Facebook publication
-        schedule.every().day.at(f"{config.FACEBOOK_POST_HOUR:02d}:{config.FACEBOOK_POST_MINUTE:02d}").do(
-            self.publish_to_facebook
-        )
+        self.timer.add_daily('publish_facebook', self.publish_to_facebook,
+                             config.FACEBOOK_POST_HOUR, config.FACEBOOK_POST_MINUTE)
         
         # Daily Instagram publication
-        schedule.every().day.at(f"{config.INSTAGRAM_POST_HOUR:02d}:{config.INSTAGRAM_POST_MINUTE:02d}").do(
-            self.publish_to_instagram
-        )
+        self.timer.add_daily('publish_instagram', self.publish_to_instagram,
+                             config.INSTAGRAM_POST_HOUR, config.INSTAGRAM_POST_MINUTE)
         
         logger.info("Schedule setup completed:")
         logger.info(f"  - Article search: {config.SEARCH_HOUR:02d}:{config.SEARCH_MINUTE:02d}")
@@ -195,24 +413,97 @@ class ContentScheduler:
         logger.info(f"  - Facebook publication: {config.FACEBOOK_POST_HOUR:02d}:{config.FACEBOOK_POST_MINUTE:02d}")
         logger.info(f"  - Instagram publication: {config.INSTAGRAM_POST_HOUR:02d}:{config.INSTAGRAM_POST_MINUTE:02d}")
     
+    def reload_schedule(self) -> List[str]:
+        """
+        Move the daily jobs to the times now in .env, e.g. after POST /api/settings
+        
+        Returns:
+            Names of the rescheduled jobs
+        """
+        from dotenv import dotenv_values
+        values = dotenv_values(ENV_PATH)
+        moved = []
+        for name, keys in JOB_TIMES.items():
+            try:
+                hour, minute = (int(values.get(key) or getattr(config, key)) for key in keys)
+            except ValueError as e:
+                logger.error(f"Invalid time for job {name} in .env: {e}")
+                continue
+            if (hour, minute) == tuple(getattr(config, key) for key in keys):
+                continue
+            for key, value in zip(keys, (hour, minute)):
+                setattr(config, key, value)
+            if self.timer:
+                self.timer.reschedule(name, hour, minute)
+            moved.append(name)
+        return moved
+    
+    def listen_for_reload(self) -> bool:
+        """
+        Reload the job times whenever notify_scheduler() is called, e.g. by POST /api/settings
+        
+        Returns:
+            False if the control port is off or taken (another scheduler runs)
+        """
+        if not config.SCHEDULER_CONTROL_PORT:
+            return False
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind(('127.0.0.1', config.SCHEDULER_CONTROL_PORT))
+        except OSError as e:
+            sock.close()
+            logger.error(f"Cannot listen on control port {config.SCHEDULER_CONTROL_PORT}, "
+                         f"new job times need a restart: {e}")
+            return False
+        self._control_stop.clear()
+        self._control = threading.Thread(
+            target=self._control_loop, args=(sock,), name='scheduler-control', daemon=True
+        )
+        self._control.start()
+        return True
+    
+    def _control_loop(self, sock: socket.socket):
+        with sock:
+            while True:
+                try:
+                    message, _ = sock.recvfrom(64)
+                except OSError as e:
+                    logger.error(f"Scheduler control port failed, new job times need a restart: {e}")
+                    return
+                if self._control_stop.is_set():
+                    return
+                if message != RELOAD_MESSAGE:
+                    continue
+                try:
+                    moved = self.reload_schedule()
+                    logger.info(f"Schedule reloaded, moved: {', '.join(moved) or 'none'}")
+                except Exception as e:
+                    logger.error(f"Could not reload the schedule: {e}")
+    
     def run(self):
         """Start the scheduler"""
         self.setup_schedule()
+        self.listen_for_reload()
+        
+        # Retries and social posts run as soon as they are due, between the daily jobs
+        self.tasks.start_workers()
         
         logger.info("Scheduler started. Press Ctrl+C to stop.")
         
         try:
-            while True:
-                schedule.run_pending()
-                time.sleep(60)  # Check every minute
+            self.timer.run()
         except KeyboardInterrupt:
             logger.info("Scheduler stopped by user.")
-
+        finally:
+            self.timer.stop(wait=False)
 
 def run_scheduler():
     """Main function to run the scheduler"""
     scheduler = ContentScheduler()
-    scheduler.run()
+    try:
+        scheduler.run()
+    finally:
+        scheduler.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,161 @@
+"""
+Concurrent article search pipeline built on asyncio
+
+Stages:
+    1. Keyword fan-out: search workers take keywords and ask Gemini for articles
+       (near-duplicates of known articles are dropped here). With
+       GEMINI_STREAMING each result is passed on as soon as it is generated
+    2. Analysis workers: score queued results, up to one batch per request
+    3. DB writer: a single task that flushes analyzed articles to SQLite
+
+Each worker has at most one Gemini request in flight, so `concurrency`
+searches and `analysis_concurrency` analyses run at a time and throughput is
+bounded by the API quota rather than by fixed sleeps. The two limits are
+separate: a streamed search holds its request until the last result is
+generated, and analysis of the first results must not wait for it.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+import config
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSearchPipeline:
+    def __init__(self, scheduler, concurrency: int = None, num_results: int = 5,
+                 analysis_concurrency: int = None):
+        """
+        Args:
+            scheduler: ContentScheduler providing the Gemini client and database
+            concurrency: Maximum number of concurrent Gemini search requests
+            num_results: Articles to request per keyword
+            analysis_concurrency: Maximum number of concurrent analysis requests
+        """
+        self.scheduler = scheduler
+        self.gemini = scheduler.gemini
+        self.concurrency = max(1, concurrency or config.SEARCH_CONCURRENCY)
+        self.analysis_concurrency = max(1, analysis_concurrency or config.ANALYSIS_CONCURRENCY)
+        self.num_results = num_results
+        self.total_found = 0
+        self.search_history: List[Tuple[str, int]] = []
+
+    async def run(self, keywords: List[str]) -> int:
+        """Search all keywords and store the results, returns the number of new articles"""
+        keyword_queue: asyncio.Queue = asyncio.Queue()
+        analysis_queue: asyncio.Queue = asyncio.Queue()
+        write_queue: asyncio.Queue = asyncio.Queue()
+
+        for keyword in keywords:
+            keyword_queue.put_nowait(keyword)
+
+        stages = [
+            (keyword_queue, [
+                asyncio.create_task(self._search_worker(keyword_queue, analysis_queue))
+                for _ in range(self.concurrency)
+            ]),
+            (analysis_queue, [
+                asyncio.create_task(self._analysis_worker(analysis_queue, write_queue))
+                for _ in range(self.analysis_concurrency)
+            ]),
+            (write_queue, [asyncio.create_task(self._db_writer(write_queue))]),
+        ]
+
+        try:
+            # Drain the stages in order: once a queue is empty and its workers
+            # are idle, nothing more can arrive downstream of it
+            for queue, workers in stages:
+                await queue.join()
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            for _, workers in stages:
+                for worker in workers:
+                    worker.cancel()
+            await asyncio.to_thread(self.scheduler.db.add_search_history_many, self.search_history)
+
+        return self.total_found
+
+    async def _search_worker(self, keyword_queue: asyncio.Queue, analysis_queue: asyncio.Queue):
+        """Stage 1: search a keyword and pass each result on for analysis"""
+        while True:
+            keyword = await keyword_queue.get()
+            try:
+                logger.info(f"Searching for keyword: {keyword}")
+                found = 0
+                with span('search_keyword', keyword=keyword) as keyword_span:
+                    if config.GEMINI_STREAMING:
+                        # Results are handed on as soon as each one is generated
+                        async for article in self.gemini.search_articles_stream_async(
+                            keyword, num_results=self.num_results
+                        ):
+                            found += 1
+                            await self._enqueue_candidates(analysis_queue, keyword, [article])
+                    else:
+                        articles = await self.gemini.search_articles_async(
+                            keyword, num_results=self.num_results
+                        )
+                        found = len(articles)
+                        await self._enqueue_candidates(analysis_queue, keyword, articles)
+                    keyword_span.set(results=found)
+                self.search_history.append((keyword, found))
+            except Exception as e:
+                logger.error(f"Error searching for keyword '{keyword}': {e}")
+            finally:
+                keyword_queue.task_done()
+
+    async def _enqueue_candidates(self, analysis_queue: asyncio.Queue, keyword: str, articles: List[Dict]):
+        """Drop near-duplicates and queue the remaining results one by one"""
+        # The near-duplicate lookup queries the database, off the event loop
+        candidates, signatures = await asyncio.to_thread(self.scheduler._deduplicate, keyword, articles)
+        for index, article in enumerate(candidates):
+            analysis_queue.put_nowait((keyword, article, signatures[index] if signatures else None))
+
+    async def _analysis_worker(self, analysis_queue: asyncio.Queue, write_queue: asyncio.Queue):
+        """Stage 2: analyze whatever results are queued, up to one batch at a time"""
+        while True:
+            items = await self._take_batch(analysis_queue, config.ANALYSIS_BATCH_SIZE)
+            try:
+                with span('analyze_batch', size=len(items)):
+                    analyses = await self.gemini.analyze_articles_async(
+                        [article for _, article, _ in items], batch_size=config.ANALYSIS_BATCH_SIZE
+                    )
+                write_queue.put_nowait([
+                    (self.scheduler._article_record(article, keyword, analysis), signature)
+                    for (keyword, article, signature), analysis in zip(items, analyses)
+                ])
+            except Exception as e:
+                logger.error(f"Error analyzing {len(items)} results: {e}")
+            finally:
+                for _ in items:
+                    analysis_queue.task_done()
+
+    async def _db_writer(self, write_queue: asyncio.Queue):
+        """Stage 3: flush everything analyzed so far in one transaction, off the event loop"""
+        while True:
+            groups = await self._take_batch(write_queue, None)
+            entries = [entry for group in groups for entry in group]
+            batch = [record for record, _ in entries]
+            signatures = [signature for _, signature in entries] if self.scheduler.dedup else None
+            try:
+                self.total_found += await asyncio.to_thread(
+                    self.scheduler._save_articles, batch, signatures
+                )
+            except Exception as e:
+                logger.error(f"Error saving {len(batch)} articles: {e}")
+            finally:
+                for _ in groups:
+                    write_queue.task_done()
+
+    @staticmethod
+    async def _take_batch(queue: asyncio.Queue, limit: Optional[int]) -> list:
+        """Wait for one item, then take whatever else is already queued (up to limit)"""
+        items = [await queue.get()]
+        while limit is None or len(items) < limit:
+            try:
+                items.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return items
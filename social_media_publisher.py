@@ -5,17 +5,22 @@ import requests
 from typing import Dict, Optional
 import logging
 import config
+from http_client import PooledSession
+from rate_limiter import NOT_PROCESSED_STATUSES, call_with_backoff
+from tracing import traced
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class FacebookPublisher:
-    def __init__(self):
+    def __init__(self, session: requests.Session = None):
+        self.session = session or PooledSession()
         self.access_token = config.FACEBOOK_ACCESS_TOKEN
         self.page_id = config.FACEBOOK_PAGE_ID
         self.api_version = 'v18.0'
-        self.base_url = f'https://graph.facebook.com/{self.api_version}'
+        self.base_url = f"{config.GRAPH_API_URL.rstrip('/')}/{self.api_version}"
     
+    @traced()
     def create_post(self, message: str, link: Optional[str] = None) -> Optional[str]:
         """
         Create a Facebook page post
@@ -38,7 +43,10 @@ class FacebookPublisher:
             payload['link'] = link
         
         try:
-            response = requests.post(endpoint, data=payload)
+            response = call_with_backoff(
+                'facebook', self.session.post, endpoint, data=payload, operation='fb.feed',
+                retry_statuses=NOT_PROCESSED_STATUSES
+            )
             
             if response.status_code == 200:
                 post_id = response.json().get('id')
@@ -52,6 +60,7 @@ class FacebookPublisher:
             logger.error(f"Error creating Facebook post: {e}")
             return None
     
+    @traced()
     def create_photo_post(self, message: str, image_url: str) -> Optional[str]:
         """Create a Facebook post with an image"""
         endpoint = f"{self.base_url}/{self.page_id}/photos"
@@ -63,7 +72,10 @@ class FacebookPublisher:
         }
         
         try:
-            response = requests.post(endpoint, data=payload)
+            response = call_with_backoff(
+                'facebook', self.session.post, endpoint, data=payload, operation='fb.photos',
+                retry_statuses=NOT_PROCESSED_STATUSES
+            )
             
             if response.status_code == 200:
                 post_id = response.json().get('id')
@@ -98,12 +110,14 @@ class FacebookPublisher:
 
 
 class InstagramPublisher:
-    def __init__(self):
+    def __init__(self, session: requests.Session = None):
+        self.session = session or PooledSession()
         self.access_token = config.INSTAGRAM_ACCESS_TOKEN
         self.account_id = config.INSTAGRAM_BUSINESS_ACCOUNT_ID
         self.api_version = 'v18.0'
-        self.base_url = f'https://graph.facebook.com/{self.api_version}'
+        self.base_url = f"{config.GRAPH_API_URL.rstrip('/')}/{self.api_version}"
     
+    @traced()
     def create_post(self, image_url: str, caption: str) -> Optional[str]:
         """
         Create an Instagram post
@@ -127,7 +141,10 @@ class InstagramPublisher:
         
         try:
             # Create container
-            container_response = requests.post(container_endpoint, data=container_payload)
+            container_response = call_with_backoff(
+                'instagram', self.session.post, container_endpoint, data=container_payload,
+                operation='ig.container'
+            )
             
             if container_response.status_code != 200:
                 logger.error(f"Failed to create Instagram container: {container_response.text}")
@@ -142,7 +159,10 @@ class InstagramPublisher:
                 'access_token': self.access_token
             }
             
-            publish_response = requests.post(publish_endpoint, data=publish_payload)
+            publish_response = call_with_backoff(
+                'instagram', self.session.post, publish_endpoint, data=publish_payload,
+                operation='ig.publish', retry_statuses=NOT_PROCESSED_STATUSES
+            )
             
             if publish_response.status_code == 200:
                 media_id = publish_response.json().get('id')
@@ -172,6 +192,7 @@ class InstagramPublisher:
         
         return caption
     
+    @traced()
     def create_carousel_post(self, image_urls: list, caption: str) -> Optional[str]:
         """Create an Instagram carousel post with multiple images"""
         # Note: This is a simplified version
@@ -182,8 +203,15 @@ class InstagramPublisher:
 
 class SocialMediaManager:
     def __init__(self):
-        self.facebook = FacebookPublisher()
-        self.instagram = InstagramPublisher()
+        # Facebook and Instagram both talk to the Graph API host, so they
+        # share one connection pool
+        self.session = PooledSession()
+        self.facebook = FacebookPublisher(session=self.session)
+        self.instagram = InstagramPublisher(session=self.session)
+    
+    def close(self):
+        """Release pooled connections"""
+        self.session.close()
     
     def publish_to_all(self, article: Dict, blog_url: Optional[str] = None, 
                       image_url: Optional[str] = None) -> Dict[str, Optional[str]]:
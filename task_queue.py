@@ -0,0 +1,227 @@
+"""
+Durable SQLite-backed task queue for publication work
+
+Each publication step (generate the blog post, create the WordPress post,
+fan out to social media) is a row in the tasks table. Workers claim due tasks
+in a transaction, and a failed task is retried with jittered exponential
+backoff, so a WordPress timeout only redoes the upload and not the LLM
+generation whose output is stored in the follow-up task's payload. A task
+whose worker crashed is picked up again once its lease expires; while a task
+runs, a heartbeat keeps its lease (and its article's claim) alive. The claim
+is renewed for the worker that holds it, which may be another process; once
+another scheduler has reclaimed the article, claim_lost() tells the handler to
+leave the article alone.
+"""
+import os
+import random
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import logging
+import config
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# handler(task) -> follow-up tasks made with new_task(), queued when the task completes
+Handler = Callable[[Dict], Optional[List[Dict]]]
+
+
+def new_task(task_type: str, payload: Dict, article_id: int = None,
+             dedupe_key: str = None, run_at: float = None) -> Dict:
+    """
+    Describe a task to queue
+
+    Args:
+        task_type: Name the handler was registered under
+        payload: JSON-serializable handler input
+        article_id: Article the task works on
+        dedupe_key: Tasks with a key that is already queued are skipped
+        run_at: Unix time before which the task is not run (default: now)
+    """
+    return {
+        'task_type': task_type,
+        'payload': payload,
+        'article_id': article_id,
+        'dedupe_key': dedupe_key,
+        'run_at': run_at,
+    }
+
+
+def retry_time(attempts: int) -> float:
+    """When to run a task again after its attempts-th failure"""
+    backoff = min(config.TASK_BACKOFF_MAX, config.TASK_BACKOFF_BASE * (2 ** (attempts - 1)))
+    return time.time() + random.uniform(backoff / 2, backoff)
+
+
+class TaskQueue:
+    def __init__(self, db):
+        self.db = db
+        self._handlers: Dict[str, Handler] = {}
+        self._failure_handlers: Dict[str, Callable[[Dict, str], None]] = {}
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # task id -> (worker id, article id, article claim owner) of tasks running in this process
+        self._running: Dict[int, tuple] = {}
+        # Running tasks whose article was reclaimed by another worker
+        self._lost_claims: set = set()
+        self._running_lock = threading.Lock()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def register(self, task_type: str, handler: Handler,
+                 on_failure: Callable[[Dict, str], None] = None):
+        """
+        Register the handler of a task type
+
+        Args:
+            handler: Runs the task; raising an exception schedules a retry
+            on_failure: Called with the task and error once its attempts are used up
+        """
+        self._handlers[task_type] = handler
+        if on_failure:
+            self._failure_handlers[task_type] = on_failure
+
+    def enqueue(self, tasks: List[Dict], article_status: str = None) -> List[int]:
+        """Queue tasks made with new_task(), see ArticleDatabase.enqueue_tasks"""
+        return self.db.enqueue_tasks(tasks, article_status=article_status)
+
+    def run_once(self, worker_id: str = None, task_types: List[str] = None) -> Optional[Dict]:
+        """
+        Claim and run one due task
+
+        Returns:
+            The task with 'succeeded' set, or None if nothing was due
+        """
+        worker_id = worker_id or f"{self.worker_id}:{threading.get_ident()}"
+        task = self.db.claim_task(worker_id, task_types or list(self._handlers))
+        if task is None:
+            return None
+
+        handler = self._handlers.get(task['task_type'])
+        self._track(task, worker_id)
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for task type: {task['task_type']}")
+            with span(f"task.{task['task_type']}", 'task', task_id=task['id'],
+                      article_id=task.get('article_id'), attempt=task['attempts']):
+                follow_ups = handler(task) or []
+        except Exception as e:
+            self._fail(task, worker_id, str(e))
+            task['succeeded'] = False
+            return task
+        finally:
+            with self._running_lock:
+                self._running.pop(task['id'], None)
+                lost = task['id'] in self._lost_claims
+                self._lost_claims.discard(task['id'])
+
+        if lost:
+            logger.warning(f"Task {task['id']} ({task['task_type']}) lost its article claim, "
+                           f"dropping its follow-up tasks")
+            follow_ups = []
+        if not self.db.complete_task(task['id'], worker_id, follow_ups):
+            logger.warning(f"Task {task['id']} ({task['task_type']}) finished after its lease expired")
+        task['succeeded'] = True
+        return task
+
+    def run_pending(self, task_types: List[str] = None) -> Dict[str, int]:
+        """
+        Run due tasks until none are left, including follow-ups that are due at once
+
+        Returns:
+            Number of tasks completed per task type
+        """
+        completed: Dict[str, int] = {}
+        while True:
+            task = self.run_once(task_types=task_types)
+            if task is None:
+                return completed
+            if task['succeeded']:
+                completed[task['task_type']] = completed.get(task['task_type'], 0) + 1
+
+    def start_workers(self, count: int = None, task_types: List[str] = None):
+        """Start background worker threads that keep running tasks as they become due"""
+        self._stop.clear()
+        for index in range(count or config.TASK_WORKERS):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                args=(f"{self.worker_id}:worker-{index}", task_types),
+                name=f"task-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop_workers(self, timeout: float = None):
+        """Ask the worker threads to stop after their current task"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def claim_lost(self, task: Dict) -> bool:
+        """Whether the article of a running task was reclaimed by another worker"""
+        with self._running_lock:
+            return task['id'] in self._lost_claims
+
+    def _track(self, task: Dict, worker_id: str):
+        """Register a running task with the heartbeat thread, starting it on first use"""
+        # One long-lived thread, so the heartbeat keeps a single pooled connection
+        with self._running_lock:
+            self._running[task['id']] = (worker_id, task.get('article_id'), task.get('article_owner'))
+            if self._heartbeat is None or not self._heartbeat.is_alive():
+                self._heartbeat = threading.Thread(
+                    target=self._heartbeat_loop, name='task-heartbeat', daemon=True
+                )
+                self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        """Renew the leases of running tasks and their articles"""
+        interval = config.TASK_LEASE_SECONDS / 3
+        while True:
+            time.sleep(interval)
+            with self._running_lock:
+                running = dict(self._running)
+            for task_id, (worker_id, article_id, owner) in running.items():
+                try:
+                    self.db.extend_task_lease(task_id, worker_id)
+                    if owner and task_id not in self._lost_claims \
+                            and not self.db.heartbeat_articles(owner, [article_id]):
+                        logger.warning(f"Article {article_id} of task {task_id} was reclaimed by another worker")
+                        with self._running_lock:
+                            if task_id in self._running:
+                                self._lost_claims.add(task_id)
+                except Exception as e:
+                    logger.error(f"Heartbeat for task {task_id} failed: {e}")
+
+    def _worker_loop(self, worker_id: str, task_types: Optional[List[str]]):
+        while not self._stop.is_set():
+            try:
+                task = self.run_once(worker_id, task_types)
+            except Exception as e:
+                logger.error(f"Task worker {worker_id} error: {e}")
+                task = None
+            if task is None:
+                self._stop.wait(config.TASK_POLL_INTERVAL)
+
+    def _fail(self, task: Dict, worker_id: str, error: str):
+        if task['attempts'] < task['max_attempts']:
+            retry_at = retry_time(task['attempts'])
+            logger.warning(
+                f"Task {task['id']} ({task['task_type']}) failed, attempt "
+                f"{task['attempts']}/{task['max_attempts']}, retrying in "
+                f"{retry_at - time.time():.0f}s: {error}"
+            )
+            self.db.fail_task(task['id'], worker_id, error, retry_at)
+            return
+
+        logger.error(f"Task {task['id']} ({task['task_type']}) failed permanently: {error}")
+        self.db.fail_task(task['id'], worker_id, error)
+        on_failure = self._failure_handlers.get(task['task_type'])
+        if on_failure:
+            try:
+                on_failure(task, error)
+            except Exception as e:
+                logger.error(f"Failure handler of task {task['id']} raised: {e}")
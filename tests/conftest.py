@@ -0,0 +1,35 @@
+"""
+Shared fixtures: the modules live at the repository root, and every test
+gets its own database in a temporary directory
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ArticleDatabase  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = ArticleDatabase(str(tmp_path / 'articles.db'))
+    yield database
+    database.close()
+
+
+def make_article(index: int, ai_score=8.0, **fields) -> dict:
+    """An analyzed article as the scheduler stores it"""
+    article = {
+        'title': f'Статья {index}',
+        'url': f'https://example.com/{index}',
+        'content': f'Текст статьи {index} об энергоаудите зданий.',
+        'source': 'test',
+        'keywords': ['энергоаудит'],
+        'ai_score': ai_score,
+        'relevance_score': ai_score,
+        'analysis': {'scores': {'overall': ai_score, 'relevance': ai_score}, 'key_topics': []},
+    }
+    article.update(fields)
+    return article
@@ -0,0 +1,37 @@
+import threading
+
+from conftest import make_article
+from database import ArticleDatabase
+
+
+def test_duplicate_urls_are_reported_as_minus_one(db):
+    [first] = db.add_articles([make_article(1)])
+
+    ids = db.add_articles([make_article(1), make_article(2), make_article(2), make_article(3, url=None)])
+
+    assert ids[0] == -1
+    assert ids[1] > first
+    assert ids[2] == -1
+    assert ids[3] > ids[1]
+
+
+def test_concurrent_writers_never_both_claim_an_article(db):
+    path = db.db_path
+    results = []
+
+    def add():
+        other = ArticleDatabase(path)
+        try:
+            results.append(other.add_articles([make_article(i) for i in range(50)]))
+        finally:
+            other.close()
+
+    threads = [threading.Thread(target=add) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for index in range(50):
+        inserted = [ids[index] for ids in results if ids[index] != -1]
+        assert len(inserted) == 1
@@ -0,0 +1,39 @@
+import threading
+import time
+
+import pytest
+
+import config
+
+pytest.importorskip('fastapi')
+
+
+@pytest.fixture
+def job_manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'DATABASE_PATH', str(tmp_path / 'articles.db'))
+    from api_server import JobManager
+    return JobManager(max_workers=1)
+
+
+def test_shutdown_waits_for_the_running_job(job_manager):
+    started = threading.Event()
+    finished = []
+
+    def slow_job(progress):
+        started.set()
+        time.sleep(0.2)
+        finished.append(True)
+
+    job_manager.submit('search', slow_job)
+    started.wait(1)
+
+    assert job_manager.shutdown(timeout=5) is True
+    assert finished == [True]
+
+
+def test_shutdown_reports_a_job_that_overruns(job_manager):
+    release = threading.Event()
+    job_manager.submit('publish', lambda progress: release.wait(5))
+
+    assert job_manager.shutdown(timeout=0.05) is False
+    release.set()
@@ -0,0 +1,88 @@
+import time
+
+import config
+from conftest import make_article
+from database import ArticleDatabase, rank_expression, rank_index_sql
+from task_queue import new_task
+
+
+def test_claim_gives_each_article_to_one_worker(db):
+    db.add_articles([make_article(i) for i in range(3)])
+
+    first = db.claim_pending_articles('w1', 2)
+    second = db.claim_pending_articles('w2', 5)
+
+    assert len(first) == 2
+    assert len(second) == 1
+    assert not {a['id'] for a in first} & {a['id'] for a in second}
+    assert db.claim_pending_articles('w3', 5) == []
+
+
+def test_heartbeat_only_renews_the_owners_claim(db):
+    [article_id] = db.add_articles([make_article(1)])
+    db.claim_pending_articles('w1', 1)
+
+    assert db.heartbeat_articles('w2', [article_id]) == 0
+    assert db.heartbeat_articles('w1', [article_id]) == 1
+    claimed_by, = db.get_connection().execute(
+        'SELECT claimed_by FROM articles WHERE id = ?', (article_id,)
+    ).fetchone()
+    assert claimed_by == 'w1'
+
+
+def test_heartbeat_after_reclaim_reports_the_lost_lease(db):
+    [article_id] = db.add_articles([make_article(1)])
+    db.claim_pending_articles('w1', 1, lease_seconds=0.01)
+    time.sleep(0.05)
+
+    assert [a['id'] for a in db.claim_pending_articles('w2', 1)] == [article_id]
+    assert db.heartbeat_articles('w1', [article_id]) == 0
+    assert db.heartbeat_articles('w2', [article_id]) == 1
+
+
+def test_claimed_task_carries_the_article_claim_owner(db):
+    [article_id] = db.add_articles([make_article(1)])
+    db.claim_pending_articles('host:1', 1)
+    db.enqueue_tasks([new_task('generate_blog_post', {}, article_id=article_id)])
+
+    task = db.claim_task('host:2:worker-0')
+
+    assert task['article_id'] == article_id
+    assert task['article_owner'] == 'host:1'
+
+
+def test_claim_takes_the_best_ranked_articles_first(db, monkeypatch):
+    monkeypatch.setattr(config, 'RANKING_WEIGHTS', {'relevance': 1.0})
+    db.close()
+    db = ArticleDatabase(db.db_path)
+    db.add_articles([
+        make_article(1, ai_score=9.0, relevance_score=7.0),
+        make_article(2, ai_score=7.0, relevance_score=10.0),
+        make_article(3, ai_score=8.0, relevance_score=8.0),
+    ])
+
+    claimed = db.claim_pending_articles('w1', 2)
+
+    assert [a['title'] for a in claimed] == ['Статья 2', 'Статья 3']
+    assert [a['rank_score'] for a in claimed] == [10.0, 8.0]
+    db.close()
+
+
+def test_rank_index_follows_the_ranking_weights(db, monkeypatch):
+    conn = db.get_connection()
+    rank_index = "SELECT sql FROM sqlite_master WHERE name = 'idx_articles_status_rank_score'"
+    assert conn.execute(rank_index).fetchone()[0] == rank_index_sql()
+
+    monkeypatch.setattr(config, 'RANKING_WEIGHTS', {'quality': 1.0})
+    db.close()
+    db = ArticleDatabase(db.db_path)
+    conn = db.get_connection()
+
+    assert conn.execute(rank_index).fetchone()[0] == rank_index_sql()
+    plan = conn.execute(
+        f"EXPLAIN QUERY PLAN SELECT id, {rank_expression()} AS rank_score FROM articles "
+        f"WHERE status = 'pending' AND +ai_score >= 7 ORDER BY rank_score DESC, ai_score DESC, id"
+    ).fetchall()
+    assert 'idx_articles_status_rank_score' in plan[0][3]
+    assert not any('TEMP B-TREE' in row[3] for row in plan)
+    db.close()
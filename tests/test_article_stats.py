@@ -0,0 +1,56 @@
+import pytest
+
+from conftest import make_article
+
+
+def aggregates(db) -> dict:
+    """get_stats computed the slow way, from the articles table itself"""
+    conn = db.get_connection()
+    by_status = dict(conn.execute(
+        "SELECT COALESCE(status, ''), COUNT(*) FROM articles GROUP BY COALESCE(status, '')"
+    ).fetchall())
+    avg_score, = conn.execute('SELECT AVG(ai_score) FROM articles WHERE ai_score > 0').fetchone()
+    return {
+        'total_articles': sum(by_status.values()),
+        'by_status': by_status,
+        'avg_score': avg_score or 0,
+    }
+
+
+def stats(db) -> dict:
+    result = db.get_stats()
+    # Statuses whose articles all moved on keep a zero row
+    result['by_status'] = {status: count for status, count in result['by_status'].items() if count}
+    return result
+
+
+def assert_counters_match(db):
+    expected = aggregates(db)
+    actual = stats(db)
+    assert actual['total_articles'] == expected['total_articles']
+    assert actual['by_status'] == expected['by_status']
+    assert actual['avg_score'] == pytest.approx(expected['avg_score'])
+
+
+def test_counters_follow_inserts_status_changes_and_deletes(db):
+    ids = db.add_articles([make_article(i, ai_score=score) for i, score in enumerate([9.0, 7.5, 0, None, 6.0])])
+    assert_counters_match(db)
+    assert stats(db)['by_status'] == {'pending': 5}
+
+    db.update_article_status(ids[0], 'published')
+    db.update_article_status(ids[2], 'rejected')
+    db.claim_pending_articles('w1', 1)
+    assert_counters_match(db)
+
+    with db.transaction() as cursor:
+        cursor.execute('UPDATE articles SET ai_score = ? WHERE id = ?', (3.0, ids[3]))
+        cursor.execute('UPDATE articles SET ai_score = NULL WHERE id = ?', (ids[4],))
+    assert_counters_match(db)
+
+    with db.transaction() as cursor:
+        cursor.execute('DELETE FROM articles WHERE id IN (?, ?)', (ids[0], ids[3]))
+    assert_counters_match(db)
+
+
+def test_empty_database(db):
+    assert db.get_stats() == {'total_articles': 0, 'by_status': {}, 'avg_score': 0}
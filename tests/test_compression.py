@@ -0,0 +1,67 @@
+import pytest
+
+from compression import MIN_COMPRESS_SIZE, TextCodec, train_dictionary
+from conftest import make_article
+from database import DICTIONARY_TRAINING_ROWS, ArticleDatabase
+
+SAMPLES = [
+    f"Энергоаудит здания №{i}: тепловизионное обследование показало теплопотери через окна и кровлю."
+    for i in range(50)
+]
+
+
+def test_round_trip_with_and_without_dictionary():
+    codec = TextCodec({1: train_dictionary(SAMPLES)})
+    text = SAMPLES[7] * 3
+
+    for dictionary_id in (0, 1):
+        stored = codec.compress(text, dictionary_id)
+        assert isinstance(stored, bytes)
+        assert stored[0] == dictionary_id
+        assert codec.decompress(stored) == text
+    assert len(codec.compress(text, 1)) < len(codec.compress(text, 0))
+
+
+def test_short_values_and_none_are_stored_as_they_are():
+    codec = TextCodec()
+    short = 'я' * (MIN_COMPRESS_SIZE // 4)
+
+    assert codec.compress(short) == short
+    assert codec.compress(None) is None
+    assert codec.decompress(short) == short
+    assert codec.decompress(None) is None
+
+
+def test_unknown_dictionary_is_looked_up_or_rejected():
+    dictionary = train_dictionary(SAMPLES)
+    stored = TextCodec({3: dictionary}).compress(SAMPLES[0], 3)
+
+    assert TextCodec(missing={3: dictionary}.get).decompress(stored) == SAMPLES[0]
+    with pytest.raises(ValueError):
+        TextCodec().decompress(stored)
+    with pytest.raises(ValueError):
+        TextCodec().add(256, dictionary)
+
+
+def test_dictionaries_are_not_retrained_on_every_start(tmp_path):
+    path = str(tmp_path / 'articles.db')
+    db = ArticleDatabase(path)
+    # Too few articles with content to train its dictionary, enough analyses
+    db.add_articles([
+        make_article(i, content=None if i % 2 else SAMPLES[i % 50])
+        for i in range(DICTIONARY_TRAINING_ROWS + 10)
+    ])
+    db.close()
+
+    counts = []
+    for _ in range(3):
+        db = ArticleDatabase(path)
+        counts.append(dict(db.get_connection().execute(
+            'SELECT column_name, COUNT(*) FROM compression_dictionaries GROUP BY column_name'
+        ).fetchall()))
+        article = db.get_article(3)
+        db.close()
+
+    assert counts[0] == counts[1] == counts[2]
+    assert counts[0]['analysis'] == 2
+    assert article['content'] == SAMPLES[2]
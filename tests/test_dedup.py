@@ -0,0 +1,66 @@
+import json
+
+from dedup import NearDuplicateIndex
+
+AUDIT = {
+    'title': 'Энергоаудит офисных зданий в Москве',
+    'description': 'Как провести энергоаудит офисного здания и снизить расходы на отопление',
+    'source_type': 'article',
+}
+# Punctuation and case don't matter
+AUDIT_COPY = dict(AUDIT, title='ЭНЕРГОАУДИТ офисных зданий в Москве!')
+# Estimated similarity to AUDIT: 0.875
+AUDIT_VARIANT = dict(AUDIT, description='Как провести энергоаудит офисного здания и снизить расходы на освещение')
+THERMAL = {
+    'title': 'Тепловизор для обследования фасадов',
+    'description': 'Обзор тепловизоров для поиска утечек тепла',
+    'source_type': 'news',
+}
+
+
+def store(db, index, keyword, kept):
+    """Save accepted candidates the way ContentScheduler._save_articles does"""
+    article_ids = db.add_articles([
+        {'title': article['title'], 'url': f"https://example.com/{article['title']}",
+         'content': article['description'], 'keywords': [keyword]}
+        for article, _ in kept
+    ])
+    index.register([(article_id, signature) for article_id, (_, signature) in zip(article_ids, kept)])
+    return article_ids
+
+
+def keywords(db, article_id):
+    stored, = db.get_connection().execute('SELECT keywords FROM articles WHERE id = ?', (article_id,)).fetchone()
+    return json.loads(stored)
+
+
+def test_threshold_decides_what_is_a_near_copy(db):
+    strict = NearDuplicateIndex(db, threshold=0.9)
+    loose = NearDuplicateIndex(db, threshold=0.8)
+
+    assert len(strict.deduplicate('энергоаудит', [AUDIT, AUDIT_COPY, AUDIT_VARIANT, THERMAL])) == 3
+    assert len(loose.deduplicate('энергоаудит', [AUDIT, AUDIT_COPY, AUDIT_VARIANT, THERMAL])) == 2
+
+
+def test_near_copy_of_an_article_from_an_earlier_run_is_merged(db):
+    index = NearDuplicateIndex(db, threshold=0.8)
+    [article_id] = store(db, index, 'энергоаудит', index.deduplicate('энергоаудит', [AUDIT]))
+
+    index.reset()
+    kept = index.deduplicate('отопление', [AUDIT_VARIANT, THERMAL])
+
+    assert [article for article, _ in kept] == [THERMAL]
+    assert keywords(db, article_id) == ['энергоаудит', 'отопление']
+
+
+def test_near_copy_found_again_in_the_same_run_keeps_its_keyword(db):
+    index = NearDuplicateIndex(db, threshold=0.8)
+    first = index.deduplicate('энергоаудит', [AUDIT])
+
+    # Found by another keyword before the first result is analyzed and stored
+    assert index.deduplicate('офисные здания', [AUDIT_COPY]) == []
+    [article_id] = store(db, index, 'энергоаудит', first)
+    # ... and once it is stored
+    assert index.deduplicate('отопление', [AUDIT_VARIANT]) == []
+
+    assert keywords(db, article_id) == ['энергоаудит', 'офисные здания', 'отопление']
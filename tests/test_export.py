@@ -0,0 +1,88 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+import export
+from conftest import make_article
+from database import EXPORT_COLUMNS
+
+
+def read(db, table='articles', fmt='ndjson', since=None, compress=False) -> str:
+    data = b''.join(export.export_chunks(db, table, fmt, since=since, compress=compress))
+    return (gzip.decompress(data) if compress else data).decode('utf-8')
+
+
+def ndjson(text: str) -> list:
+    return [json.loads(line) for line in text.splitlines()]
+
+
+@pytest.fixture
+def articles(db):
+    ids = db.add_articles([make_article(i) for i in range(1, 4)])
+    with db.transaction() as cursor:
+        cursor.executemany('UPDATE articles SET found_date = ? WHERE id = ?', [
+            ('2026-03-01 09:00:00', ids[0]),
+            ('2026-03-02 09:00:00', ids[1]),
+            ('2026-03-03 09:00:00', ids[2]),
+        ])
+    return ids
+
+
+def test_ndjson_has_every_column_and_decoded_fields(db, articles):
+    rows = ndjson(read(db))
+
+    assert [row['id'] for row in rows] == articles
+    assert list(rows[0]) == EXPORT_COLUMNS['articles']
+    assert rows[0]['content'] == 'Текст статьи 1 об энергоаудите зданий.'
+    assert rows[0]['keywords'] == ['энергоаудит']
+
+
+def test_since_id_exports_only_newer_rows(db, articles):
+    assert [row['id'] for row in ndjson(read(db, since=str(articles[0])))] == articles[1:]
+    assert read(db, since=str(articles[-1])) == ''
+
+
+def test_since_date(db, articles):
+    assert [row['id'] for row in ndjson(read(db, since='2026-03-02'))] == articles[1:]
+    assert [row['id'] for row in ndjson(read(db, since='2026-03-02T12:00'))] == articles[2:]
+
+
+def test_malformed_since_is_rejected_before_reading(db):
+    with pytest.raises(ValueError):
+        export.export_chunks(db, 'articles', since='вчера')
+    with pytest.raises(ValueError):
+        export.export_chunks(db, 'articles', fmt='xml')
+
+
+def test_csv_header_and_quoting(db):
+    title = 'Котельная "Север", часть 1\nитоги'
+    db.add_articles([make_article(1, title=title, keywords=['энергоаудит', 'ЖКХ, тарифы'])])
+
+    text = read(db, fmt='csv')
+    header, row = list(csv.reader(io.StringIO(text)))
+
+    assert header == EXPORT_COLUMNS['articles']
+    record = dict(zip(header, row))
+    assert record['title'] == title
+    assert json.loads(record['keywords']) == ['энергоаудит', 'ЖКХ, тарифы']
+    assert record['ai_score'] == '8.0'
+
+
+def test_gzip_round_trip(db, articles, monkeypatch):
+    # Several chunks through the compressor
+    monkeypatch.setattr(export, 'CHUNK_SIZE', 100)
+
+    assert read(db, compress=True) == read(db)
+    assert read(db, fmt='csv', compress=True) == read(db, fmt='csv')
+
+
+def test_publications_export(db, articles):
+    db.add_publication(articles[0], 'wordpress', '42', 'published')
+
+    [row] = ndjson(read(db, table='publications'))
+
+    assert row['article_id'] == articles[0]
+    assert row['post_id'] == '42'
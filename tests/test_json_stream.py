@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+import config
+from gemini_search import GeminiSearchEngine
+from json_stream import IncrementalJSONParser, extract_json
+
+ARTICLES = [
+    {'title': 'Энергоаудит {зданий}', 'url': 'https://example.com/1'},
+    {'title': 'Тепловизор [обзор]', 'url': 'https://example.com/2'},
+]
+REPLY = (
+    'Вот результаты {как просили}:\n```json\n'
+    + json.dumps({'articles': ARTICLES, 'total': 2}, ensure_ascii=False)
+    + '\n```\nЕсли нужно, найду ещё {или [меньше]}.'
+)
+
+
+def feed_chunks(parser: IncrementalJSONParser, *chunks: str) -> list:
+    items = []
+    for chunk in chunks:
+        items.extend(parser.feed(chunk))
+    return items
+
+
+def test_reply_split_at_every_offset():
+    for offset in range(len(REPLY) + 1):
+        parser = IncrementalJSONParser('articles')
+
+        items = feed_chunks(parser, REPLY[:offset], REPLY[offset:])
+
+        assert items == ARTICLES, offset
+        assert parser.result() == {'articles': ARTICLES, 'total': 2}, offset
+
+
+def test_items_are_yielded_as_they_complete():
+    parser = IncrementalJSONParser('articles')
+    first = json.dumps(ARTICLES[0], ensure_ascii=False)
+
+    assert parser.feed('{"articles": [' + first[:-1]) == []
+    assert parser.feed('}, ') == [ARTICLES[0]]
+    assert not parser.complete
+
+
+def test_braces_and_brackets_in_strings_and_prose():
+    reply = 'Ответ {черновик}: {"articles": [{"title": "a } ] { [", "url": "u"}]} и ещё }'
+
+    assert extract_json(reply, 'articles') == {'articles': [{'title': 'a } ] { [', 'url': 'u'}]}
+
+
+def test_braces_in_prose_that_are_not_json_are_skipped():
+    assert extract_json('Смотри {пример} и затем {"ok": true}') == {'ok': True}
+
+
+def test_escaped_quotes():
+    title = 'Проект \\"Тёплый дом\\" и \\\\ слэш'
+    reply = '{"articles": [{"title": "' + title + '"}]}'
+
+    assert extract_json(reply, 'articles') == {'articles': [{'title': 'Проект "Тёплый дом" и \\ слэш'}]}
+
+
+@pytest.mark.parametrize('tail', [
+    '{"title": "Обрыв посреди стро',
+    '{"title": "Без закрывающей скобки", "url": "u"',
+    '{"title": "Лишняя запятая",}]}',
+    '{"title": "Без кавычек", url: 5}]}',
+])
+def test_broken_tail_keeps_the_complete_items(tail):
+    reply = '{"articles": [' + ', '.join(json.dumps(a, ensure_ascii=False) for a in ARTICLES) + ', ' + tail
+    parser = IncrementalJSONParser('articles')
+
+    assert parser.feed(reply) == ARTICLES
+    assert not parser.complete
+    assert parser.result() == {'articles': ARTICLES}
+
+
+def test_no_json_at_all():
+    assert extract_json('Ничего не найдено {', 'articles') is None
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'GEMINI_API_KEY', 'test-key')
+    monkeypatch.setattr(config, 'GEMINI_API_ENDPOINT', '')
+    monkeypatch.setattr(config, 'GEMINI_CACHE_PATH', str(tmp_path / 'cache.db'))
+    gemini = GeminiSearchEngine(cache_mode='on')
+    yield gemini
+    gemini.close()
+
+
+def test_parse_reply_caches_only_complete_replies(engine):
+    assert engine._parse_reply('search_articles', 'полный', REPLY, True) == {'articles': ARTICLES, 'total': 2}
+    assert engine._cache_lookup('search_articles', 'полный') == {'articles': ARTICLES, 'total': 2}
+
+    truncated = REPLY[:REPLY.index('"total"')]
+    assert engine._parse_reply('search_articles', 'обрыв', truncated, True) == {'articles': ARTICLES}
+    assert engine._cache_lookup('search_articles', 'обрыв') is None
+
+
+def test_search_articles_returns_the_items_of_a_truncated_reply(engine):
+    engine.model.generate_content = lambda prompt: FakeResponse(REPLY[:REPLY.index('"total"')])
+
+    assert engine.search_articles('энергоаудит', num_results=2) == ARTICLES
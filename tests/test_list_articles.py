@@ -0,0 +1,40 @@
+import pytest
+
+from conftest import make_article
+
+
+def all_pages(db, **kwargs):
+    ids, cursor = [], None
+    while True:
+        page, cursor = db.list_articles(fields=['id', 'ai_score'], cursor=cursor, **kwargs)
+        ids.extend(article['id'] for article in page)
+        if cursor is None:
+            return ids
+
+
+def test_pages_cover_every_article_once_in_order(db):
+    db.add_articles([make_article(i, ai_score=float(i % 4)) for i in range(1, 12)])
+
+    ids = all_pages(db, limit=3)
+
+    expected, _ = db.list_articles(fields=['id'], limit=100)
+    assert ids == [article['id'] for article in expected]
+    assert sorted(ids) == list(range(1, 12))
+
+
+def test_articles_without_score_or_date_are_on_the_last_page(db):
+    db.add_articles([make_article(i) for i in range(1, 6)])
+    db.add_articles([make_article(6, ai_score=None)])
+    with db.transaction() as cursor:
+        cursor.execute('UPDATE articles SET found_date = NULL WHERE id = 3')
+
+    ids = all_pages(db, limit=2)
+
+    assert sorted(ids) == [1, 2, 3, 4, 5, 6]
+    assert ids[-1] == 6
+    assert all_pages(db, limit=2, status='pending') == ids
+
+
+def test_malformed_cursor_is_rejected(db):
+    with pytest.raises(ValueError):
+        db.list_articles(cursor='not-a-cursor')
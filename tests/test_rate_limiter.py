@@ -0,0 +1,131 @@
+import time
+from email.utils import formatdate
+
+import pytest
+
+import config
+import rate_limiter
+from rate_limiter import NOT_PROCESSED_STATUSES, call_with_backoff
+from wordpress_publisher import WordPressPublisher
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None, body=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ''
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f'HTTP {status_code}')
+        self.response = FakeResponse(status_code)
+
+
+class Server:
+    """Answers calls with the given responses in turn, recording each call"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff delays instead of sleeping; every test gets fresh buckets"""
+    delays = []
+    monkeypatch.setattr(rate_limiter.time, 'sleep', delays.append)
+    monkeypatch.setattr(rate_limiter, '_buckets', {})
+    monkeypatch.setattr(config, 'RATE_LIMIT_BACKOFF_BASE', 0.01)
+    monkeypatch.setattr(config, 'RATE_LIMIT_MAX_RETRIES', 3)
+    return delays
+
+
+def test_retry_after_seconds_is_honoured_and_pauses_the_service(sleeps):
+    server = Server(FakeResponse(429, {'Retry-After': '7'}), FakeResponse(200))
+
+    assert call_with_backoff('wordpress', server).status_code == 200
+    assert len(server.calls) == 2
+    assert sleeps[0] == 7.0
+    # Every other caller of the service waits out the Retry-After too
+    assert rate_limiter.get_bucket('wordpress')._reserve() > 6
+
+
+def test_retry_after_http_date(sleeps):
+    retry_at = formatdate(time.time() + 30, usegmt=True)
+    server = Server(FakeResponse(503, {'Retry-After': retry_at}), FakeResponse(200))
+
+    call_with_backoff('gemini', server)
+
+    assert 28 <= sleeps[0] <= 30
+
+
+def test_5xx_is_retried_until_max_retries(sleeps):
+    server = Server(*[FakeResponse(502)] * 4)
+
+    assert call_with_backoff('gemini', server).status_code == 502
+    assert len(server.calls) == 4
+    assert len(sleeps) == 3
+
+
+def test_error_with_status_is_retried_then_raised(sleeps):
+    server = Server(*[HTTPError(503)] * 4)
+
+    with pytest.raises(HTTPError):
+        call_with_backoff('gemini', server)
+    assert len(server.calls) == 4
+
+
+def test_creating_call_is_not_retried_on_5xx_or_timeout(sleeps):
+    server = Server(FakeResponse(500), HTTPError(504), TimeoutError('read timed out'))
+
+    assert call_with_backoff('wordpress', server, retry_statuses=NOT_PROCESSED_STATUSES).status_code == 500
+    with pytest.raises(HTTPError):
+        call_with_backoff('wordpress', server, retry_statuses=NOT_PROCESSED_STATUSES)
+    with pytest.raises(TimeoutError):
+        call_with_backoff('wordpress', server, retry_statuses=NOT_PROCESSED_STATUSES)
+    assert len(server.calls) == 3
+    assert sleeps == []
+
+
+def test_creating_call_is_retried_on_429(sleeps):
+    server = Server(FakeResponse(429, {'Retry-After': '1'}), FakeResponse(201))
+
+    assert call_with_backoff('wordpress', server, retry_statuses=NOT_PROCESSED_STATUSES).status_code == 201
+    assert len(server.calls) == 2
+
+
+class FakeSession:
+    def __init__(self, get=None, post=None):
+        self.get = get
+        self.post = post
+
+
+def test_wordpress_post_is_sent_once_on_5xx(db, sleeps):
+    session = FakeSession(post=Server(FakeResponse(502)))
+    publisher = WordPressPublisher(db=db, session=session)
+
+    assert publisher.create_post({'title': 'Энергоаудит'}) is None
+    assert len(session.post.calls) == 1
+
+
+def test_wordpress_retry_finds_the_post_created_by_the_failed_attempt(db, sleeps):
+    session = FakeSession(
+        get=Server(FakeResponse(200, body=[{'id': 42, 'title': {'raw': 'Энергоаудит'}}])),
+        post=Server(),
+    )
+    publisher = WordPressPublisher(db=db, session=session)
+
+    assert publisher.create_post({'title': 'Энергоаудит'}, check_existing=True) == '42'
+    assert session.post.calls == []
@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+
+from response_cache import ResponseCache
+
+TTLS = {'search_articles': 3600, 'analyze_article': 0}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), max_bytes=1000, ttls=TTLS)
+    yield cache
+    cache.close()
+
+
+def counted(cache) -> int:
+    return cache._conn.execute('SELECT total_size FROM cache_stats').fetchone()[0]
+
+
+def summed(cache) -> int:
+    return cache._conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()[0]
+
+
+def test_counter_follows_insert_replace_and_delete(cache):
+    cache.set('a', 'search_articles', {'articles': ['x' * 100]})
+    cache.set('b', 'search_articles', {'articles': ['y' * 50]})
+    assert counted(cache) == summed(cache) > 150
+
+    cache.set('a', 'search_articles', {'articles': []})
+    assert counted(cache) == summed(cache)
+
+    # Expired on read
+    cache.set('c', 'analyze_article', {'score': 5})
+    assert cache.get('c', 'analyze_article') is None
+    assert counted(cache) == summed(cache)
+
+    cache.clear()
+    assert counted(cache) == summed(cache) == 0
+
+
+def test_least_recently_used_entries_are_evicted(cache, monkeypatch):
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr('response_cache.time.time', lambda: next(clock))
+
+    # 242 bytes each as JSON: four fit in 1000
+    for key in 'abcd':
+        cache.set(key, 'search_articles', 'x' * 240)
+    # 'a' is the most recently used now
+    assert cache.get('a', 'search_articles') == 'x' * 240
+    cache.set('e', 'search_articles', 'x' * 240)
+
+    keys = {row[0] for row in cache._conn.execute('SELECT key FROM cache_entries')}
+    assert keys == {'a', 'c', 'd', 'e'}
+    assert counted(cache) == summed(cache) <= 1000
+
+
+def test_cache_from_before_the_counter_is_backfilled(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE cache_entries (
+            key TEXT PRIMARY KEY, method TEXT, value TEXT, size INTEGER, created_at REAL, accessed_at REAL
+        )
+    ''')
+    conn.execute("INSERT INTO cache_entries VALUES ('old', 'search_articles', '[]', 400, 0, 0)")
+    conn.commit()
+    conn.close()
+
+    cache = ResponseCache(path, max_bytes=1000, ttls=TTLS)
+    try:
+        assert counted(cache) == 400
+        # Reopening doesn't count the entries twice
+        cache.close()
+        cache = ResponseCache(path, max_bytes=1000, ttls=TTLS)
+        assert counted(cache) == 400
+    finally:
+        cache.close()
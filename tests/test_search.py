@@ -0,0 +1,50 @@
+import sqlite3
+
+from conftest import make_article
+
+LONG_TEXT = 'Тепловизионное обследование фасада показало теплопотери через оконные откосы. ' * 3
+
+
+def found(db, query):
+    articles, _ = db.search_articles(query, fields=['id'])
+    return [article['id'] for article in articles]
+
+
+def test_added_articles_are_searchable_with_compressed_content(db):
+    [article_id] = db.add_articles([make_article(1, content=LONG_TEXT)])
+    stored, = db.get_connection().execute('SELECT content FROM articles WHERE id = ?', (article_id,)).fetchone()
+    assert isinstance(stored, bytes)
+
+    # Any inflection of the words matches
+    assert found(db, 'тепловизионного обследования') == [article_id]
+    assert found(db, 'энергоаудит') == [article_id]
+
+
+def test_merged_keywords_are_reindexed(db):
+    [article_id] = db.add_articles([make_article(1, content=LONG_TEXT)])
+
+    db.merge_article_keywords(article_id, ['рекуперация'])
+
+    assert found(db, 'рекуперация') == [article_id]
+    assert found(db, 'энергоаудит') == [article_id]
+    assert found(db, 'тепловизионного') == [article_id]
+
+
+def test_other_writers_need_no_application_functions(db):
+    [article_id] = db.add_articles([make_article(1, content=LONG_TEXT)])
+
+    # e.g. the sqlite3 shell: no stem_text() or decompress_text()
+    conn = sqlite3.connect(db.db_path)
+    with conn:
+        conn.execute(
+            "INSERT INTO articles (title, url, content, keywords) VALUES (?, ?, ?, ?)",
+            ('Вентиляция складов', 'https://example.com/shell', 'Приточная вентиляция', '[]')
+        )
+        conn.execute('UPDATE articles SET title = ? WHERE id = ?', ('Новый заголовок', article_id))
+        conn.execute('DELETE FROM articles WHERE id = ?', (article_id,))
+    conn.close()
+    assert found(db, 'Вентиляция') == []
+
+    assert db.rebuild_search_index() == 1
+    assert found(db, 'Вентиляция') == [article_id + 1]
+    assert found(db, 'тепловизионного') == []
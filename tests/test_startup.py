@@ -0,0 +1,51 @@
+"""
+Cold-start budget of the CLI modes and the API server (benchmarks/startup_benchmark.py)
+
+STARTUP_BUDGET_SCALE multiplies the time budgets on a slow machine.
+"""
+import os
+
+import pytest
+
+from benchmarks.startup_benchmark import GEMINI_MODULES, HTTP_MODULES, SCENARIOS, check, measure, parse_importtime
+
+BUDGET_SCALE = float(os.getenv('STARTUP_BUDGET_SCALE', 1.0))
+RUNS = 3
+
+
+def scenario(name: str) -> dict:
+    return next(s for s in SCENARIOS if s['name'] == name)
+
+
+def test_parse_importtime_sums_self_times():
+    stderr = (
+        'import time: self [us] | cumulative | imported package\n'
+        'import time:       500 |        500 |   posixpath\n'
+        'import time:      1500 |       2000 | os\n'
+        'Traceback lines and logging are ignored\n'
+    )
+
+    import_ms, modules = parse_importtime(stderr)
+
+    assert import_ms == 2.0
+    assert modules == {'posixpath': 0.5, 'os': 2.0}
+
+
+@pytest.mark.parametrize('name, not_imported', [
+    ('main --mode test', GEMINI_MODULES + HTTP_MODULES),
+    # Publishes through requests, but never needs Gemini
+    ('main --mode publish-social', GEMINI_MODULES),
+])
+def test_cli_mode_starts_within_budget(name, not_imported):
+    result = measure(scenario(name), RUNS)
+
+    assert check(scenario(name), result, BUDGET_SCALE) == []
+    assert not set(not_imported) & set(result['modules'])
+
+
+def test_api_server_import_within_budget():
+    pytest.importorskip('fastapi')
+    result = measure(scenario('import api_server'), RUNS)
+
+    assert check(scenario('import api_server'), result, BUDGET_SCALE) == []
+    assert not set(GEMINI_MODULES + HTTP_MODULES) & set(result['modules'])
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+import config
+from conftest import make_article
+from task_queue import TaskQueue, new_task
+
+
+@pytest.fixture
+def queue(db, monkeypatch):
+    # Retries are due at once
+    monkeypatch.setattr(config, 'TASK_BACKOFF_BASE', 0)
+    monkeypatch.setattr(config, 'TASK_MAX_ATTEMPTS', 3)
+    return TaskQueue(db)
+
+
+def task_rows(db) -> list:
+    return db.get_connection().execute(
+        'SELECT task_type, state, attempts, last_error FROM tasks ORDER BY id'
+    ).fetchall()
+
+
+def test_retry_reruns_only_the_failed_stage(db, queue):
+    [article_id] = db.add_articles([make_article(1)])
+    calls = {'generate': 0, 'upload': []}
+
+    def generate(task):
+        calls['generate'] += 1
+        return [new_task('upload', {'post': f"Пост о статье {task['article_id']}"}, article_id=task['article_id'])]
+
+    def upload(task):
+        calls['upload'].append(task['payload'])
+        if len(calls['upload']) == 1:
+            raise TimeoutError('WordPress timed out')
+
+    queue.register('generate', generate)
+    queue.register('upload', upload)
+    queue.enqueue([new_task('generate', {}, article_id=article_id)])
+
+    assert queue.run_pending() == {'generate': 1, 'upload': 1}
+    assert calls['generate'] == 1
+    assert calls['upload'] == [{'post': 'Пост о статье 1'}] * 2
+    assert task_rows(db) == [('generate', 'done', 1, None), ('upload', 'done', 2, None)]
+
+
+def test_failure_hook_runs_once_attempts_are_used_up(db, queue):
+    failures = []
+
+    def upload(task):
+        raise ConnectionError(f"attempt {task['attempts']}")
+
+    queue.register('upload', upload, on_failure=lambda task, error: failures.append((task['id'], error)))
+    [task_id] = queue.enqueue([new_task('upload', {'post': 'текст'})])
+
+    assert queue.run_pending() == {}
+    assert failures == [(task_id, 'attempt 3')]
+    assert task_rows(db) == [('upload', 'failed', 3, 'attempt 3')]
+    assert queue.run_once() is None
+
+
+def test_dedupe_key_skips_an_unfinished_duplicate(db, queue):
+    first = queue.enqueue([new_task('upload', {}, dedupe_key='wp:1')])
+    second = queue.enqueue([new_task('upload', {}, dedupe_key='wp:1')])
+
+    assert first[0] > 0
+    assert second == [-1]
+
+
+def test_expired_lease_is_reclaimed(db):
+    [task_id] = db.enqueue_tasks([new_task('upload', {'post': 'текст'})])
+
+    task = db.claim_task('w1', lease_seconds=0.01)
+    assert db.claim_task('w2') is None
+    time.sleep(0.05)
+    reclaimed = db.claim_task('w2')
+
+    assert task['id'] == reclaimed['id'] == task_id
+    assert reclaimed['attempts'] == 2
+    assert reclaimed['payload'] == {'post': 'текст'}
+    # The crashed worker's late result is rejected
+    assert db.complete_task(task_id, 'w1') is False
+    assert db.complete_task(task_id, 'w2') is True
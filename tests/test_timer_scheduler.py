@@ -0,0 +1,104 @@
+import socket
+import time
+from datetime import datetime, timedelta
+
+from timer_scheduler import MAX_CATCH_UP_RUNS, DailyJob, TimerScheduler
+
+
+def at(day: int, hour: int, minute: int = 0) -> float:
+    return datetime(2026, 3, day, hour, minute).timestamp()
+
+
+def job(**kwargs) -> DailyJob:
+    return DailyJob('search', lambda: None, 9, 0, **kwargs)
+
+
+def test_no_missed_runs_before_the_next_slot():
+    assert job().missed_runs(at(10, 9), at(10, 23)) == []
+    assert job().missed_runs(at(10, 9), at(11, 8, 59)) == []
+
+
+def test_missed_runs_are_the_slots_since_the_last_run_oldest_first():
+    assert job().missed_runs(at(10, 9), at(13, 10)) == [at(11, 9), at(12, 9), at(13, 9)]
+
+
+def test_long_gap_keeps_the_latest_slots():
+    missed = job().missed_runs(at(1, 9), at(20, 12))
+
+    assert len(missed) == MAX_CATCH_UP_RUNS
+    assert missed[-1] == at(20, 9)
+    assert missed[0] == at(20 - MAX_CATCH_UP_RUNS + 1, 9)
+
+
+def test_catch_up_once_replays_the_latest_slot(db):
+    db.record_job_run('search', at(1, 9), at(1, 9), at(1, 9, 5), 'success')
+    scheduler = TimerScheduler(db, max_workers=1)
+    try:
+        assert scheduler._catch_up_runs(job(catch_up='once'), at(20, 12)) == [at(20, 9)]
+        assert scheduler._catch_up_runs(job(catch_up='skip'), at(20, 12)) == []
+    finally:
+        scheduler.stop()
+
+
+def test_reschedule_moves_the_next_run():
+    scheduler = TimerScheduler(max_workers=1)
+    try:
+        scheduler.add_daily('search', lambda: None, 9, 0, catch_up='skip')
+        before = datetime.fromtimestamp(scheduler.next_runs()['search'])
+        scheduler.reschedule('search', 21, 30)
+        after = datetime.fromtimestamp(scheduler.next_runs()['search'])
+    finally:
+        scheduler.stop()
+
+    assert (before.hour, before.minute) == (9, 0)
+    assert (after.hour, after.minute) == (21, 30)
+    assert after - datetime.now() <= timedelta(days=1)
+
+
+def test_overlapping_run_is_recorded_as_skipped(db):
+    scheduler = TimerScheduler(db, max_workers=1)
+    search = scheduler.add_daily('search', lambda: None, 9, 0, catch_up='skip')
+    search.running = True
+    with scheduler._condition:
+        scheduler._dispatch(search, at(10, 9), catch_up=False)
+    scheduler.stop()
+
+    rows = db.get_connection().execute('SELECT job_name, scheduled_at, status FROM job_runs').fetchall()
+    assert rows == [('search', at(10, 9), 'skipped')]
+    # The slot counts as handled for catch-up
+    assert db.get_last_job_run('search') == at(10, 9)
+
+
+def test_settings_change_reaches_the_running_scheduler(db, tmp_path, monkeypatch):
+    import config
+    import scheduler as scheduler_module
+    from scheduler import ContentScheduler, notify_scheduler
+
+    env_path = tmp_path / '.env'
+    env_path.write_text('SEARCH_HOUR=9\nSEARCH_MINUTE=0\n')
+    monkeypatch.setattr(scheduler_module, 'ENV_PATH', str(env_path))
+    monkeypatch.setattr(config, 'SCHEDULER_CONTROL_PORT', free_udp_port())
+    monkeypatch.setattr(config, 'SEARCH_HOUR', 9)
+    monkeypatch.setattr(config, 'SEARCH_MINUTE', 0)
+
+    content = ContentScheduler(db=db)
+    content.setup_schedule()
+    try:
+        assert content.listen_for_reload()
+        env_path.write_text('SEARCH_HOUR=21\nSEARCH_MINUTE=30\n')
+        notify_scheduler()
+
+        deadline = time.time() + 5
+        while config.SEARCH_HOUR != 21 and time.time() < deadline:
+            time.sleep(0.01)
+        next_search = datetime.fromtimestamp(content.timer.next_runs()['search'])
+        assert (next_search.hour, next_search.minute) == (21, 30)
+    finally:
+        content.timer.stop()
+        content.close()
+
+
+def free_udp_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
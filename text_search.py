@@ -0,0 +1,133 @@
+"""
+Russian-aware text processing for the articles full-text index (FTS5)
+
+SQLite has no Russian stemmer, so words are stemmed here: ArticleDatabase
+stores the stemmed title, content and keywords in the index when it writes
+an article, and queries are stemmed the same way.
+"тепловизоры", "тепловизора" and "тепловизором" are all indexed and searched
+as "тепловизор", while "теплопотери" stays a different word.
+
+The index holds only stems, so highlights and snippets are made here from
+the original text of the few articles on a result page.
+
+Changing stem() changes what removing an article from the index deletes, so
+it must come with a migration that rebuilds articles_fts.
+"""
+import re
+from typing import Iterable, List, Optional, Set
+
+# Noun, adjective, participle and verb endings, longest first
+ENDINGS = sorted({
+    # adjectives / participles
+    'ыми', 'ими', 'ого', 'его', 'ому', 'ему', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
+    'ый', 'ий', 'ой', 'ую', 'юю', 'ых', 'их', 'ым', 'им',
+    # nouns
+    'ами', 'ями', 'иями', 'ах', 'ях', 'ам', 'ям', 'ов', 'ев', 'ей', 'ия', 'ью',
+    'ом', 'ем', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь',
+    # verbs
+    'ться', 'тся', 'ать', 'ять', 'ить', 'еть', 'ешь', 'ете', 'ет', 'ут', 'ют',
+    'ит', 'ят', 'ла', 'ли', 'ло',
+}, key=len, reverse=True)
+
+# Shortest stem an ending is stripped down to
+MIN_STEM = 3
+
+# Words too common to narrow a search down
+STOP_WORDS = {
+    'и', 'в', 'во', 'на', 'с', 'со', 'по', 'для', 'о', 'об', 'к', 'ко', 'у', 'из', 'за',
+    'от', 'до', 'а', 'но', 'или', 'не', 'что', 'как', 'при', 'через', 'это',
+}
+
+# Same word boundaries as the unicode61 tokenizer (underscore separates words)
+_WORD = re.compile(r'[^\W_]+')
+_CYRILLIC = re.compile(r'[а-я]')
+
+
+def normalize(word: str) -> str:
+    """Case-fold and spell ё as е"""
+    return word.lower().replace('ё', 'е')
+
+
+def stem(word: str) -> str:
+    """Stem of a normalized word; only Russian words lose their ending"""
+    if _CYRILLIC.search(word):
+        for ending in ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+                return word[:-len(ending)]
+    return word
+
+
+def stem_text(text: Optional[str]) -> Optional[str]:
+    """Text as it is indexed: the stem of every word, separated by spaces"""
+    if text is None:
+        return None
+    return ' '.join(stem(normalize(word)) for word in _WORD.findall(text))
+
+
+def query_stems(text: str) -> List[str]:
+    """Distinct stems of the words of a search query, without stop words unless that leaves nothing"""
+    words = list(dict.fromkeys(normalize(word) for word in _WORD.findall(text)))
+    words = [word for word in words if word not in STOP_WORDS] or words
+    return list(dict.fromkeys(stem(word) for word in words))
+
+
+def build_match_query(stems: Iterable[str]) -> str:
+    """FTS5 MATCH expression requiring every stem, or '' if there are none"""
+    return ' AND '.join(f'"{word}"' for word in stems)
+
+
+def _matches(text: str, stems: Set[str]) -> list:
+    """Word spans of text, each with whether it matches one of the stems"""
+    return [(m.start(), m.end(), stem(normalize(m.group())) in stems) for m in _WORD.finditer(text)]
+
+
+def _mark(text: str, spans: list, start: int, end: int, open_tag: str, close_tag: str) -> str:
+    parts = []
+    position = start
+    for word_start, word_end, matched in spans:
+        if matched:
+            parts.append(text[position:word_start])
+            parts.append(f"{open_tag}{text[word_start:word_end]}{close_tag}")
+            position = word_end
+    parts.append(text[position:end])
+    return ''.join(parts)
+
+
+def highlight(text: Optional[str], stems: Iterable[str], open_tag: str, close_tag: str) -> Optional[str]:
+    """text with every word matching a stem wrapped in the tags"""
+    if not text:
+        return text
+    return _mark(text, _matches(text, set(stems)), 0, len(text), open_tag, close_tag)
+
+
+def snippet(text: Optional[str], stems: Iterable[str], open_tag: str, close_tag: str,
+            words: int, ellipsis: str = '…') -> Optional[str]:
+    """
+    The run of `words` words of text with the most matches, highlighted
+
+    Falls back to the beginning of the text when nothing in it matches.
+    """
+    if not text:
+        return text
+    spans = _matches(text, set(stems))
+    if not spans:
+        return text[:200]
+
+    hits = [index for index, (_, _, matched) in enumerate(spans) if matched]
+    best_start, best_count = 0, 0
+    for hit in hits:
+        # Leave a little context before the first matched word
+        start = max(0, min(hit - 2, len(spans) - words))
+        count = sum(1 for other in hits if start <= other < start + words)
+        if count > best_count:
+            best_start, best_count = start, count
+
+    window = spans[best_start:best_start + words]
+    end_index = best_start + len(window)
+    text_start = window[0][0]
+    text_end = window[-1][1] if end_index < len(spans) else len(text)
+    return (
+        (ellipsis if best_start > 0 else '')
+        + _mark(text, window, text_start, text_end, open_tag, close_tag)
+        + (ellipsis if end_index < len(spans) else '')
+    )
@@ -0,0 +1,228 @@
+"""
+Event-driven job scheduler
+
+Jobs sit in a heap ordered by their next run time. The scheduler thread sleeps
+on a condition variable exactly until the earliest job is due and is woken
+early when a job is added or rescheduled. Due jobs run on a worker pool, so a
+slow search run does not hold up the blog publication.
+
+Every run is recorded in the job_runs table, including runs skipped because
+the previous run of the job was still going (status 'skipped'). On start,
+runs missed while the process was down are caught up according to the job's
+policy:
+    - 'skip': missed runs are dropped
+    - 'once': one run makes up for any number of missed ones
+    - 'all':  every missed run is made up (at most the latest MAX_CATCH_UP_RUNS)
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import logging
+import config
+
+logger = logging.getLogger(__name__)
+
+CATCH_UP_POLICIES = ('skip', 'once', 'all')
+MAX_CATCH_UP_RUNS = 7
+
+
+def next_daily_time(hour: int, minute: int, after: float = None) -> float:
+    """Unix time of the first occurrence of hour:minute local time after `after` (default: now)"""
+    start = datetime.fromtimestamp(after if after is not None else time.time())
+    run_at = start.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run_at <= start:
+        run_at += timedelta(days=1)
+    return run_at.timestamp()
+
+
+class DailyJob:
+    """A function to run every day at hour:minute"""
+
+    def __init__(self, name: str, func: Callable, hour: int, minute: int,
+                 catch_up: str = None, jitter: float = None):
+        catch_up = catch_up or config.SCHEDULER_CATCH_UP
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"Unknown catch-up policy: {catch_up}")
+        self.name = name
+        self.func = func
+        self.hour = hour
+        self.minute = minute
+        self.catch_up = catch_up
+        self.jitter = config.SCHEDULER_JITTER if jitter is None else jitter
+        # Bumped on reschedule so stale heap entries are ignored
+        self.version = 0
+        self.running = False
+        # Catch-up runs waiting for the current run to finish
+        self.backlog: List[float] = []
+
+    def next_run(self, after: float = None) -> float:
+        """Nominal time of the next run after `after`"""
+        return next_daily_time(self.hour, self.minute, after)
+
+    def missed_runs(self, last_run: float, now: float) -> List[float]:
+        """
+        Nominal run times after last_run that are already in the past, oldest first
+
+        Only the latest MAX_CATCH_UP_RUNS are returned: walking back from the
+        last slot before now, so a long gap never replays stale slots.
+        """
+        slot = datetime.fromtimestamp(now).replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if slot.timestamp() > now:
+            slot -= timedelta(days=1)
+        missed = []
+        while slot.timestamp() > last_run and len(missed) < MAX_CATCH_UP_RUNS:
+            missed.append(slot.timestamp())
+            slot -= timedelta(days=1)
+        return missed[::-1]
+
+
+class TimerScheduler:
+    def __init__(self, db=None, max_workers: int = None):
+        """
+        Args:
+            db: ArticleDatabase recording job runs (catch-up is off without it)
+            max_workers: Jobs that may run at the same time
+        """
+        self.db = db
+        self._jobs: Dict[str, DailyJob] = {}
+        # (due time, sequence, job name, job version, nominal run time, queue next run)
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.SCHEDULER_WORKERS, thread_name_prefix='job'
+        )
+
+    def add_daily(self, name: str, func: Callable, hour: int, minute: int,
+                  catch_up: str = None, jitter: float = None) -> DailyJob:
+        """Schedule func to run every day at hour:minute, catching up missed runs per policy"""
+        job = DailyJob(name, func, hour, minute, catch_up, jitter)
+        now = time.time()
+
+        with self._condition:
+            self._jobs[name] = job
+            for run_at in self._catch_up_runs(job, now):
+                self._push(job, run_at, catch_up_at=now)
+            self._push(job, job.next_run(now))
+            self._condition.notify()
+        return job
+
+    def reschedule(self, name: str, hour: int, minute: int):
+        """Move a job to a new time of day, effective immediately"""
+        with self._condition:
+            job = self._jobs[name]
+            job.hour, job.minute = hour, minute
+            job.version += 1
+            self._push(job, job.next_run())
+            self._condition.notify()
+        logger.info(f"Rescheduled job {name} to {hour:02d}:{minute:02d}")
+
+    def next_runs(self) -> Dict[str, float]:
+        """Next due time of every job"""
+        with self._condition:
+            runs = {}
+            for due, _, name, version, _, _ in self._heap:
+                if version == self._jobs[name].version:
+                    runs[name] = min(due, runs.get(name, due))
+            return runs
+
+    def run(self):
+        """Dispatch jobs as they become due until stop() is called"""
+        with self._condition:
+            while not self._stopped:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                due, _, name, version, nominal, repeat = self._heap[0]
+                delay = due - time.time()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+
+                heapq.heappop(self._heap)
+                job = self._jobs.get(name)
+                if job is None or version != job.version:
+                    continue
+                self._dispatch(job, nominal, catch_up=not repeat)
+                # Regular runs queue the next one; catch-up runs are extra
+                if repeat:
+                    self._push(job, job.next_run(nominal))
+
+    def stop(self, wait: bool = True):
+        """Stop dispatching and, if wait, let running jobs finish"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _push(self, job: DailyJob, nominal: float, catch_up_at: float = None):
+        """Queue a regular run at its nominal time plus jitter, or a catch-up run at catch_up_at"""
+        if catch_up_at is not None:
+            entry = (catch_up_at, next(self._sequence), job.name, job.version, nominal, False)
+        else:
+            due = nominal + (random.uniform(0, job.jitter) if job.jitter else 0)
+            entry = (due, next(self._sequence), job.name, job.version, nominal, True)
+        heapq.heappush(self._heap, entry)
+
+    def _catch_up_runs(self, job: DailyJob, now: float) -> List[float]:
+        if job.catch_up == 'skip' or self.db is None:
+            return []
+        last_run = self.db.get_last_job_run(job.name)
+        if last_run is None:
+            return []
+        missed = job.missed_runs(last_run, now)
+        if missed:
+            logger.info(f"Job {job.name} missed {len(missed)} run(s) while stopped, catch-up policy: {job.catch_up}")
+        return missed[-1:] if job.catch_up == 'once' else missed
+
+    def _dispatch(self, job: DailyJob, nominal: float, catch_up: bool):
+        """Hand a due run to the worker pool (caller holds the condition)"""
+        if job.running:
+            if catch_up:
+                # Catch-up runs of one job go one after another
+                job.backlog.append(nominal)
+                return
+            logger.warning(f"Job {job.name} is still running, skipping the run due at "
+                           f"{datetime.fromtimestamp(nominal):%Y-%m-%d %H:%M}")
+            # Recorded off the dispatch loop; the running job covers this slot for catch-up
+            skipped_at = time.time()
+            self._executor.submit(self._record_run, job, nominal, skipped_at, skipped_at, 'skipped',
+                                  'previous run still in progress')
+            return
+        job.running = True
+        self._executor.submit(self._run_job, job, nominal)
+
+    def _run_job(self, job: DailyJob, nominal: float):
+        while True:
+            started_at = time.time()
+            status, error = 'success', None
+            logger.info(f"Running job {job.name}")
+            try:
+                job.func()
+            except Exception as e:
+                status, error = 'error', str(e)
+                logger.error(f"Job {job.name} failed: {e}")
+
+            self._record_run(job, nominal, started_at, time.time(), status, error)
+
+            with self._condition:
+                if not job.backlog or self._stopped:
+                    job.running = False
+                    return
+                nominal = job.backlog.pop(0)
+
+    def _record_run(self, job: DailyJob, nominal: float, started_at: float, finished_at: float,
+                    status: str, error: str = None):
+        if self.db is None:
+            return
+        try:
+            self.db.record_job_run(job.name, nominal, started_at, finished_at, status, error)
+        except Exception as e:
+            logger.error(f"Could not record run of job {job.name}: {e}")
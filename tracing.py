@@ -0,0 +1,190 @@
+"""
+Lightweight per-run tracing in the Chrome trace-event format
+
+When enabled with start(), every span becomes a complete ("X") event written
+as one JSON line to the trace file. The file opens with "[" and leaves the
+array unterminated, which chrome://tracing and Perfetto accept, so a trace
+of a crashed run is still readable.
+
+When tracing is off, span() returns a shared no-op context manager and
+traced() functions cost one global lookup per call.
+
+asyncio is not imported here: it takes longer to import than the rest of
+the CLI's startup, and modes without coroutines never load it.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+# inspect.CO_COROUTINE, the code flag of an async def
+CO_COROUTINE = 0x80
+
+
+def iscoroutinefunction(func: Callable) -> bool:
+    """Whether func is an async def, without importing asyncio or inspect"""
+    code = getattr(func, '__code__', None)
+    return code is not None and bool(code.co_flags & CO_COROUTINE)
+
+
+class TraceRecorder:
+    """Writes trace events to a file, one JSON object per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pid = os.getpid()
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write('[\n')
+        self._lock = threading.Lock()
+        self._named_tids = set()
+
+    def emit(self, event: dict):
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file:
+                self._file.write(line + ',\n')
+
+    def name_thread(self, tid: int, name: str):
+        """Label a track in the viewer once"""
+        if tid in self._named_tids:
+            return
+        self._named_tids.add(tid)
+        self.emit({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}})
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+class Span:
+    """A timed section of a run; extra args can be attached with set()"""
+
+    __slots__ = ('recorder', 'name', 'cat', 'args', 'start')
+
+    def __init__(self, recorder: TraceRecorder, name: str, cat: str, args: dict):
+        self.recorder = recorder
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args['error'] = f"{exc_type.__name__}: {exc}"
+        tid, track = _current_track()
+        self.recorder.name_thread(tid, track)
+        self.recorder.emit({
+            'name': self.name,
+            'cat': self.cat,
+            'ph': 'X',
+            'ts': self.start // 1000,
+            'dur': (end - self.start) // 1000,
+            'pid': self.recorder.pid,
+            'tid': tid,
+            'args': self.args,
+        })
+        return False
+
+
+_recorder: Optional[TraceRecorder] = None
+
+
+def _current_track():
+    """Each asyncio task gets its own track so overlapping coroutines don't interleave"""
+    # No task can be running before anything imported asyncio
+    asyncio = sys.modules.get('asyncio')
+    try:
+        task = asyncio.current_task() if asyncio else None
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return id(task), f"task {task.get_name()}"
+    thread = threading.current_thread()
+    return thread.ident, thread.name
+
+
+def start(path: str):
+    """Enable tracing for this process, writing events to path"""
+    global _recorder
+    stop()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    _recorder = TraceRecorder(path)
+    logger.info(f"Tracing to {path}")
+
+
+def stop():
+    """Disable tracing and close the trace file"""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder:
+        recorder.close()
+
+
+def enabled() -> bool:
+    return _recorder is not None
+
+
+def span(name: str, cat: str = 'app', **args):
+    """Context manager timing a section of the run, e.g. with span('search_keyword', keyword=k)"""
+    recorder = _recorder
+    if recorder is None:
+        return _NOOP_SPAN
+    return Span(recorder, name, cat, args)
+
+
+def traced(name: str = None, cat: str = None) -> Callable:
+    """Decorator wrapping each call of a function (sync or async) in a span"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+        span_cat = cat or func.__module__
+
+        if iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _recorder is None:
+                    return await func(*args, **kwargs)
+                with span(span_name, span_cat):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return func(*args, **kwargs)
+            with span(span_name, span_cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
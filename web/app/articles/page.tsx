@@ -9,14 +9,16 @@ import {
   CheckCircle, 
   XCircle,
   Eye,
-  Trash2
+  Trash2,
+  Search
 } from 'lucide-react'
 import { toast } from 'react-toastify'
 
 interface Article {
   id: number
   title: string
-  content: string
+  excerpt?: string
+  content?: string
   url: string
   source: string
   ai_score: number
@@ -24,6 +26,26 @@ interface Article {
   status: string
   found_date: string
   keywords: string[]
+  // Set on search results, matched words are wrapped in <mark></mark>
+  title_highlight?: string
+  snippet?: string
+}
+
+const LIST_FIELDS = 'id,title,excerpt,url,source,ai_score,relevance_score,status,found_date,keywords'
+
+// Render search highlights as elements, never as HTML
+function Highlighted({ text }: { text: string }) {
+  return (
+    <>
+      {text.split(/<mark>(.*?)<\/mark>/g).map((part, idx) =>
+        idx % 2 === 1 ? (
+          <mark key={idx} className="bg-yellow-200 dark:bg-yellow-700 rounded px-0.5">{part}</mark>
+        ) : (
+          part
+        )
+      )}
+    </>
+  )
 }
 
 export default function ArticlesPage() {
@@ -31,17 +53,39 @@ export default function ArticlesPage() {
   const [loading, setLoading] = useState(true)
   const [filter, setFilter] = useState<'all' | 'pending' | 'published'>('all')
   const [selectedArticle, setSelectedArticle] = useState<Article | null>(null)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const [searchInput, setSearchInput] = useState('')
+  const [query, setQuery] = useState('')
 
   useEffect(() => {
     fetchArticles()
-  }, [filter])
+  }, [filter, query])
+
+  // Search as the user types, once they pause
+  useEffect(() => {
+    const timer = setTimeout(() => setQuery(searchInput.trim()), 300)
+    return () => clearTimeout(timer)
+  }, [searchInput])
+
+  const fetchPage = async (cursor: string | null) => {
+    const params = new URLSearchParams({ status: filter, fields: LIST_FIELDS })
+    if (cursor) {
+      params.set('cursor', cursor)
+    }
+    if (query) {
+      params.set('q', query)
+    }
+    const response = await fetch(query ? `/api/articles/search?${params}` : `/api/articles?${params}`)
+    return response.json()
+  }
 
   const fetchArticles = async () => {
     setLoading(true)
     try {
-      const response = await fetch(`/api/articles?status=${filter}`)
-      const data = await response.json()
+      const data = await fetchPage(null)
       setArticles(data.articles || [])
+      setNextCursor(data.next_cursor || null)
     } catch (error) {
       toast.error('Ошибка загрузки статей')
     } finally {
@@ -49,6 +93,32 @@ export default function ArticlesPage() {
     }
   }
 
+  const loadMore = async () => {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    try {
+      const data = await fetchPage(nextCursor)
+      setArticles((current) => [...current, ...(data.articles || [])])
+      setNextCursor(data.next_cursor || null)
+    } catch (error) {
+      toast.error('Ошибка загрузки статей')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
+  const openArticle = async (article: Article) => {
+    setSelectedArticle(article)
+    try {
+      const response = await fetch(`/api/articles/${article.id}`)
+      if (response.ok) {
+        setSelectedArticle(await response.json())
+      }
+    } catch (error) {
+      toast.error('Ошибка загрузки статьи')
+    }
+  }
+
   const handleApprove = async (articleId: number) => {
     try {
       const response = await fetch(`/api/articles/${articleId}/approve`, {
@@ -104,13 +174,25 @@ export default function ArticlesPage() {
           </p>
         </div>
 
+        {/* Search */}
+        <div className="relative mb-4">
+          <Search className="absolute left-3 top-1/2 -translate-y-1/2 h-5 w-5 text-gray-400" />
+          <input
+            type="search"
+            value={searchInput}
+            onChange={(e) => setSearchInput(e.target.value)}
+            placeholder="Поиск по заголовку, тексту и ключевым словам"
+            className="w-full pl-10 pr-4 py-2 rounded-lg border border-gray-300 dark:border-gray-600 bg-white dark:bg-gray-800 text-gray-900 dark:text-white"
+          />
+        </div>
+
         {/* Filters */}
         <div className="flex space-x-4 mb-6">
           <button
             onClick={() => setFilter('all')}
             className={`btn ${filter === 'all' ? 'btn-primary' : 'btn-secondary'}`}
           >
-            Все ({articles.length})
+            Все ({articles.length}{nextCursor ? '+' : ''})
           </button>
           <button
             onClick={() => setFilter('pending')}
@@ -150,10 +232,10 @@ export default function ArticlesPage() {
                 <div className="flex items-start justify-between">
                   <div className="flex-1">
                     <h3 className="text-xl font-semibold text-gray-900 dark:text-white mb-2">
-                      {article.title}
+                      {article.title_highlight ? <Highlighted text={article.title_highlight} /> : article.title}
                     </h3>
                     <p className="text-gray-600 dark:text-gray-400 mb-4 line-clamp-3">
-                      {article.content}
+                      {article.snippet ? <Highlighted text={article.snippet} /> : article.excerpt}
                     </p>
                     
                     <div className="flex flex-wrap items-center gap-4 text-sm">
@@ -194,7 +276,7 @@ export default function ArticlesPage() {
                 {/* Actions */}
                 <div className="mt-4 flex items-center space-x-3 pt-4 border-t border-gray-200 dark:border-gray-700">
                   <button
-                    onClick={() => setSelectedArticle(article)}
+                    onClick={() => openArticle(article)}
                     className="btn btn-secondary flex items-center space-x-2"
                   >
                     <Eye className="h-4 w-4" />
@@ -222,6 +304,16 @@ export default function ArticlesPage() {
                 </div>
               </div>
             ))}
+
+            {nextCursor && (
+              <button
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="btn btn-secondary mx-auto"
+              >
+                {loadingMore ? 'Загрузка...' : 'Загрузить ещё'}
+              </button>
+            )}
           </div>
         )}
       </main>
@@ -244,7 +336,7 @@ export default function ArticlesPage() {
             
             <div className="prose dark:prose-invert max-w-none">
               <p className="text-gray-700 dark:text-gray-300 whitespace-pre-wrap">
-                {selectedArticle.content}
+                {selectedArticle.content ?? selectedArticle.excerpt}
               </p>
             </div>
 
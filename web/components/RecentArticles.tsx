@@ -21,7 +21,8 @@ export default function RecentArticles() {
 
   const fetchArticles = async () => {
     try {
-      const response = await fetch('/api/articles?limit=5')
+      const params = new URLSearchParams({ limit: '5', fields: 'id,title,ai_score,status,found_date' })
+      const response = await fetch(`/api/articles?${params}`)
       const data = await response.json()
       setArticles(data.articles || [])
     } catch (error) {
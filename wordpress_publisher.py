@@ -1,27 +1,55 @@
 """
 WordPress publishing module
 """
+import html
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from requests.auth import HTTPBasicAuth
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 import logging
 import config
+from database import ArticleDatabase
+from http_client import PooledSession
+from rate_limiter import NOT_PROCESSED_STATUSES, call_with_backoff
+from tracing import traced
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+TAG_CACHE_SYNC_KEY = 'wp_tags'
+
+# Every status a post created by create_post can have
+POST_STATUSES = 'publish,future,draft,pending,private'
+
+
+def normalize_tag_name(name: str) -> str:
+    """Normalize a tag name for cache lookups (case and whitespace insensitive)"""
+    return ' '.join(name.split()).casefold()
+
+
 class WordPressPublisher:
-    def __init__(self):
+    def __init__(self, db: ArticleDatabase = None, session: requests.Session = None):
+        self.db = db or ArticleDatabase()
+        # Keep-alive session reused for every request; closed by close() if we own it
+        self._owns_session = session is None
+        self.session = session or PooledSession()
         self.base_url = config.WORDPRESS_URL.rstrip('/')
         self.api_url = f"{self.base_url}/wp-json/wp/v2"
         self.username = config.WORDPRESS_USERNAME
         self.password = config.WORDPRESS_PASSWORD
         self.auth = HTTPBasicAuth(self.username, self.password)
     
-    def create_post(self, post_data: Dict) -> Optional[str]:
+    @traced()
+    def create_post(self, post_data: Dict, check_existing: bool = False) -> Optional[str]:
         """
         Create a new WordPress post
         
+        The POST is not retried on 5xx or timeouts: WordPress may have stored
+        the post anyway. A caller retrying after a failure passes
+        check_existing, which returns the post with the same title if the
+        earlier attempt did create it.
+        
         Args:
             post_data: Dictionary containing:
                 - title: Post title
@@ -30,12 +58,24 @@ class WordPressPublisher:
                 - status: 'publish', 'draft', or 'pending'
                 - tags: List of tag names
                 - categories: List of category IDs
+            check_existing: Look for a post with this title before creating one
         
         Returns:
             Post ID if successful, None otherwise
         """
         endpoint = f"{self.api_url}/posts"
         
+        if check_existing:
+            try:
+                post_id = self.find_post(post_data.get('title', ''))
+            except Exception as e:
+                # Creating the post without knowing could duplicate it
+                logger.error(f"Error looking up WordPress post: {e}")
+                return None
+            if post_id:
+                logger.info(f"WordPress post already exists: {post_id}")
+                return post_id
+        
         # Prepare post payload
         payload = {
             'title': post_data.get('title', ''),
@@ -54,11 +94,15 @@ class WordPressPublisher:
             payload['categories'] = post_data['categories']
         
         try:
-            response = requests.post(
+            response = call_with_backoff(
+                'wordpress',
+                self.session.post,
                 endpoint,
                 json=payload,
                 auth=self.auth,
-                headers={'Content-Type': 'application/json'}
+                headers={'Content-Type': 'application/json'},
+                operation='wp.create_post',
+                retry_statuses=NOT_PROCESSED_STATUSES
             )
             
             if response.status_code in [200, 201]:
@@ -73,51 +117,157 @@ class WordPressPublisher:
             logger.error(f"Error creating WordPress post: {e}")
             return None
     
+    @traced()
+    def find_post(self, title: str) -> Optional[str]:
+        """
+        ID of the newest post with exactly this title, in any status
+        
+        Raises:
+            RuntimeError: WordPress answered with an error
+        """
+        response = call_with_backoff(
+            'wordpress',
+            self.session.get,
+            f"{self.api_url}/posts",
+            params={
+                'search': title,
+                'status': POST_STATUSES,
+                'context': 'edit',
+                'orderby': 'date',
+                'order': 'desc',
+                'per_page': 20,
+            },
+            auth=self.auth,
+            operation='wp.find_post'
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to look up posts: {response.status_code} - {response.text}")
+        for post in response.json():
+            if post.get('title', {}).get('raw', '').strip() == title.strip():
+                return str(post['id'])
+        return None
+    
+    @traced()
     def _get_or_create_tags(self, tag_names: list) -> list:
         """Get or create tags and return their IDs"""
-        tag_ids = []
+        self._ensure_tag_cache()
         
+        # Resolve each distinct tag once, keeping the caller's order
+        names = {}
         for tag_name in tag_names:
-            # Check if tag exists
-            search_url = f"{self.api_url}/tags?search={tag_name}"
+            key = normalize_tag_name(tag_name)
+            if key and key not in names:
+                names[key] = tag_name.strip()
+        
+        tag_ids = self.db.get_tag_ids(names)
+        missing = [key for key in names if key not in tag_ids]
+        
+        if missing:
+            created = []
+            with ThreadPoolExecutor(max_workers=config.WP_TAG_CREATE_WORKERS) as executor:
+                for key, tag in zip(missing, executor.map(self._create_tag, [names[k] for k in missing])):
+                    if tag:
+                        tag_ids[key] = tag[0]
+                        created.append((key, tag[0], tag[1]))
+            self.db.save_tags(created)
+        
+        return [tag_ids[key] for key in names if key in tag_ids]
+    
+    @traced()
+    def _create_tag(self, tag_name: str) -> Optional[Tuple[int, str]]:
+        """Create a tag in WordPress, returns (term_id, name) or None on failure"""
+        try:
+            response = call_with_backoff(
+                'wordpress',
+                self.session.post,
+                f"{self.api_url}/tags",
+                json={'name': tag_name},
+                auth=self.auth,
+                operation='wp.tags'
+            )
             
+            if response.status_code in [200, 201]:
+                return response.json()['id'], tag_name
+            
+            # Someone else created it since the cache was warmed
             try:
-                response = requests.get(search_url, auth=self.auth)
+                error = response.json()
+            except ValueError:
+                error = {}
+            if isinstance(error, dict) and error.get('code') == 'term_exists':
+                return error['data']['term_id'], tag_name
+            
+            logger.error(f"Failed to create tag '{tag_name}': {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.error(f"Error handling tag '{tag_name}': {e}")
+        return None
+    
+    def _ensure_tag_cache(self):
+        """Warm the local tag cache if it has never been filled or is older than the TTL"""
+        synced_at = self.db.get_sync_time(TAG_CACHE_SYNC_KEY)
+        if synced_at is None or time.time() - synced_at > config.WP_TAG_CACHE_TTL:
+            self.warm_tag_cache()
+    
+    @traced()
+    def warm_tag_cache(self) -> int:
+        """
+        Load every WordPress tag into the local cache, 100 per request
+        
+        Returns:
+            Number of tags cached
+        """
+        endpoint = f"{self.api_url}/tags"
+        tags = []
+        page = 1
+        
+        try:
+            while True:
+                response = call_with_backoff(
+                    'wordpress',
+                    self.session.get,
+                    endpoint,
+                    params={'per_page': 100, 'page': page, '_fields': 'id,name'},
+                    auth=self.auth,
+                    operation='wp.tags_list'
+                )
                 
-                if response.status_code == 200:
-                    tags = response.json()
-                    
-                    if tags:
-                        # Tag exists
-                        tag_ids.append(tags[0]['id'])
-                    else:
-                        # Create new tag
-                        create_url = f"{self.api_url}/tags"
-                        create_response = requests.post(
-                            create_url,
-                            json={'name': tag_name},
-                            auth=self.auth
-                        )
-                        
-                        if create_response.status_code in [200, 201]:
-                            tag_ids.append(create_response.json()['id'])
-                        
-            except Exception as e:
-                logger.error(f"Error handling tag '{tag_name}': {e}")
-                continue
+                if response.status_code != 200:
+                    logger.error(f"Failed to load tags page {page}: {response.status_code} - {response.text}")
+                    return 0
+                
+                batch = response.json()
+                tags.extend(
+                    (normalize_tag_name(html.unescape(tag['name'])), tag['id'], html.unescape(tag['name']))
+                    for tag in batch
+                )
+                
+                total_pages = int(response.headers.get('X-WP-TotalPages', page))
+                if not batch or page >= total_pages:
+                    break
+                page += 1
+        except Exception as e:
+            logger.error(f"Error loading WordPress tags: {e}")
+            return 0
         
-        return tag_ids
+        self.db.save_tags(tags)
+        self.db.set_sync_time(TAG_CACHE_SYNC_KEY, time.time())
+        logger.info(f"Cached {len(tags)} WordPress tags")
+        return len(tags)
     
+    @traced()
     def update_post(self, post_id: str, post_data: Dict) -> bool:
         """Update an existing WordPress post"""
         endpoint = f"{self.api_url}/posts/{post_id}"
         
         try:
-            response = requests.post(
+            response = call_with_backoff(
+                'wordpress',
+                self.session.post,
                 endpoint,
                 json=post_data,
                 auth=self.auth,
-                headers={'Content-Type': 'application/json'}
+                headers={'Content-Type': 'application/json'},
+                operation='wp.update_post'
             )
             
             if response.status_code == 200:
@@ -131,6 +281,11 @@ class WordPressPublisher:
             logger.error(f"Error updating WordPress post: {e}")
             return False
     
+    def close(self):
+        """Release pooled connections"""
+        if self._owns_session:
+            self.session.close()
+    
     def format_blog_post(self, blog_data: Dict) -> str:
         """Format blog post content as HTML"""
         html = f"""